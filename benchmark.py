@@ -4,10 +4,24 @@ NV3007 LCD 绘制性能基准测试
 输出 CSV 格式便于在 Excel 中对比
 """
 
-from nv3007 import NV3007
-import font_wqy_16
 import time
+import gc
+import os
+from nv3007 import NV3007, FontIndex
+from nv3007_console import Console
+from nv3007_binfont import BinFont
+import font_to_bin
+import img_to_sprite
 from machine import Pin, SPI
+
+# 字体模块的导入耗时和堆占用（未冻结时包含编译和 _font/_sparse 常量）
+gc.collect()
+font_import_mem = gc.mem_alloc()
+font_import_start = time.ticks_ms()
+import font_wqy_16
+font_import_time = time.ticks_diff(time.ticks_ms(), font_import_start)
+gc.collect()
+font_import_mem = gc.mem_alloc() - font_import_mem
 # 创建屏幕实例
 spi = SPI(
     0,
@@ -19,7 +33,12 @@ spi = SPI(
     mosi=Pin(19),
 )
 
+# 启动计时：构造（复位+初始化序列）到第一帧像素送达屏幕
+boot_start = time.ticks_ms()
 lcd = NV3007(spi, 17, 20, 21, 14, 142, 428, 0)
+boot_init_time = time.ticks_diff(time.ticks_ms(), boot_start)
+lcd.clear(NV3007.BLACK)
+boot_first_pixel_time = time.ticks_diff(time.ticks_ms(), boot_start)
 lcd.set_font(font_wqy_16)
 
 def benchmark(name, func, iterations=10, setup_func=None):
@@ -134,6 +153,10 @@ print(f"屏幕分辨率: {lcd.width}x{lcd.height}")
 # CSV 表头
 print("测试名称,平均时间(ms),最小时间(ms),最大时间(ms),迭代次数")
 
+print("\n【启动】")
+print(f"初始化序列,{boot_init_time},-,-,1")
+print(f"启动到第一帧像素,{boot_first_pixel_time},-,-,1")
+
 print("\n【基础操作】")
 
 benchmark(
@@ -410,6 +433,50 @@ benchmark("954个8x8单色位图", lambda: (lcd.set_auto_flush(False), test_bitm
 benchmark("954个8x8 RGB565位图", lambda: (lcd.set_auto_flush(False), test_bitmap_rgb_8x8(), lcd.flush())[2],
           iterations=3, setup_func=setup_bitmap)
 
+print("\n【RLE精灵】")
+
+# 32x32圆形图标：圆外为透明色，圆内为渐变
+ICON_KEY = NV3007.MAGENTA
+icon_565 = bytearray(32 * 32 * 2)
+for py in range(32):
+    for px in range(32):
+        c = ICON_KEY
+        if (2 * px - 31) ** 2 + (2 * py - 31) ** 2 < 32 * 32:
+            c = (px << 11) | ((py * 2) << 5) | 0x10
+        icon_565[(py * 32 + px) * 2] = c >> 8
+        icon_565[(py * 32 + px) * 2 + 1] = c & 0xFF
+icon_sprite = img_to_sprite.encode(icon_565, 32, 32, ICON_KEY)
+print(f"32x32图标字节数 (RGB565),{len(icon_565)},-,-,1")
+print(f"32x32图标字节数 (RLE精灵),{len(icon_sprite)},-,-,1")
+
+def draw_icons_keyed():
+    # 没有精灵格式时的透明绘制：逐像素跳过透明色
+    for i in range(12):
+        ox = (i % 4) * 35
+        oy = (i // 4) * 140
+        for py in range(32):
+            for px in range(32):
+                k = (py * 32 + px) * 2
+                c = (icon_565[k] << 8) | icon_565[k + 1]
+                if c != ICON_KEY:
+                    lcd.draw_pixel(ox + px, oy + py, c)
+
+def draw_icons_rgb565():
+    for i in range(12):
+        lcd.draw_bitmap_rgb565((i % 4) * 35, (i // 4) * 140, icon_565, 32, 32)
+
+def draw_icons_sprite():
+    for i in range(12):
+        lcd.draw_sprite((i % 4) * 35, (i // 4) * 140, icon_sprite)
+
+# 只计时绘制到framebuffer
+lcd.set_auto_flush(False)
+benchmark("12个32x32图标 逐像素透明", draw_icons_keyed, iterations=3, setup_func=setup_bitmap)
+benchmark("12个32x32图标 draw_bitmap_rgb565(不透明)", draw_icons_rgb565, iterations=5, setup_func=setup_bitmap)
+benchmark("12个32x32图标 draw_sprite", draw_icons_sprite, iterations=5, setup_func=setup_bitmap)
+lcd.flush()
+lcd.set_auto_flush(True)
+
 print("\n【混合场景测试】")
 
 def setup_mixed():
@@ -513,6 +580,371 @@ benchmark("3次长文本(15字符)", lambda: (lcd.set_auto_flush(False), test_te
 benchmark("5次多行文本(3行x5字符)", lambda: (lcd.set_auto_flush(False), test_text_multiline(), lcd.flush())[2],
            iterations=5, setup_func=setup_text)
 
+# 不透明文本：更新标签时用bg_color一次绘制，对比先draw_rect擦除再透明绘制（只计时绘制，不含刷新）
+opaque_text_tests = (
+    ("短文本", [(10, 20 + i * 40, "强制Viper") for i in range(10)]),
+    ("中长文本", [(10, 20 + i * 80, "本地的 Viper 变量") for i in range(5)]),
+    ("长文本", [(10, 20 + i * 130, "强制转换的结果将是一个本地的 Viper 变量。") for i in range(3)]),
+    ("多行文本", [(10, 20 + i * 80 + k * 20, t) for i in range(5) for k, t in enumerate(("第一行", "第二行", "第三行"))]),
+)
+
+def text_width(text):
+    return sum(font_wqy_16.get_ch(ch)[2] for ch in text)
+
+def erase_and_draw(labels):
+    # 擦除宽度事先算好，不计入时间
+    for x, y, text, w in labels:
+        lcd.draw_rect(x, y, w, font_wqy_16.height(), NV3007.BLACK, filled=True)
+        lcd.draw_text(x, y, text, NV3007.WHITE)
+
+def draw_opaque(labels):
+    for x, y, text, w in labels:
+        lcd.draw_text(x, y, text, NV3007.WHITE, NV3007.BLACK)
+
+lcd.set_auto_flush(False)
+for name, labels in opaque_text_tests:
+    labels = [(x, y, text, text_width(text)) for x, y, text in labels]
+    benchmark(f"{name} 擦除+绘制", lambda: erase_and_draw(labels), iterations=5, setup_func=setup_text)
+    benchmark(f"{name} bg_color", lambda: draw_opaque(labels), iterations=5, setup_func=setup_text)
+lcd.flush()
+lcd.set_auto_flush(True)
+
+print("\n【字形缓存】")
+
+def draw_labels():
+    # 仪表盘式的重复标签：每帧绘制相同的文字
+    for i in range(10):
+        lcd.draw_text(5, 10 + i * 40, "温度 湿度 状态", NV3007.WHITE)
+
+def benchmark_glyph_cache(name, budget):
+    # 只计时绘制到framebuffer，不包含刷新
+    lcd.set_auto_flush(False)
+    lcd.set_glyph_cache(budget)
+    benchmark(name, draw_labels, iterations=5, setup_func=lambda: lcd.clear(NV3007.BLACK))
+    hits, misses, used, count = lcd.glyph_cache_stats()
+    if budget:
+        print(f"{name} 命中/未命中,{hits},{misses},-,{count}")
+        print(f"{name} 占用字节,{used},-,-,{count}")
+
+benchmark_glyph_cache("10行重复标签 (无缓存)", 0)
+benchmark_glyph_cache("10行重复标签 (字形缓存4KB)", 4096)
+lcd.set_glyph_cache(0)
+lcd.flush()
+lcd.set_auto_flush(True)
+
+print("\n【字体索引】")
+
+lookup_text = "温度湿度状态日志ABCxyz0123" * 10
+
+def measure_lookup(name, func, rounds=5):
+    """每个字符的平均查找耗时（us）"""
+    best = None
+    for _ in range(rounds):
+        start = time.ticks_us()
+        func()
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        if best is None or elapsed < best:
+            best = elapsed
+    print(f"{name} 每字符(us),{best * 100 // len(lookup_text) / 100},-,-,{len(lookup_text)}")
+
+gc.collect()
+mem_before = gc.mem_alloc()
+start = time.ticks_ms()
+font_index = FontIndex(font_wqy_16)
+build_ms = time.ticks_diff(time.ticks_ms(), start)
+gc.collect()
+print(f"FontIndex 构建,{build_ms},-,-,1")
+print(f"FontIndex 占用字节,{gc.mem_alloc() - mem_before},-,-,1")
+
+measure_lookup("font.get_ch (二分查找)", lambda: [font_wqy_16.get_ch(ch) for ch in lookup_text])
+measure_lookup("FontIndex.get_ch", lambda: [font_index.get_ch(ch) for ch in lookup_text])
+measure_lookup("FontIndex.get_ch_many", lambda: font_index.get_ch_many(lookup_text))
+
+def render_text_rows(font):
+    """用font绘制一行文本，返回文本所在行的framebuffer内容"""
+    lcd.set_auto_flush(False)
+    lcd.set_font(font)
+    lcd.clear(NV3007.BLACK)
+    lcd.draw_text(5, 10, lookup_text[:20], NV3007.WHITE)
+    row_bytes = lcd._fb_width * 2
+    return bytes(lcd._fb_mv[10 * row_bytes:(10 + font_wqy_16.height()) * row_bytes])
+
+# 已构建的FontIndex可以直接传给set_font，绘制结果与字体模块相同
+if render_text_rows(font_index) != render_text_rows(font_wqy_16):
+    raise AssertionError("set_font(FontIndex) renders differently from the font module")
+print("set_font(FontIndex) 与字体模块绘制一致,1,-,-,1")
+lcd.flush()
+lcd.set_auto_flush(True)
+del font_index
+
+print("\n【二进制字体】")
+
+BINFONT_PATH = "font_wqy_16.bin"
+RLEFONT_PATH = "font_wqy_16_rle.bin"
+for path, rle in ((BINFONT_PATH, False), (RLEFONT_PATH, True)):
+    try:
+        open(path, "rb").close()
+    except OSError:
+        font_to_bin.convert(font_wqy_16, path, rle)
+
+gc.collect()
+mem_before = gc.mem_alloc()
+start = time.ticks_ms()
+bin_font = BinFont(BINFONT_PATH)
+open_ms = time.ticks_diff(time.ticks_ms(), start)
+gc.collect()
+print(f"import font_wqy_16,{font_import_time},-,-,1")
+print(f"import font_wqy_16 占用字节,{font_import_mem},-,-,1")
+print(f"BinFont 打开,{open_ms},-,-,1")
+print(f"BinFont 占用字节,{gc.mem_alloc() - mem_before},-,-,1")
+
+# 连续的不同汉字远多于槽位数，每次都从文件读取；lookup_text只有少数不同字符，全部命中
+miss_text = "".join(chr(0x4E00 + i) for i in range(len(lookup_text)))
+measure_lookup("BinFont.get_ch (未命中)", lambda: [bin_font.get_ch(ch) for ch in miss_text])
+measure_lookup("BinFont.get_ch (命中)", lambda: [bin_font.get_ch(ch) for ch in lookup_text])
+
+def draw_bin_labels():
+    for i in range(10):
+        lcd.draw_text(5, 10 + i * 40, "温度 湿度 状态", NV3007.WHITE)
+
+# RLE字形按游程直接填充，不逐位展开
+rle_font = BinFont(RLEFONT_PATH)
+print(f"字体文件字节数 (原始位图),{os.stat(BINFONT_PATH)[6]},-,-,1")
+print(f"字体文件字节数 (RLE),{os.stat(RLEFONT_PATH)[6]},-,-,1")
+
+lcd.set_auto_flush(False)
+for name, font in (("模块", font_wqy_16), ("BinFont", bin_font), ("RLE BinFont", rle_font)):
+    lcd.set_font(font)
+    benchmark(f"10行重复标签 ({name})", draw_bin_labels, iterations=5, setup_func=lambda: lcd.clear(NV3007.BLACK))
+lcd.set_font(font_wqy_16)
+lcd.flush()
+lcd.set_auto_flush(True)
+bin_font.close()
+rle_font.close()
+del bin_font, rle_font
+
+print("\n【抗锯齿字体】")
+
+AAFONT_PATH = "font_wqy_16_aa.bin"
+aa_text = "温度 湿度 状态"
+
+def make_aa_font(path, text, bpp=4):
+    """把font_wqy_16中text的字形转换为抗锯齿字体文件（设备上没有TrueType渲染器）：
+    笔画像素为最大alpha，左右相邻的空白像素为一半alpha，边缘像素数与真实抗锯齿字体相近"""
+    top = (1 << bpp) - 1
+    height = font_wqy_16.height()
+    codepoints = sorted(set(ord(ch) for ch in text))
+    records = []
+    widths = []
+    for cp in [0] + codepoints:
+        bitmap, _, width = font_wqy_16.get_ch(chr(cp))
+        src_row = (width + 7) >> 3
+        dst_row = (width * bpp + 7) >> 3
+        out = bytearray(dst_row * height)
+        for row in range(height):
+            bits = [(bitmap[row * src_row + (col >> 3)] >> (7 - (col & 7))) & 1 for col in range(width)]
+            for col in range(width):
+                if bits[col]:
+                    a = top
+                elif (col > 0 and bits[col - 1]) or (col + 1 < width and bits[col + 1]):
+                    a = top >> 1
+                else:
+                    continue
+                bit = col * bpp
+                out[row * dst_row + (bit >> 3)] |= a << (8 - bpp - (bit & 7))
+        records.append(out)
+        widths.append(width)
+    font_to_bin.write(path, height, max(widths), codepoints, records, widths,
+                      font_to_bin.FLAG_4BPP if bpp == 4 else font_to_bin.FLAG_2BPP)
+
+make_aa_font(AAFONT_PATH, aa_text)
+mono_font = BinFont(BINFONT_PATH)
+aa_font = BinFont(AAFONT_PATH)
+
+def draw_aa_labels(bg_color=None):
+    for i in range(10):
+        lcd.draw_text(5, 10 + i * 40, aa_text, NV3007.WHITE, bg_color)
+
+def setup_stripes():
+    # 彩色背景：透明抗锯齿文本的边缘像素要与不同的背景色混合
+    for i in range(8):
+        lcd.draw_rect(0, i * 54, 142, 54, (NV3007.RED, NV3007.GREEN, NV3007.BLUE, NV3007.GRAY)[i & 3], filled=True)
+
+# 只计时绘制到framebuffer；两种字体字形相同，差别只在1位展开与alpha混合
+lcd.set_auto_flush(False)
+for name, font in (("1bpp", mono_font), ("4bpp AA", aa_font)):
+    lcd.set_font(font)
+    benchmark(f"10行标签 {name} 透明", draw_aa_labels, iterations=5, setup_func=lambda: lcd.clear(NV3007.BLACK))
+    benchmark(f"10行标签 {name} 透明彩色底", draw_aa_labels, iterations=5, setup_func=setup_stripes)
+    benchmark(f"10行标签 {name} bg_color", lambda: draw_aa_labels(NV3007.BLACK), iterations=5,
+              setup_func=lambda: lcd.clear(NV3007.BLACK))
+lcd.set_font(font_wqy_16)
+lcd.flush()
+lcd.set_auto_flush(True)
+mono_font.close()
+aa_font.close()
+del mono_font, aa_font
+
+print("\n【绘制后端】")
+
+backend_bitmap = bytearray(b"\x07\xe0" * 32 * 32)
+backend_mono = bytes(range(32 * 4))
+
+def backend_pixels():
+    for i in range(100):
+        lcd.draw_pixel(i, i * 4, NV3007.WHITE)
+
+def backend_primitives():
+    return (
+        ("像素x100", backend_pixels),
+        ("水平线", lambda: lcd.draw_line(0, 200, 141, 200, NV3007.RED)),
+        ("直线", lambda: lcd.draw_line(0, 0, 141, 427, NV3007.RED)),
+        ("矩形填充", lambda: lcd.draw_rect(10, 10, 120, 200, NV3007.BLUE, filled=True)),
+        ("圆", lambda: lcd.draw_circle(71, 214, 60, NV3007.GREEN)),
+        ("圆填充", lambda: lcd.draw_circle(71, 214, 60, NV3007.GREEN, filled=True)),
+        ("椭圆", lambda: lcd.draw_ellipse(71, 214, 60, 150, NV3007.YELLOW)),
+        ("椭圆填充", lambda: lcd.draw_ellipse(71, 214, 60, 150, NV3007.YELLOW, filled=True)),
+        ("三角形填充", lambda: lcd.draw_triangle(10, 10, 130, 100, 40, 400, NV3007.CYAN, filled=True)),
+        ("五边形", lambda: lcd.draw_polygon([(71, 50), (130, 150), (110, 350), (30, 350), (10, 150)], NV3007.MAGENTA)),
+        ("RGB565位图32x32", lambda: lcd.draw_bitmap_rgb565(50, 50, backend_bitmap, 32, 32)),
+        ("单色位图32x32", lambda: lcd.draw_bitmap(50, 50, backend_mono, 32, 32, NV3007.WHITE)),
+        ("文本", lambda: lcd.draw_text(0, 100, "Hello 你好 123", NV3007.WHITE)),
+    )
+
+lcd.set_auto_flush(False)
+available = NV3007.backends()
+for backend in ("python", "native", "viper", "framebuf"):
+    if backend not in available:
+        print(f"{backend},不可用,-,-,-")
+        continue
+    lcd.set_backend(backend)
+    for name, func in backend_primitives():
+        benchmark(f"{backend} {name}", func, iterations=10)
+lcd.set_backend()
+lcd.set_auto_flush(True)
+
+print("\n【帧差分刷新】")
+
+class CountingSPI:
+    """统计发送字节数的SPI包装"""
+
+    def __init__(self, spi):
+        self._spi = spi
+        self.count = 0
+
+    def write(self, buf):
+        self.count += len(buf)
+        self._spi.write(buf)
+
+def draw_dashboard(frame):
+    # 每帧清屏后重绘，只有数值每10帧变化一次
+    lcd.clear(NV3007.BLACK)
+    lcd.draw_text(10, 10, "状态面板", NV3007.WHITE)
+    lcd.draw_rect(5, 40, 132, 60, NV3007.BLUE, radius=5, filled=True)
+    lcd.draw_text(15, 60, "温度 %d" % (20 + frame // 10), NV3007.WHITE)
+    lcd.draw_circle(71, 250, 50, NV3007.GREEN)
+    lcd.draw_text(10, 400, "MicroPython", NV3007.CYAN)
+
+def benchmark_diff(name, diff, frames=20):
+    counter = CountingSPI(lcd._bus._spi)
+    old_spi = lcd._bus._spi
+    lcd._bus._spi = counter
+    lcd.set_auto_flush(False)
+    lcd.set_diff_mode(diff)
+    draw_dashboard(0)
+    lcd.flush()
+    counter.count = 0
+    times = []
+    for frame in range(1, frames + 1):
+        start = time.ticks_ms()
+        draw_dashboard(frame)
+        lcd.flush()
+        times.append(time.ticks_diff(time.ticks_ms(), start))
+    lcd.set_diff_mode(False)
+    lcd._bus._spi = old_spi
+    print(f"{name},{sum(times) // frames},{min(times)},{max(times)},{frames}")
+    print(f"{name} 每帧字节数,{counter.count // frames},-,-,{frames}")
+
+benchmark_diff("仪表盘重绘 (整屏刷新)", False)
+benchmark_diff("仪表盘重绘 (tile差分)", True)
+
+print("\n【异步刷新】")
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+async def latency_probe(state):
+    """不断让出事件循环，记录两次被调度之间的最大间隔（us）"""
+    last = time.ticks_us()
+    while state["running"]:
+        await asyncio.sleep(0)
+        now = time.ticks_us()
+        gap = time.ticks_diff(now, last)
+        if gap > state["max_gap"]:
+            state["max_gap"] = gap
+        last = now
+
+async def measure_flush_latency(flush_coro_factory):
+    state = {"running": True, "max_gap": 0}
+    probe = asyncio.create_task(latency_probe(state))
+    await asyncio.sleep(0)
+    lcd.set_auto_flush(False)
+    lcd.clear(NV3007.BLUE)
+    start = time.ticks_ms()
+    await flush_coro_factory()
+    elapsed = time.ticks_diff(time.ticks_ms(), start)
+    state["running"] = False
+    await probe
+    return elapsed, state["max_gap"]
+
+async def blocking_flush():
+    lcd.flush()
+
+for name, factory in (
+    ("整屏flush() (阻塞)", blocking_flush),
+    ("整屏flush_async() 4KB", lambda: lcd.flush_async(4096)),
+    ("整屏flush_async() 1KB", lambda: lcd.flush_async(1024)),
+):
+    elapsed, max_gap = asyncio.run(measure_flush_latency(factory))
+    print(f"{name},{elapsed},-,-,1")
+    print(f"{name} 最大事件循环延迟(us),{max_gap},-,-,1")
+
+print("\n【堆分配】")
+
+def check_flush_alloc(name, draw, target=None):
+    """测量一次flush()的堆分配字节数（gc.mem_alloc差值），不为0时报错
+
+    先绘制并刷新一次：行缓冲区视图按宽度缓存，只在第一次刷新该宽度时创建
+    """
+    if target is None:
+        target = lcd
+    target.set_auto_flush(False)
+    draw()
+    target.flush()
+    draw()
+    gc.collect()
+    before = gc.mem_alloc()
+    target.flush()
+    alloc = gc.mem_alloc() - before
+    print(f"{name} 堆分配(字节),{alloc},-,-,1")
+    if alloc:
+        raise AssertionError(f"{name}: flush() allocated {alloc} bytes")
+
+# RGB565的部分区域由copy16内核复制到行缓冲区后发送
+check_flush_alloc("flush()整屏", lambda: lcd.clear(NV3007.BLACK))
+check_flush_alloc("flush()无变化", lambda: None)
+check_flush_alloc("flush()部分宽度矩形", lambda: lcd.draw_rect(20, 30, 40, 12, NV3007.RED, filled=True))
+check_flush_alloc("flush()整行宽度的带", lambda: lcd.draw_rect(0, 100, lcd.width, 50, NV3007.GREEN, filled=True))
+gc.collect()
+alloc_lcd = NV3007(spi, 17, 20, 21, 14, 142, 428, 0, bpp=8)
+check_flush_alloc("flush()索引色部分宽度矩形",
+                  lambda: alloc_lcd.draw_rect(20, 30, 40, 12, NV3007.RED, filled=True), alloc_lcd)
+del alloc_lcd
+gc.collect()
+lcd.set_auto_flush(True)
+
 print("\n【性能瓶颈分析】")
 
 def analyze_pixel_operations():
@@ -548,8 +980,246 @@ def analyze_pixel_operations():
 
     analyze_pixel_operations()
 
+print("\n【分带渲染】")
+
+def draw_band_scene(target):
+    target.clear(NV3007.BLACK)
+    target.draw_text(10, 10, "分带渲染", NV3007.WHITE)
+    target.draw_rect(5, 40, 132, 60, NV3007.BLUE, radius=5, filled=True)
+    for i in range(4):
+        target.draw_circle(71, 150 + i * 70, 30, NV3007.GREEN, filled=True)
+    target.draw_line(0, 0, 141, 427, NV3007.RED)
+
+for band_rows in (0, 107, 54, 27, 16, 8):
+    gc.collect()
+    before = gc.mem_alloc()
+    band_lcd = NV3007(spi, 17, 20, 21, 14, 142, 428, 0, band_rows=band_rows)
+    fb_bytes = gc.mem_alloc() - before
+    band_lcd.set_font(font_wqy_16)
+    band_lcd.set_auto_flush(False)
+    name = "整屏framebuffer" if band_rows == 0 else f"带高{band_rows}行"
+    benchmark(name, lambda: (draw_band_scene(band_lcd), band_lcd.flush()), iterations=3)
+    print(f"{name} 驱动占用内存(字节),{fb_bytes},-,-,1")
+    del band_lcd
+gc.collect()
+
+def draw_font_switch_scene(target, font):
+    # 帧中途切换字体：分带回放时每段文本要用记录时的字体绘制
+    target.clear(NV3007.BLACK)
+    target.set_font(font_wqy_16)
+    target.draw_text(5, 10, aa_text, NV3007.WHITE)
+    target.set_font(font)
+    target.draw_text(5, 50, aa_text, NV3007.YELLOW)
+    target.draw_rect(5, 100, 132, 40, NV3007.BLUE, filled=True)
+    target.set_font(font_wqy_16)
+    target.draw_text(5, 200, aa_text, NV3007.GREEN, NV3007.BLUE)
+    target.set_font(font)
+
+def band_frame(target):
+    """绘制切换字体的场景，返回分带刷新依次发送的各带framebuffer内容"""
+    bands = []
+    row_bytes = target._fb_width * 2
+
+    def capture(buf, x0, y0, x1, y1, offset):
+        bands.append(bytes(buf[:(y1 - y0 + 1) * row_bytes]))
+
+    target._flush_rect = capture
+    target.set_auto_flush(False)
+    draw_font_switch_scene(target, aa_font)
+    target.flush()
+    return b"".join(bands)
+
+aa_font = BinFont(AAFONT_PATH)
+lcd.set_auto_flush(False)
+draw_font_switch_scene(lcd, aa_font)
+full_frame = bytes(lcd._framebuffer)
+band_lcd = NV3007(spi, 17, 20, 21, 14, 142, 428, 0, band_rows=27)
+if band_frame(band_lcd) != full_frame:
+    raise AssertionError("band mode renders a mid-frame font switch differently from the full framebuffer")
+print("分带模式帧中切换字体 与整屏framebuffer一致,1,-,-,1")
+del band_lcd, full_frame
+aa_font.close()
+del aa_font
+lcd.set_font(font_wqy_16)
+lcd.flush()
+lcd.set_auto_flush(True)
+gc.collect()
+
+print("\n【索引色/低位深framebuffer】")
+
+# 只使用黑白两色，1 bpp（2色调色板）也能运行同一场景
+def draw_fill_scene(target):
+    target.clear(NV3007.BLACK)
+    for i in range(8):
+        target.draw_rect(5, 5 + i * 52, 132, 48, NV3007.WHITE, filled=True)
+
+def draw_text_scene(target):
+    for i in range(10):
+        target.draw_text(5, 10 + i * 40, "索引色文本 %d" % i, NV3007.WHITE)
+
+def full_flush(target):
+    target._mark_dirty(0, 0, target.width - 1, target.height - 1)
+    target.flush()
+
+def benchmark_bpp(name, target):
+    target.set_auto_flush(False)
+    benchmark(f"{name} 清屏", lambda: target.clear(NV3007.BLACK), iterations=5)
+    benchmark(f"{name} 矩形填充", lambda: draw_fill_scene(target), iterations=5)
+    benchmark(f"{name} 文本", lambda: draw_text_scene(target), iterations=5)
+    benchmark(f"{name} 整屏刷新", lambda: full_flush(target), iterations=5)
+    print(f"{name} framebuffer(字节),{len(target._framebuffer)},-,-,1")
+
+benchmark_bpp("RGB565", lcd)
+for bpp in (8, 4, 1):
+    gc.collect()
+    before = gc.mem_alloc()
+    idx_lcd = NV3007(spi, 17, 20, 21, 14, 142, 428, 0, bpp=bpp)
+    idx_bytes = gc.mem_alloc() - before
+    idx_lcd.set_font(font_wqy_16)
+    name = f"{bpp}bpp"
+    benchmark_bpp(name, idx_lcd)
+    print(f"{name} 驱动占用内存(字节),{idx_bytes},-,-,1")
+    del idx_lcd
+gc.collect()
+lcd.set_auto_flush(True)
+
+print("\n【12位RGB444传输】")
+
+def measure_transfer(name, frames=5):
+    counter = CountingSPI(lcd._bus._spi)
+    old_spi = lcd._bus._spi
+    lcd._bus._spi = counter
+    lcd.set_auto_flush(False)
+    benchmark(f"{name} 整屏刷新", lambda: full_flush(lcd), iterations=frames)
+    lcd._bus._spi = old_spi
+    # benchmark() 额外执行一次预热
+    print(f"{name} 每帧字节数,{counter.count // (frames + 1)},-,-,{frames}")
+
+measure_transfer("RGB565")
+
+# RGB444实例需要自己的framebuffer，先释放当前实例
+del lcd
+gc.collect()
+lcd = NV3007(spi, 17, 20, 21, 14, 142, 428, 0, rgb444=True)
+measure_transfer("RGB444")
+del lcd
+gc.collect()
+lcd = NV3007(spi, 17, 20, 21, 14, 142, 428, 0)
+lcd.set_font(font_wqy_16)
+
+print("\n【硬件垂直滚动】")
+
+SCROLL_LINE = font_wqy_16.height()
+SCROLL_ROWS = 428 // SCROLL_LINE
+
+def draw_log_lines(first):
+    lcd.clear(NV3007.BLACK)
+    for i in range(SCROLL_ROWS):
+        lcd.draw_text(2, i * SCROLL_LINE, "日志 %d" % (first + i), NV3007.GREEN)
+
+def measure_scroll(name, hardware, lines=20):
+    """每次向上滚动一行文本；软件方式整屏重绘，硬件方式只绘制露出的一行"""
+    counter = CountingSPI(lcd._bus._spi)
+    old_spi = lcd._bus._spi
+    lcd._bus._spi = counter
+    lcd.set_auto_flush(False)
+    draw_log_lines(0)
+    lcd.flush()
+    if hardware:
+        lcd.scroll_area(0, SCROLL_ROWS * SCROLL_LINE)
+    counter.count = 0
+    y = (SCROLL_ROWS - 1) * SCROLL_LINE
+    start = time.ticks_ms()
+    for i in range(1, lines + 1):
+        if hardware:
+            lcd.scroll(SCROLL_LINE)
+            lcd.draw_rect(0, y, 142, SCROLL_LINE, NV3007.BLACK, filled=True)
+            lcd.draw_text(2, y, "日志 %d" % (SCROLL_ROWS - 1 + i), NV3007.GREEN)
+        else:
+            draw_log_lines(i)
+        lcd.flush()
+    elapsed = time.ticks_diff(time.ticks_ms(), start)
+    if hardware:
+        lcd.scroll_area(0, 428)
+    lcd._bus._spi = old_spi
+    print(f"{name},{elapsed // lines},-,-,{lines}")
+    print(f"{name} 每次字节数,{counter.count // lines},-,-,{lines}")
+
+measure_scroll("滚动一行 (整屏重绘)", False)
+measure_scroll("滚动一行 (硬件滚动)", True)
+lcd.set_auto_flush(True)
+
+print("\n【控制台】")
+
+def console_lines_per_sec(name, write_line, lines=30):
+    start = time.ticks_ms()
+    for i in range(lines):
+        write_line(i)
+    elapsed = time.ticks_diff(time.ticks_ms(), start)
+    print(f"{name},{elapsed // lines},-,-,{lines}")
+    print(f"{name} 行/秒,{lines * 1000 // max(elapsed, 1)},-,-,{lines}")
+
+redraw_log = []
+
+def redraw_write_line(i):
+    # 对照：每输出一行都清屏并重绘所有可见行
+    redraw_log.append("控制台日志 %d" % i)
+    del redraw_log[:-SCROLL_ROWS]
+    lcd.clear(NV3007.BLACK)
+    for row in range(len(redraw_log)):
+        lcd.draw_text(2, row * SCROLL_LINE, redraw_log[row], NV3007.GREEN)
+    lcd.flush()
+
+lcd.set_auto_flush(False)
+console_lines_per_sec("clear()+draw_text 重绘", redraw_write_line)
+console = Console(lcd, font_wqy_16, fg_color=NV3007.GREEN)
+# 先写满一屏，之后每一行都会触发硬件滚动
+for i in range(SCROLL_ROWS):
+    console.write("控制台日志 %d\n" % i)
+console_lines_per_sec("Console.write", lambda i: console.write("控制台日志 %d\n" % i))
+del console
+lcd.scroll_area(0, 428)
+lcd.set_auto_flush(True)
+
+print("\n【双缓冲】")
+
+def render_frame(frame):
+    lcd.clear(NV3007.BLACK)
+    for i in range(6):
+        lcd.draw_circle(71, 40 + i * 70, 25 + (frame + i) % 10, NV3007.GREEN, filled=True)
+    lcd.draw_text(10, 10, "帧 %d" % frame, NV3007.WHITE)
+
+def measure_fps(name, frames=20):
+    lcd.set_auto_flush(False)
+    start = time.ticks_ms()
+    for frame in range(frames):
+        render_frame(frame)
+        lcd.present()
+    lcd.wait()
+    elapsed = time.ticks_diff(time.ticks_ms(), start)
+    print(f"{name},{elapsed // frames},-,-,{frames}")
+    print(f"{name} 帧率(fps),{frames * 1000 // max(elapsed, 1)},-,-,{frames}")
+
+# present() 在单缓冲模式下等同于 flush()
+measure_fps("单缓冲 渲染+刷新")
+
+# 双缓冲需要两份framebuffer，先释放单缓冲实例
+del lcd
+gc.collect()
+try:
+    lcd = NV3007(spi, 17, 20, 21, 14, 142, 428, 0, double_buffer=True)
+    lcd.set_font(font_wqy_16)
+    measure_fps("双缓冲 渲染+后台刷新")
+except MemoryError:
+    print("双缓冲,内存不足跳过,-,-,-")
+    lcd = NV3007(spi, 17, 20, 21, 14, 142, 428, 0)
+    lcd.set_font(font_wqy_16)
+
 print("\n基准测试完成")
 
 # 恢复自动刷新
 lcd.set_auto_flush(True)
 lcd.clear(NV3007.WHITE)
+
+# 等待后台线程发送完最后一帧
+lcd.wait()
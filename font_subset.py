@@ -0,0 +1,187 @@
+"""
+字体子集工具：只保留应用实际用到的字符
+
+在PC上（CPython）运行，从字体模块中取出语料里出现的字符，生成新的font_to_py
+格式稀疏字体模块（.py），或者NV3007二进制字体文件（.bin，格式见nv3007_binfont.py）。
+生成的字体与原字体的get_ch()约定相同，可以直接传给NV3007.set_font()。
+
+语料可以是 .py 文件（提取其中所有字符串常量，包括f-string的常量部分）
+或其他文本文件（使用全部内容）。默认另外保留可打印ASCII字符，
+以便显示运行时格式化的数字和英文。
+
+用法:
+    python font_subset.py font_wqy_16 font_ui.py example.py benchmark.py
+    python font_subset.py font_wqy_16 font_ui.bin strings.txt --chars "℃%" --no-ascii
+"""
+
+import ast
+import sys
+import types
+
+import font_to_bin
+
+
+def corpus_chars(paths):
+    """返回语料文件中出现的字符集合
+
+    参数:
+        paths: 文件路径列表，.py 文件只取字符串常量
+    """
+    chars = set()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        if not path.endswith(".py"):
+            chars.update(source)
+            continue
+        for node in ast.walk(ast.parse(source, path)):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                chars.update(node.value)
+    return chars
+
+
+def _bytes_literal(name, data):
+    """按font_to_py的格式输出bytes常量，每行16字节"""
+    lines = ["{} =\\".format(name)]
+    for i in range(0, len(data), 16):
+        chunk = "".join("\\x{:02x}".format(b) for b in data[i:i + 16])
+        lines.append("b'{}'{}".format(chunk, "\\" if i + 16 < len(data) else ""))
+    if not data:
+        lines.append("b''")
+    return "\n".join(lines) + "\n"
+
+
+def subset_source(font, chars, name="font"):
+    """生成只包含chars中字符的稀疏字体模块源码
+
+    参数:
+        font: font_to_py生成的水平映射字体模块
+        chars: 要保留的字符集合，字体中没有的字符忽略
+        name: 写入文件头注释的原字体名
+
+    返回:
+        (模块源码, 保留的字符数)
+    """
+    if not font.hmap():
+        raise ValueError("only horizontally mapped fonts are supported")
+    height = font.height()
+    # 原字体中没有的码位返回默认字形，放在 _font 开头（偏移0）
+    default = font.get_ch(chr(0))
+    codepoints = sorted(ord(ch) for ch in chars if ord(ch) <= 0xFFFF)
+    glyphs = []
+    for cp in codepoints:
+        glyph = font.get_ch(chr(cp))
+        # 原字体没有的字符返回默认字形，不单独保存
+        if bytes(glyph[0]) == bytes(default[0]) and glyph[2] == default[2]:
+            continue
+        glyphs.append((cp, glyph))
+
+    data = bytearray()
+    sparse = bytearray()
+    for cp, glyph in [(None, default)] + glyphs:
+        bitmap, _, width = glyph
+        offset = len(data)
+        if offset >> 3 > 0xFFFF:
+            raise ValueError("font data larger than 512 KB")
+        if cp is not None:
+            sparse += bytes((cp & 0xFF, cp >> 8, (offset >> 3) & 0xFF, offset >> 11))
+        data += bytes((width & 0xFF, width >> 8))
+        data += bytes(bitmap[:((width + 7) >> 3) * height])
+        # 字形按8字节对齐，_sparse 中保存 偏移 >> 3
+        data += bytes(-len(data) & 7)
+
+    widths = [glyph[2] for _, glyph in glyphs] or [default[2]]
+    source = (
+        "# Code generated by font_subset.py from {name}.\n"
+        "# Chars: {count}\n"
+        "version = '0.42'\n\n"
+        "def height():\n    return {height}\n\n"
+        "def baseline():\n    return {baseline}\n\n"
+        "def max_width():\n    return {max_width}\n\n"
+        "def hmap():\n    return True\n\n"
+        "def reverse():\n    return False\n\n"
+        "def monospaced():\n    return {mono}\n\n"
+        "def min_ch():\n    return {min_ch}\n\n"
+        "def max_ch():\n    return {max_ch}\n\n"
+    ).format(
+        name=name,
+        count=len(glyphs),
+        height=height,
+        baseline=font.baseline() if hasattr(font, "baseline") else height,
+        max_width=max(widths),
+        mono=font.monospaced() if hasattr(font, "monospaced") else False,
+        min_ch=glyphs[0][0] if glyphs else 0,
+        max_ch=glyphs[-1][0] if glyphs else 0,
+    )
+    source += _bytes_literal("_font", data) + "\n"
+    source += _bytes_literal("_sparse", sparse) + "\n"
+    source += (
+        "_mvfont = memoryview(_font)\n"
+        "_mvsp = memoryview(_sparse)\n"
+        "ifb = lambda l : l[0] | (l[1] << 8)\n\n"
+        "def bs(lst, val):\n"
+        "    while True:\n"
+        "        m = (len(lst) & ~ 7) >> 1\n"
+        "        v = ifb(lst[m:])\n"
+        "        if v == val:\n"
+        "            return ifb(lst[m + 2:])\n"
+        "        if not m:\n"
+        "            return 0\n"
+        "        lst = lst[m:] if v < val else lst[:m]\n\n"
+        "def get_ch(ch):\n"
+        "    doff = bs(_mvsp, ord(ch)) << 3\n"
+        "    width = ifb(_mvfont[doff : ])\n\n"
+        "    next_offs = doff + 2 + ((width - 1)//8 + 1) * {height}\n"
+        "    return _mvfont[doff + 2:next_offs], {height}, width\n\n"
+    ).format(height=height)
+    return source, len(glyphs)
+
+
+def subset(font, chars, path, name="font"):
+    """把字体的子集写到path：.bin 写二进制字体文件，否则写字体模块
+
+    返回:
+        保留的字符数
+    """
+    source, count = subset_source(font, chars, name)
+    if path.endswith(".bin"):
+        module = types.ModuleType(name)
+        exec(source, module.__dict__)
+        font_to_bin.convert(module, path)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+    return count
+
+
+def main(argv):
+    args = []
+    extra = ""
+    ascii_chars = True
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--chars" and i + 1 < len(argv):
+            extra += argv[i + 1]
+            i += 2
+            continue
+        if argv[i] == "--no-ascii":
+            ascii_chars = False
+        else:
+            args.append(argv[i])
+        i += 1
+    if len(args) < 3:
+        print("usage: font_subset.py <font_module> <output.py|output.bin> <corpus>... "
+              "[--chars TEXT] [--no-ascii]")
+        return 1
+    name = args[0][:-3] if args[0].endswith(".py") else args[0]
+    chars = corpus_chars(args[2:])
+    chars.update(extra)
+    if ascii_chars:
+        chars.update(chr(cp) for cp in range(32, 127))
+    count = subset(__import__(name), chars, args[1], name)
+    print("{}: {} glyphs".format(args[1], count))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,128 @@
+"""
+从TrueType/OpenType字体生成NV3007抗锯齿二进制字体文件（格式见nv3007_binfont.py）
+
+在PC上（CPython）运行，需要Pillow（pip install pillow）。字形用FreeType按灰度渲染，
+量化为2位（4级）或4位（16级）alpha；draw_text按alpha把前景色与背景色混合，
+字形边缘比1位字体平滑。字符集与font_subset.py相同：语料中出现的字符加可打印ASCII。
+
+用法:
+    python font_to_aa.py DejaVuSans.ttf 16 font_aa_16.bin example.py
+    python font_to_aa.py wqy-microhei.ttc 16 font_ui_aa.bin strings.txt --bpp 2 --chars "℃%"
+
+或者在代码中调用:
+    import font_to_aa
+    font_to_aa.convert("DejaVuSans.ttf", 16, "0123456789:", "clock_aa.bin")
+"""
+
+import sys
+
+import font_to_bin
+from font_subset import corpus_chars
+
+
+def quantize(value, bpp):
+    """把0..255的灰度量化为 bpp 位alpha（四舍五入）"""
+    top = (1 << bpp) - 1
+    return (value * top + 127) // 255
+
+
+def pack(pixels, width, height, bpp):
+    """把灰度像素（行优先，每像素0..255）打包为水平映射的alpha位图
+
+    每行 (width * bpp + 7) >> 3 字节，高位在左
+    """
+    bytes_per_row = (width * bpp + 7) >> 3
+    out = bytearray(bytes_per_row * height)
+    for row in range(height):
+        base = row * bytes_per_row
+        for col in range(width):
+            a = quantize(pixels[row * width + col], bpp)
+            bit = col * bpp
+            out[base + (bit >> 3)] |= a << (8 - bpp - (bit & 7))
+    return bytes(out)
+
+
+def render(path, size, chars, bpp=4):
+    """用Pillow渲染字形
+
+    参数:
+        path: TrueType/OpenType字体文件
+        size: 字号（像素）；字体高度为该字号下的 ascent + descent
+        chars: 要渲染的字符集合（只支持0xFFFF以内的码位）
+        bpp: alpha位数，2或4
+
+    返回:
+        (高度, 码位升序的 [(码位, 位图, 宽度)], 默认字形 (位图, 宽度))
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    if bpp not in (2, 4):
+        raise ValueError("bpp must be 2 or 4")
+    font = ImageFont.truetype(path, size)
+    ascent, descent = font.getmetrics()
+    height = ascent + descent
+
+    def glyph(ch):
+        # 宽度取前进宽度，超出的笔画被裁掉；宽度至少为1
+        width = max(1, int(font.getlength(ch) + 0.5))
+        image = Image.new("L", (width, height), 0)
+        ImageDraw.Draw(image).text((0, 0), ch, font=font, fill=255)
+        return pack(image.tobytes(), width, height, bpp), width
+
+    glyphs = []
+    for cp in sorted(ord(ch) for ch in chars if ord(ch) <= 0xFFFF):
+        bitmap, width = glyph(chr(cp))
+        glyphs.append((cp, bitmap, width))
+    # 字体中没有的字符显示为问号
+    return height, glyphs, glyph("?")
+
+
+def convert(path, size, chars, out, bpp=4):
+    """把TrueType字体中的chars渲染为抗锯齿二进制字体文件
+
+    返回:
+        写入的字符数
+    """
+    height, glyphs, default = render(path, size, chars, bpp)
+    records = [default[0]] + [bitmap for _, bitmap, _ in glyphs]
+    widths = [default[1]] + [width for _, _, width in glyphs]
+    font_to_bin.write(out, height, max(widths), [cp for cp, _, _ in glyphs], records, widths,
+                      font_to_bin.FLAG_4BPP if bpp == 4 else font_to_bin.FLAG_2BPP)
+    return len(glyphs)
+
+
+def main(argv):
+    args = []
+    extra = ""
+    ascii_chars = True
+    bpp = 4
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--chars" and i + 1 < len(argv):
+            extra += argv[i + 1]
+            i += 2
+            continue
+        if argv[i] == "--bpp" and i + 1 < len(argv):
+            bpp = int(argv[i + 1])
+            i += 2
+            continue
+        if argv[i] == "--no-ascii":
+            ascii_chars = False
+        else:
+            args.append(argv[i])
+        i += 1
+    if len(args) < 3:
+        print("usage: font_to_aa.py <font.ttf> <size> <output.bin> [corpus]... "
+              "[--bpp 2|4] [--chars TEXT] [--no-ascii]")
+        return 1
+    chars = corpus_chars(args[3:])
+    chars.update(extra)
+    if ascii_chars:
+        chars.update(chr(cp) for cp in range(32, 127))
+    count = convert(args[0], int(args[1]), chars, args[2], bpp)
+    print("{}: {} glyphs, {} bpp".format(args[2], count, bpp))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
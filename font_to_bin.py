@@ -0,0 +1,158 @@
+"""
+把font_to_py生成的字体模块转换为NV3007二进制字体文件（格式见nv3007_binfont.py）
+
+在PC上（CPython）或设备上（MicroPython）都可以运行:
+    python font_to_bin.py font_wqy_16 font_wqy_16.bin
+    python font_to_bin.py font_wqy_16 font_wqy_16_rle.bin --rle
+
+或者在代码中调用:
+    import font_to_bin, font_wqy_16
+    font_to_bin.convert(font_wqy_16, "font_wqy_16.bin")
+"""
+
+import struct
+import sys
+
+MAGIC = b"NVF1"
+_HEADER_SIZE = 16
+# 文件头标志位：字形以RLE游程字节流保存；字形为2/4位抗锯齿alpha
+FLAG_RLE = 0x01
+FLAG_2BPP = 0x02
+FLAG_4BPP = 0x04
+# RLE字体中长度字节为RAW的字形后跟原始位图（游程字节流不比位图短）
+RAW = 0xFF
+
+
+def encode_rle(bitmap, width, height):
+    """把1位水平映射字形编码为RLE游程字节流（格式见nv3007.py中的_rle_py）
+
+    参数:
+        bitmap: 字形位图，每行 (width + 7) >> 3 字节，高位在左
+        width, height: 字形尺寸
+
+    返回:
+        bytearray
+    """
+    bytes_per_row = (width + 7) >> 3
+    out = bytearray()
+    cursor = 0
+    for row in range(height):
+        base = row * bytes_per_row
+        col = 0
+        while col < width:
+            if not (bitmap[base + (col >> 3)] >> (7 - (col & 7))) & 1:
+                col += 1
+                continue
+            start = col
+            while col < width and (bitmap[base + (col >> 3)] >> (7 - (col & 7))) & 1:
+                col += 1
+            skip = row * width + start - cursor
+            cursor = row * width + col
+            # 跳过15个以上的像素用前进字节，每个最多前进 15 * 16 个像素
+            while skip >= 15:
+                k = min(skip // 15, 16)
+                out.append(0xF0 | (k - 1))
+                skip -= 15 * k
+            n = col - start
+            while n > 16:
+                out.append((skip << 4) | 15)
+                skip = 0
+                n -= 16
+            out.append((skip << 4) | (n - 1))
+    return out
+
+
+def convert(font, path, rle=False):
+    """把字体模块写成二进制字体文件
+
+    参数:
+        font: font_to_py生成的水平映射字体模块（稀疏或连续字符集）
+        path: 输出文件路径
+        rle: 字形以RLE游程字节流保存，draw_text按游程直接填充，不再逐位展开；
+             游程字节流不比原始位图短的字形仍保存为位图，文件不会比原始格式大很多
+
+    返回:
+        写入的字符数
+    """
+    if not font.hmap():
+        raise ValueError("only horizontally mapped fonts are supported")
+    if hasattr(font, "_sparse"):
+        sparse = font._sparse
+        codepoints = [sparse[i] | (sparse[i + 1] << 8) for i in range(0, len(sparse), 4)]
+    else:
+        codepoints = list(range(font.min_ch(), font.max_ch() + 1))
+    if codepoints and codepoints[-1] > 0xFFFF:
+        raise ValueError("codepoints above 0xFFFF are not supported")
+    # 字体中没有的码位返回默认字形
+    missing = 0
+    present = set(codepoints)
+    while missing in present:
+        missing += 1
+    height = font.height()
+    records = []
+    widths = []
+    for bitmap, _, width in [font.get_ch(chr(missing))] + [font.get_ch(chr(cp)) for cp in codepoints]:
+        raw = bytes(bitmap[:((width + 7) >> 3) * height])
+        if rle:
+            stream = encode_rle(bitmap, width, height)
+            if len(stream) >= len(raw):
+                records.append(bytes((RAW,)) + raw)
+            elif len(stream) >= RAW:
+                raise ValueError("RLE glyph longer than 254 bytes, use the raw format")
+            else:
+                records.append(bytes((len(stream),)) + stream)
+        else:
+            records.append(raw)
+        widths.append(width)
+    write(path, height, max(widths + [font.max_width()]), codepoints, records, widths,
+          FLAG_RLE if rle else 0)
+    return len(codepoints)
+
+
+def write(path, height, max_width, codepoints, records, widths, flags=0):
+    """写二进制字体文件
+
+    参数:
+        path: 输出文件路径
+        height, max_width: 字体高度和最大字形宽度
+        codepoints: 升序码位列表
+        records: 字形数据列表，第一项为默认字形，其余与codepoints一一对应
+        widths: 与records对应的字形宽度
+        flags: 文件头标志（FLAG_RLE、FLAG_2BPP、FLAG_4BPP）
+    """
+    if max(widths) > 255:
+        raise ValueError("glyph wider than 255 pixels")
+    n = len(codepoints)
+    offset = _HEADER_SIZE + n * 6
+    entries = []
+    for record, width in zip(records, widths):
+        entries.append(offset | (width << 24))
+        offset += len(record)
+    if offset > 0xFFFFFF:
+        raise ValueError("font data larger than 16 MB")
+    # RLE字形的槽位大小由最长的游程字节流决定（按位图保存的字形另按最大宽度计算）
+    max_record = 0
+    if flags & FLAG_RLE:
+        max_record = max([record[0] for record in records if record[0] != RAW] or [0])
+
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sBBHIBBH", MAGIC, height, max_width, n, entries[0],
+                            flags, max_record, 0))
+        for cp in codepoints:
+            f.write(struct.pack("<H", cp))
+        for entry in entries[1:]:
+            f.write(struct.pack("<I", entry))
+        for record in records:
+            f.write(record)
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--rle"]
+    if len(args) != 2:
+        print("usage: font_to_bin.py <font_module> <output.bin> [--rle]")
+        sys.exit(1)
+    name = args[0]
+    if name.endswith(".py"):
+        name = name[:-3]
+    count = convert(__import__(name), args[1], "--rle" in sys.argv)
+    print("{}: {} glyphs".format(args[1], count))
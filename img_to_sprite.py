@@ -0,0 +1,102 @@
+"""
+把图片或RGB565位图编码为NV3007 RLE精灵（NV3007.draw_sprite使用的格式）
+
+精灵格式: 宽度和高度（各2字节，小端），之后按行保存游程，每个游程一个控制字节：
+高位为1时后跟 (低7位 + 1) 个RGB565像素（高字节在前），高位为0时跳过
+(低7位 + 1) 个透明像素。游程不跨行，每个游程最多128个像素。
+
+在PC上（CPython）运行；从PNG等图片转换需要Pillow（pip install pillow），
+alpha小于128的像素为透明:
+    python img_to_sprite.py icon.png icon.spr
+    python img_to_sprite.py logo.bmp logo.spr --key 0xF81F
+
+encode()只用到纯Python，也可以在设备上调用:
+    import img_to_sprite
+    sprite = img_to_sprite.encode(bitmap, 32, 32, key=0xF81F)
+"""
+
+import struct
+import sys
+
+
+def encode_mask(bitmap, w, h, opaque):
+    """按不透明标志把RGB565位图编码为精灵
+
+    参数:
+        bitmap: RGB565位图，每像素2字节（高字节在前），按行排列
+        w, h: 位图尺寸
+        opaque: 长度为 w * h 的序列，为真的像素不透明
+
+    返回:
+        bytearray
+    """
+    out = bytearray(struct.pack("<HH", w, h))
+    for row in range(h):
+        base = row * w
+        col = 0
+        while col < w:
+            solid = bool(opaque[base + col])
+            start = col
+            while col < w and col - start < 128 and bool(opaque[base + col]) == solid:
+                col += 1
+            n = col - start
+            if solid:
+                out.append(0x80 | (n - 1))
+                out += bitmap[(base + start) * 2:(base + col) * 2]
+            else:
+                out.append(n - 1)
+    return out
+
+
+def encode(bitmap, w, h, key=None):
+    """把RGB565位图编码为精灵，颜色等于key的像素透明（key为None时全部不透明）"""
+    opaque = [key is None or ((bitmap[i * 2] << 8) | bitmap[i * 2 + 1]) != key
+              for i in range(w * h)]
+    return encode_mask(bitmap, w, h, opaque)
+
+
+def encode_image(path, key=None):
+    """用Pillow读取图片并编码为精灵
+
+    有alpha通道的图片中alpha小于128的像素透明；另外颜色（转换为RGB565后）
+    等于key的像素也透明
+    """
+    from PIL import Image
+
+    image = Image.open(path).convert("RGBA")
+    w, h = image.size
+    bitmap = bytearray()
+    opaque = []
+    rgba = image.tobytes()
+    for i in range(0, len(rgba), 4):
+        c = ((rgba[i] >> 3) << 11) | ((rgba[i + 1] >> 2) << 5) | (rgba[i + 2] >> 3)
+        bitmap.append(c >> 8)
+        bitmap.append(c & 0xFF)
+        opaque.append(rgba[i + 3] >= 128 and c != key)
+    return encode_mask(bitmap, w, h, opaque)
+
+
+def main(argv):
+    key = None
+    args = []
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--key" and i + 1 < len(argv):
+            key = int(argv[i + 1], 0)
+            i += 2
+            continue
+        args.append(argv[i])
+        i += 1
+    if len(args) != 2:
+        print("usage: img_to_sprite.py <image> <output.spr> [--key 0xF81F]")
+        return 1
+    sprite = encode_image(args[0], key)
+    with open(args[1], "wb") as f:
+        f.write(sprite)
+    w, h = struct.unpack("<HH", sprite[:4])
+    print("{}: {}x{}, {} bytes (RGB565 {} bytes)".format(args[1], w, h, len(sprite), w * h * 2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -6,23 +6,991 @@ import time
 import math
 import gc
 import micropython
+from array import array
 from machine import SPI, Pin
 
-def _viper_set_pixel(fb, fb_width, x, y, color_hi, color_lo):
-    """Viper优化的像素设置（内联辅助函数）"""
-    offset = (y * fb_width + x) * 2
-    fb[offset] = color_hi
-    fb[offset + 1] = color_lo
-
-def _viper_fill_row(fb, fb_width, y, x_start, x_end, color_hi, color_lo):
-    """Viper优化的行填充"""
-    offset = (y * fb_width + x_start) * 2
-    w = x_end - x_start + 1
-    for i in range(w * 2):
-        if (i & 1) == 0:
-            fb[offset + i] = color_hi
+try:
+    from binascii import crc32
+except ImportError:
+    crc32 = None
+
+try:
+    import framebuf
+except ImportError:
+    framebuf = None
+
+# 初始化序列，每条记录为 (命令, 参数个数, 延时ms, 参数...)
+_INIT_SEQ = bytes((
+    # 解锁并配置寄存器
+    0xFF, 1, 0, 0xA5,
+    0x9A, 1, 0, 0x08,
+    0x9B, 1, 0, 0x08,
+    0x9C, 1, 0, 0xB0,
+    0x9D, 1, 0, 0x16,
+    0x9E, 1, 0, 0xC4,
+    0x8F, 2, 0, 0x55, 0x04,
+    0x84, 1, 0, 0x90,
+    0x83, 1, 0, 0x7B,
+    0x85, 1, 0, 0x33,
+    0x60, 1, 0, 0x00,
+    0x70, 1, 0, 0x00,
+    0x61, 1, 0, 0x02,
+    0x71, 1, 0, 0x02,
+    0x62, 1, 0, 0x04,
+    0x72, 1, 0, 0x04,
+    0x6C, 1, 0, 0x29,
+    0x7C, 1, 0, 0x29,
+    0x6D, 1, 0, 0x31,
+    0x7D, 1, 0, 0x31,
+    0x6E, 1, 0, 0x0F,
+    0x7E, 1, 0, 0x0F,
+    0x66, 1, 0, 0x21,
+    0x76, 1, 0, 0x21,
+    0x68, 1, 0, 0x3A,
+    0x78, 1, 0, 0x3A,
+    0x63, 1, 0, 0x07,
+    0x73, 1, 0, 0x07,
+    0x64, 1, 0, 0x05,
+    0x74, 1, 0, 0x05,
+    0x65, 1, 0, 0x02,
+    0x75, 1, 0, 0x02,
+    0x67, 1, 0, 0x23,
+    0x77, 1, 0, 0x23,
+    0x69, 1, 0, 0x08,
+    0x79, 1, 0, 0x08,
+    0x6A, 1, 0, 0x13,
+    0x7A, 1, 0, 0x13,
+    0x6B, 1, 0, 0x13,
+    0x7B, 1, 0, 0x13,
+    0x6F, 1, 0, 0x00,
+    0x7F, 1, 0, 0x00,
+    0x50, 1, 0, 0x00,
+    0x52, 1, 0, 0xD6,
+    0x53, 1, 0, 0x08,
+    0x54, 1, 0, 0x08,
+    0x55, 1, 0, 0x1E,
+    0x56, 1, 0, 0x1C,
+    # GOA配置
+    0xA0, 3, 0, 0x2B, 0x24, 0x00,
+    0xA1, 1, 0, 0x87,
+    0xA2, 1, 0, 0x86,
+    0xA5, 1, 0, 0x00,
+    0xA6, 1, 0, 0x00,
+    0xA7, 1, 0, 0x00,
+    0xA8, 1, 0, 0x36,
+    0xA9, 1, 0, 0x7E,
+    0xAA, 1, 0, 0x7E,
+    0xB9, 1, 0, 0x85,
+    0xBA, 1, 0, 0x84,
+    0xBB, 1, 0, 0x83,
+    0xBC, 1, 0, 0x82,
+    0xBD, 1, 0, 0x81,
+    0xBE, 1, 0, 0x80,
+    0xBF, 1, 0, 0x01,
+    0xC0, 1, 0, 0x02,
+    0xC1, 1, 0, 0x00,
+    0xC2, 1, 0, 0x00,
+    0xC3, 1, 0, 0x00,
+    0xC4, 1, 0, 0x33,
+    0xC5, 1, 0, 0x7E,
+    0xC6, 1, 0, 0x7E,
+    0xC8, 2, 0, 0x33, 0x33,
+    0xC9, 1, 0, 0x68,
+    0xCA, 1, 0, 0x69,
+    0xCB, 1, 0, 0x6A,
+    0xCC, 1, 0, 0x6B,
+    0xCD, 2, 0, 0x33, 0x33,
+    0xCE, 1, 0, 0x6C,
+    0xCF, 1, 0, 0x6D,
+    0xD0, 1, 0, 0x6E,
+    0xD1, 1, 0, 0x6F,
+    0xAB, 2, 0, 0x03, 0x67,
+    0xAC, 2, 0, 0x03, 0x6B,
+    0xAD, 2, 0, 0x03, 0x68,
+    0xAE, 2, 0, 0x03, 0x6C,
+    0xB3, 1, 0, 0x00,
+    0xB4, 1, 0, 0x00,
+    0xB5, 1, 0, 0x00,
+    0xB6, 1, 0, 0x32,
+    0xB7, 1, 0, 0x7E,
+    0xB8, 1, 0, 0x7E,
+    # Gamma和显示配置
+    0xE0, 1, 0, 0x00,
+    0xE1, 2, 0, 0x03, 0x0F,
+    0xE2, 1, 0, 0x04,
+    0xE3, 1, 0, 0x01,
+    0xE4, 1, 0, 0x0E,
+    0xE5, 1, 0, 0x01,
+    0xE6, 1, 0, 0x19,
+    0xE7, 1, 0, 0x10,
+    0xE8, 1, 0, 0x10,
+    0xEA, 1, 0, 0x12,
+    0xEB, 1, 0, 0xD0,
+    0xEC, 1, 0, 0x04,
+    0xED, 1, 0, 0x07,
+    0xEE, 1, 0, 0x07,
+    0xEF, 1, 0, 0x09,
+    0xF0, 1, 0, 0xD0,
+    0xF1, 1, 0, 0x0E,
+    0xF9, 1, 0, 0x17,
+    0xF2, 4, 0, 0x2C, 0x1B, 0x0B, 0x20,
+    0xE9, 1, 0, 0x29,
+    0xEC, 1, 0, 0x04,
+    # TE配置
+    0x35, 1, 0, 0x00,
+    0x44, 2, 0, 0x00, 0x10,
+    0x46, 1, 0, 0x10,
+    0xFF, 1, 0, 0x00,
+    0x3A, 1, 0, 0x05,
+))
+
+# MADCTL（0x36）参数，按rotation索引
+_MADCTL = b'\x00\xC0\x60\xA0'
+
+# 帧存储器行数，VSCRDEF的三个区域之和必须等于它
+_GRAM_ROWS = 428
+
+# 抗锯齿混合表缓存的最大表数（4位字体每张32字节）
+_AA_LUT_MAX = 32
+
+# RGB565刷新时行缓冲区的最小字节数，整行宽度的区域每次复制其中放得下的整行数
+_FLUSH_LINE_BYTES = 2048
+
+# 退出睡眠并打开显示（在设置旋转方向之后执行）
+_INIT_SEQ_ON = bytes((
+    0x11, 0, 120,
+    0x29, 0, 10,
+))
+
+# ---- 光栅化内核 ----
+# 每个后端提供一组签名相同的函数。viper函数最多接受4个参数，
+# 因此超过4个的整数参数通过预分配的array('i')（args）传入。
+#
+#   fill_span(buf, offset, nbytes, color)   从offset开始写nbytes字节的 (color>>8, color&0xFF) 重复序列
+#   plot(buf, offset, last, color)          写一个像素：buf[offset]=高字节，buf[offset+last]=低字节
+#   glyph(src, dst, args, color)            把1位字形中置位的像素写入dst（可选写入背景色），args见_glyph_py
+#   bitmap(src, dst, args, color)           同上，源为draw_bitmap的纵向字节格式，args见_bitmap_py
+#   spans(dst, runs, args, color)           按字形缓存中的游程表填充，args见_spans_py
+#   rle(src, dst, args, color)              按RLE字形的游程字节流填充（可裁剪），args见_rle_py
+#   aa(src, dst, args, lut)                 按2/4位抗锯齿字形的alpha查表写入颜色，args见_aa_py
+#   aa_over(src, dst, args, lut_for)        同上，与framebuffer中已有的RGB565像素混合（透明文本）
+#   sprite(dst, src, args)                  按RLE精灵的游程切片复制不透明像素（可裁剪），args见_sprite_py
+#   copy_rows(dst, src, args)               复制count行，args为 (dst_off, src_off, nbytes, count, dst_stride, src_stride)
+#   copy16(src, dst, palette, args)         把src中从字节偏移args[0]开始的args[1]个RGB565像素复制到dst开头，
+#                                           刷新部分区域时用（python/native逐字节复制，比切片慢但不产生切片对象）
+#   expand8/expand4/expand1(src, dst, palette, args)
+#                                           把src中从args[0]开始的args[1]个索引色像素展开为RGB565
+#   pack444(src, dst, palette, args)        把src中从args[0]开始的args[1]个RGB565像素打包为RGB444
+
+def _fill_span_py(buf, offset, nbytes, color):
+    """纯Python：先写一个像素，再成倍复制已写入的部分（切片复制由C完成）"""
+    if nbytes <= 0:
+        return
+    buf[offset] = color >> 8
+    if nbytes > 1:
+        buf[offset + 1] = color & 0xFF
+    done = 2
+    while done < nbytes:
+        n = min(done, nbytes - done)
+        buf[offset + done:offset + done + n] = buf[offset:offset + n]
+        done += n
+
+def _plot_py(buf, offset, last, color):
+    buf[offset] = color >> 8
+    buf[offset + last] = color & 0xFF
+
+def _glyph_py(src, dst, args, color):
+    """把1位字形（每行高位在前）中置位的像素写入dst
+
+    args: (src_off, src_stride, col0, ncols, nrows, dst_off, dst_stride, step, bg)
+    src_off为第一行在src中的偏移，col0..col0+ncols-1为要绘制的列，
+    dst_off为第一个像素在dst中的偏移，step为每像素字节数；
+    bg为-1时未置位的像素保持不变，否则写入背景色bg（不透明文本）
+    """
+    hi = color >> 8
+    lo = color & 0xFF
+    src_off = args[0]
+    src_stride = args[1]
+    col0 = args[2]
+    col_end = col0 + args[3]
+    dst_off = args[5]
+    dst_stride = args[6]
+    step = args[7]
+    bg = args[8]
+    last = step - 1
+    for _ in range(args[4]):
+        o = dst_off
+        if bg >= 0:
+            # 整行先用切片倍增填成背景色，再只写前景像素
+            _fill_span_py(dst, o, args[3] * step, bg)
+        for col in range(col0, col_end):
+            if (src[src_off + (col >> 3)] >> (7 - (col & 7))) & 1:
+                dst[o] = hi
+                dst[o + last] = lo
+            o += step
+        src_off += src_stride
+        dst_off += dst_stride
+
+def _bitmap_py(src, dst, args, color):
+    """把纵向字节位图（每字节为一列中的8行，高位在上）中置位的像素写入dst
+
+    args: (src_w, col0, ncols, row0, nrows, dst_off, dst_stride, step)
+    src_w为位图宽度，dst_off为 (row0, col0) 像素在dst中的偏移
+    """
+    hi = color >> 8
+    lo = color & 0xFF
+    src_w = args[0]
+    col0 = args[1]
+    col_end = col0 + args[2]
+    row = args[3]
+    row_end = row + args[4]
+    dst_off = args[5]
+    dst_stride = args[6]
+    step = args[7]
+    last = step - 1
+    while row < row_end:
+        base = (row >> 3) * src_w
+        shift = 7 - (row & 7)
+        o = dst_off
+        for col in range(col0, col_end):
+            if (src[base + col] >> shift) & 1:
+                dst[o] = hi
+                dst[o + last] = lo
+            o += step
+        dst_off += dst_stride
+        row += 1
+
+def _spans_py(dst, runs, args, color):
+    """按游程表填充像素
+
+    runs: array('i')，每个游程为 (相对像素偏移, 像素数)
+    args: (dst_off, 游程数, step)，像素偏移乘以step后加上dst_off即为dst中的位置
+    """
+    base = args[0]
+    step = args[2]
+    for k in range(0, args[1] * 2, 2):
+        _fill_span_py(dst, base + runs[k] * step, runs[k + 1] * step, color)
+
+def _rle_py(src, dst, args, color):
+    """按RLE字形的游程字节流填充像素
+
+    字节流中每个字节为 (跳过的像素数 << 4) | (游程长度 - 1)，跳过数为0..14；
+    高4位为15时光标前进 15 * (低4位 + 1) 个像素，不绘制。光标在字形内按行优先移动，
+    游程不跨行。
+    args: (src_off, nbytes, width, col0, col1, row0, row1, dst_off, dst_stride, step)
+    只绘制落在列 [col0, col1)、行 [row0, row1) 内的部分，
+    dst_off为 (row0, col0) 像素在dst中的偏移
+    """
+    i = args[0]
+    end = i + args[1]
+    width = args[2]
+    col0 = args[3]
+    col1 = args[4]
+    row0 = args[5]
+    row1 = args[6]
+    dst_off = args[7]
+    dst_stride = args[8]
+    step = args[9]
+    row = 0
+    col = 0
+    while i < end:
+        b = src[i]
+        i += 1
+        if b >= 0xF0:
+            col += 15 * ((b & 0x0F) + 1)
         else:
-            fb[offset + i] = color_lo
+            col += b >> 4
+        while col >= width:
+            col -= width
+            row += 1
+        if row >= row1:
+            return
+        if b >= 0xF0:
+            continue
+        n = (b & 0x0F) + 1
+        if row >= row0:
+            c0 = max(col, col0)
+            c1 = min(col + n, col1)
+            if c0 < c1:
+                _fill_span_py(dst, dst_off + (row - row0) * dst_stride + (c0 - col0) * step, (c1 - c0) * step, color)
+        col += n
+
+def _aa_py(src, dst, args, lut):
+    """按2/4位抗锯齿字形（每行高位在前）的alpha查表写入像素
+
+    args: (src_off, src_stride, col0, ncols, nrows, dst_off, dst_stride, step, bpp, min_alpha)
+    前8项与_glyph_py相同；bpp为每像素alpha位数，alpha不小于min_alpha的像素写入
+    lut[alpha * 2]（高字节）和 lut[alpha * 2 + 1]（低字节）
+    """
+    src_off = args[0]
+    src_stride = args[1]
+    col0 = args[2]
+    col_end = col0 + args[3]
+    dst_off = args[5]
+    dst_stride = args[6]
+    step = args[7]
+    bpp = args[8]
+    min_alpha = args[9]
+    mask = (1 << bpp) - 1
+    last = step - 1
+    for _ in range(args[4]):
+        o = dst_off
+        for col in range(col0, col_end):
+            bit = col * bpp
+            a = (src[src_off + (bit >> 3)] >> (8 - bpp - (bit & 7))) & mask
+            if a >= min_alpha:
+                dst[o] = lut[a << 1]
+                dst[o + last] = lut[(a << 1) + 1]
+            o += step
+        src_off += src_stride
+        dst_off += dst_stride
+
+def _aa_over_py(src, dst, args, lut_for):
+    """把抗锯齿字形与RGB565 framebuffer中已有的像素混合（透明文本）
+
+    args同_aa_py（step为2，min_alpha不使用）。alpha为0的像素保持不变，
+    最大alpha直接写入前景色，其余像素读出背景色，用 lut_for(背景色) 返回的
+    混合表查表；相邻像素背景色相同时复用上一张表
+    """
+    src_off = args[0]
+    src_stride = args[1]
+    col0 = args[2]
+    col_end = col0 + args[3]
+    dst_off = args[5]
+    dst_stride = args[6]
+    bpp = args[8]
+    top = (1 << bpp) - 1
+    fg = lut_for(0)
+    fg_hi = fg[top << 1]
+    fg_lo = fg[(top << 1) + 1]
+    last_bg = -1
+    lut = fg
+    for _ in range(args[4]):
+        o = dst_off
+        for col in range(col0, col_end):
+            bit = col * bpp
+            a = (src[src_off + (bit >> 3)] >> (8 - bpp - (bit & 7))) & top
+            if a == top:
+                dst[o] = fg_hi
+                dst[o + 1] = fg_lo
+            elif a:
+                bg = (dst[o] << 8) | dst[o + 1]
+                if bg != last_bg:
+                    lut = lut_for(bg)
+                    last_bg = bg
+                dst[o] = lut[a << 1]
+                dst[o + 1] = lut[(a << 1) + 1]
+            o += 2
+        src_off += src_stride
+        dst_off += dst_stride
+
+def _sprite_py(dst, src, args):
+    """按RLE精灵的游程把不透明像素复制到RGB565 dst
+
+    src为memoryview，从args[0]开始每个游程一个控制字节：高位为1时后跟
+    (低7位 + 1) 个RGB565像素（高字节在前），高位为0时跳过 (低7位 + 1) 个透明像素。
+    游程不跨行，每行的游程长度之和等于宽度。
+    args: (src_off, width, col0, col1, row0, row1, dst_off, dst_stride)
+    只绘制落在列 [col0, col1)、行 [row0, row1) 内的部分，
+    dst_off为 (row0, col0) 像素在dst中的偏移；不透明游程由切片复制一次写入
+    """
+    i = args[0]
+    width = args[1]
+    col0 = args[2]
+    col1 = args[3]
+    row0 = args[4]
+    row1 = args[5]
+    dst_off = args[6]
+    dst_stride = args[7]
+    row = 0
+    col = 0
+    while row < row1:
+        c = src[i]
+        i += 1
+        n = (c & 0x7F) + 1
+        if c & 0x80:
+            if row >= row0:
+                c0 = max(col, col0)
+                c1 = min(col + n, col1)
+                if c0 < c1:
+                    d = dst_off + (row - row0) * dst_stride + (c0 - col0) * 2
+                    k = i + (c0 - col) * 2
+                    dst[d:d + (c1 - c0) * 2] = src[k:k + (c1 - c0) * 2]
+            i += n * 2
+        col += n
+        if col >= width:
+            col = 0
+            row += 1
+
+def _copy_rows_py(dst, src, args):
+    """逐行切片复制（切片复制由C完成，native版本没有额外收益）"""
+    d = args[0]
+    s = args[1]
+    n = args[2]
+    for _ in range(args[3]):
+        dst[d:d + n] = src[s:s + n]
+        d += args[4]
+        s += args[5]
+
+@micropython.native
+def _fill_span_native(buf, offset, nbytes, color):
+    hi = color >> 8
+    lo = color & 0xFF
+    end = offset + nbytes
+    i = offset
+    while i < end - 1:
+        buf[i] = hi
+        buf[i + 1] = lo
+        i += 2
+    if i < end:
+        buf[i] = hi
+
+@micropython.native
+def _plot_native(buf, offset, last, color):
+    buf[offset] = color >> 8
+    buf[offset + last] = color & 0xFF
+
+@micropython.native
+def _glyph_native(src, dst, args, color):
+    hi = color >> 8
+    lo = color & 0xFF
+    src_off = args[0]
+    src_stride = args[1]
+    col0 = args[2]
+    col_end = col0 + args[3]
+    dst_off = args[5]
+    dst_stride = args[6]
+    step = args[7]
+    bg = args[8]
+    opaque = bg >= 0
+    bg_hi = (bg >> 8) & 0xFF
+    bg_lo = bg & 0xFF
+    last = step - 1
+    for _ in range(args[4]):
+        o = dst_off
+        for col in range(col0, col_end):
+            if (src[src_off + (col >> 3)] >> (7 - (col & 7))) & 1:
+                dst[o] = hi
+                dst[o + last] = lo
+            elif opaque:
+                dst[o] = bg_hi
+                dst[o + last] = bg_lo
+            o += step
+        src_off += src_stride
+        dst_off += dst_stride
+
+@micropython.native
+def _bitmap_native(src, dst, args, color):
+    hi = color >> 8
+    lo = color & 0xFF
+    src_w = args[0]
+    col0 = args[1]
+    col_end = col0 + args[2]
+    row = args[3]
+    row_end = row + args[4]
+    dst_off = args[5]
+    dst_stride = args[6]
+    step = args[7]
+    last = step - 1
+    while row < row_end:
+        base = (row >> 3) * src_w
+        shift = 7 - (row & 7)
+        o = dst_off
+        for col in range(col0, col_end):
+            if (src[base + col] >> shift) & 1:
+                dst[o] = hi
+                dst[o + last] = lo
+            o += step
+        dst_off += dst_stride
+        row += 1
+
+@micropython.native
+def _spans_native(dst, runs, args, color):
+    base = args[0]
+    step = args[2]
+    for k in range(0, args[1] * 2, 2):
+        _fill_span_native(dst, base + runs[k] * step, runs[k + 1] * step, color)
+
+@micropython.native
+def _rle_native(src, dst, args, color):
+    i = args[0]
+    end = i + args[1]
+    width = args[2]
+    col0 = args[3]
+    col1 = args[4]
+    row0 = args[5]
+    row1 = args[6]
+    dst_off = args[7]
+    dst_stride = args[8]
+    step = args[9]
+    row = 0
+    col = 0
+    while i < end:
+        b = src[i]
+        i += 1
+        if b >= 0xF0:
+            col += 15 * ((b & 0x0F) + 1)
+        else:
+            col += b >> 4
+        while col >= width:
+            col -= width
+            row += 1
+        if row >= row1:
+            return
+        if b >= 0xF0:
+            continue
+        n = (b & 0x0F) + 1
+        if row >= row0:
+            c0 = max(col, col0)
+            c1 = min(col + n, col1)
+            if c0 < c1:
+                _fill_span_native(dst, dst_off + (row - row0) * dst_stride + (c0 - col0) * step, (c1 - c0) * step, color)
+        col += n
+
+@micropython.native
+def _aa_native(src, dst, args, lut):
+    src_off = args[0]
+    src_stride = args[1]
+    col0 = args[2]
+    col_end = col0 + args[3]
+    dst_off = args[5]
+    dst_stride = args[6]
+    step = args[7]
+    bpp = args[8]
+    min_alpha = args[9]
+    mask = (1 << bpp) - 1
+    last = step - 1
+    for _ in range(args[4]):
+        o = dst_off
+        for col in range(col0, col_end):
+            bit = col * bpp
+            a = (src[src_off + (bit >> 3)] >> (8 - bpp - (bit & 7))) & mask
+            if a >= min_alpha:
+                dst[o] = lut[a << 1]
+                dst[o + last] = lut[(a << 1) + 1]
+            o += step
+        src_off += src_stride
+        dst_off += dst_stride
+
+@micropython.native
+def _aa_over_native(src, dst, args, lut_for):
+    src_off = args[0]
+    src_stride = args[1]
+    col0 = args[2]
+    col_end = col0 + args[3]
+    dst_off = args[5]
+    dst_stride = args[6]
+    bpp = args[8]
+    top = (1 << bpp) - 1
+    fg = lut_for(0)
+    fg_hi = fg[top << 1]
+    fg_lo = fg[(top << 1) + 1]
+    last_bg = -1
+    lut = fg
+    for _ in range(args[4]):
+        o = dst_off
+        for col in range(col0, col_end):
+            bit = col * bpp
+            a = (src[src_off + (bit >> 3)] >> (8 - bpp - (bit & 7))) & top
+            if a == top:
+                dst[o] = fg_hi
+                dst[o + 1] = fg_lo
+            elif a:
+                bg = (dst[o] << 8) | dst[o + 1]
+                if bg != last_bg:
+                    lut = lut_for(bg)
+                    last_bg = bg
+                dst[o] = lut[a << 1]
+                dst[o + 1] = lut[(a << 1) + 1]
+            o += 2
+        src_off += src_stride
+        dst_off += dst_stride
+
+@micropython.native
+def _sprite_native(dst, src, args):
+    i = args[0]
+    width = args[1]
+    col0 = args[2]
+    col1 = args[3]
+    row0 = args[4]
+    row1 = args[5]
+    dst_off = args[6]
+    dst_stride = args[7]
+    row = 0
+    col = 0
+    while row < row1:
+        c = src[i]
+        i += 1
+        n = (c & 0x7F) + 1
+        if c & 0x80:
+            if row >= row0:
+                c0 = max(col, col0)
+                c1 = min(col + n, col1)
+                if c0 < c1:
+                    d = dst_off + (row - row0) * dst_stride + (c0 - col0) * 2
+                    k = i + (c0 - col) * 2
+                    dst[d:d + (c1 - c0) * 2] = src[k:k + (c1 - c0) * 2]
+            i += n * 2
+        col += n
+        if col >= width:
+            col = 0
+            row += 1
+
+def _copy16_py(src, dst, palette, args):
+    """逐字节复制RGB565像素到行缓冲区开头"""
+    i = args[0]
+    for j in range(args[1] * 2):
+        dst[j] = src[i + j]
+
+@micropython.native
+def _copy16_native(src, dst, palette, args):
+    """逐像素复制RGB565到行缓冲区开头"""
+    i = args[0]
+    n = args[1] * 2
+    j = 0
+    while j < n:
+        dst[j] = src[i]
+        dst[j + 1] = src[i + 1]
+        i += 2
+        j += 2
+
+@micropython.native
+def _expand8_native(src, dst, palette, args):
+    """8位调色板索引展开为RGB565字节"""
+    j = 0
+    offset = args[0]
+    for i in range(offset, offset + args[1]):
+        k = src[i] << 1
+        dst[j] = palette[k]
+        dst[j + 1] = palette[k + 1]
+        j += 2
+
+@micropython.native
+def _expand4_native(src, dst, palette, args):
+    """4位调色板索引（每字节2个，高4位在前）展开为RGB565字节"""
+    j = 0
+    end = args[1] * 2
+    i = args[0]
+    while j < end:
+        b = src[i]
+        k = (b >> 4) << 1
+        dst[j] = palette[k]
+        dst[j + 1] = palette[k + 1]
+        j += 2
+        if j < end:
+            k = (b & 0x0F) << 1
+            dst[j] = palette[k]
+            dst[j + 1] = palette[k + 1]
+            j += 2
+        i += 1
+
+@micropython.native
+def _expand1_native(src, dst, palette, args):
+    """1位像素（每字节8个，最高位在前）展开为RGB565字节"""
+    bg_hi = palette[0]
+    bg_lo = palette[1]
+    fg_hi = palette[2]
+    fg_lo = palette[3]
+    j = 0
+    end = args[1] * 2
+    i = args[0]
+    while j < end:
+        b = src[i]
+        mask = 0x80
+        while mask and j < end:
+            if b & mask:
+                dst[j] = fg_hi
+                dst[j + 1] = fg_lo
+            else:
+                dst[j] = bg_hi
+                dst[j + 1] = bg_lo
+            j += 2
+            mask >>= 1
+        i += 1
+
+@micropython.native
+def _pack444_native(src, dst, palette, args):
+    """RGB565像素（个数为偶数）打包为RGB444，每2个像素3字节
+
+    dst可以就是src（args[0]为0时逐对原地转换，写入位置不会超过读取位置）
+    """
+    j = 0
+    offset = args[0]
+    for i in range(offset, offset + args[1] * 2, 4):
+        hi = src[i]
+        lo = src[i + 1]
+        r1 = hi >> 4
+        g1 = ((hi & 0x07) << 1) | (lo >> 7)
+        b1 = (lo >> 1) & 0x0F
+        hi = src[i + 2]
+        lo = src[i + 3]
+        dst[j] = (r1 << 4) | g1
+        dst[j + 1] = (b1 << 4) | (hi >> 4)
+        dst[j + 2] = ((((hi & 0x07) << 1) | (lo >> 7)) << 4) | ((lo >> 1) & 0x0F)
+        j += 3
+
+# 后端 -> 内核表；某个后端缺少的内核使用native版本
+_KERNELS = {
+    "python": {
+        "fill_span": _fill_span_py,
+        "plot": _plot_py,
+        "glyph": _glyph_py,
+        "bitmap": _bitmap_py,
+        "spans": _spans_py,
+        "rle": _rle_py,
+        "aa": _aa_py,
+        "aa_over": _aa_over_py,
+        "sprite": _sprite_py,
+        "copy_rows": _copy_rows_py,
+        "copy16": _copy16_py,
+    },
+    "native": {
+        "fill_span": _fill_span_native,
+        "plot": _plot_native,
+        "glyph": _glyph_native,
+        "bitmap": _bitmap_native,
+        "spans": _spans_native,
+        "rle": _rle_native,
+        "aa": _aa_native,
+        "aa_over": _aa_over_native,
+        "sprite": _sprite_native,
+        "copy_rows": _copy_rows_py,
+        "copy16": _copy16_native,
+        "expand8": _expand8_native,
+        "expand4": _expand4_native,
+        "expand1": _expand1_native,
+        "pack444": _pack444_native,
+    },
+}
+
+try:
+    import nv3007_viper
+    # 没有viper发射器的平台上导入会失败；调用一次确认内核确实可以运行
+    nv3007_viper.fill_span(bytearray(2), 0, 2, 0)
+    _KERNELS["viper"] = nv3007_viper.KERNELS
+except (ImportError, SyntaxError, NameError, NotImplementedError):
+    pass
+
+
+class SPITransport:
+    """NV3007的SPI传输层
+
+    所有寄存器和像素写入都经过这里。命令参数使用预分配的1/2/4字节缓冲区，
+    命令及其参数在一次CS事务内发送，发送过程不产生堆分配。
+    """
+
+    def __init__(self, spi, cs, dc):
+        self._spi = spi
+        self._cs = cs
+        self._dc = dc
+        self._cmd = bytearray(1)
+        self._expand_args = array('i', [0, 0])
+        self._buf1 = bytearray(1)
+        self._buf2 = bytearray(2)
+        self._buf4 = bytearray(4)
+
+    @micropython.native
+    def command(self, cmd, params=None):
+        """写命令及其参数（任意缓冲区），整个过程只拉低一次CS"""
+        self._cmd[0] = cmd
+        self._dc.value(0)
+        self._cs.value(0)
+        self._spi.write(self._cmd)
+        self._dc.value(1)
+        if params:
+            self._spi.write(params)
+        self._cs.value(1)
+
+    @micropython.native
+    def command8(self, cmd, value):
+        """写命令和一个8位参数"""
+        self._buf1[0] = value
+        self.command(cmd, self._buf1)
+
+    @micropython.native
+    def command16(self, cmd, value):
+        """写命令和一个16位参数（高字节在前）"""
+        buf = self._buf2
+        buf[0] = value >> 8
+        buf[1] = value & 0xFF
+        self.command(cmd, buf)
+
+    @micropython.native
+    def command_range(self, cmd, start, end):
+        """写命令和两个16位参数，用于CASET/RASET"""
+        buf = self._buf4
+        buf[0] = start >> 8
+        buf[1] = start & 0xFF
+        buf[2] = end >> 8
+        buf[3] = end & 0xFF
+        self.command(cmd, buf)
+
+    @micropython.native
+    def pixels(self, buf):
+        """写像素数据"""
+        self._dc.value(1)
+        self._cs.value(0)
+        self._spi.write(buf)
+        self._cs.value(1)
+
+    @micropython.native
+    def expand_rows(self, mv, offset, n, stride, count, expand, palette, line, out):
+        """在一次CS事务内写入count行需要转换格式（或复制）的像素
+
+        每行n个像素先由expand(mv, line, palette, args)转换到行缓冲区line
+        （args为 (行偏移, n)），再发送out（line开头的预先创建的视图），不产生堆分配
+        """
+        spi = self._spi
+        args = self._expand_args
+        args[1] = n
+        self._dc.value(1)
+        self._cs.value(0)
+        for _ in range(count):
+            args[0] = offset
+            expand(mv, line, palette, args)
+            spi.write(out)
+            offset += stride
+        self._cs.value(1)
+
+
+# 一个字节中置位的个数，CodepointIndex用来计算组内序号
+_POPCOUNT = bytes(bin(i).count("1") for i in range(256))
+
+
+class CodepointIndex:
+    """升序码位表的常数时间索引：码位 -> 在表中的序号
+
+    按码位高8位分页，每页再按8个码位分组，每组记录一个存在位图和
+    该组第一个字符的序号；查找只需查表和一次位计数，不随字符数增长。
+    索引约占 (页数 * 96 + 512) 字节RAM，码位表本身不保留。
+    """
+
+    def __init__(self, table, stride):
+        """从码位表构建索引
+
+        参数:
+            table: 按码位升序排列的表，每项以小端16位码位开头
+            stride: 每项的字节数
+        """
+        n = len(table) // stride
+        page_of = {}
+        for i in range(n):
+            page = table[stride * i + 1]
+            if page not in page_of:
+                page_of[page] = len(page_of)
+        # 页号 -> 页在分组表中的序号，-1表示该页没有字符
+        self._pages = array('h', [-1] * 256)
+        for page in page_of:
+            self._pages[page] = page_of[page]
+        groups = len(page_of) * 32
+        self._present = bytearray(groups)
+        self._base = array('H', [0] * groups)
+        present = self._present
+        base = self._base
+        last = -1
+        for i in range(n):
+            cp = table[stride * i] | (table[stride * i + 1] << 8)
+            g = (page_of[cp >> 8] << 5) | ((cp >> 3) & 31)
+            if g != last:
+                base[g] = i
+                last = g
+            present[g] |= 1 << (cp & 7)
+
+    def _ordinal(self, cp):
+        """码位在表中的序号，表中没有的码位返回-1"""
+        if cp > 0xFFFF:
+            return -1
+        p = self._pages[cp >> 8]
+        if p < 0:
+            return -1
+        g = (p << 5) | ((cp >> 3) & 31)
+        bits = self._present[g]
+        bit = cp & 7
+        if not (bits >> bit) & 1:
+            return -1
+        return self._base[g] + _POPCOUNT[bits & ((1 << bit) - 1)]
+
+
+class FontIndex(CodepointIndex):
+    """font_to_py稀疏字体（-k 字符集生成，含 _sparse 表）的常数时间字符索引
+
+    字体自带的get_ch()在 _sparse 表上二分查找，每一步都创建memoryview切片。
+    这里用CodepointIndex把码位直接映射到 _sparse 表中的序号，_sparse 表本身不复制。
+
+    FontIndex提供与字体模块相同的接口，可以代替字体模块传给set_font()、Console
+    和其他需要height()/get_ch()的地方。
+    """
+
+    def __init__(self, font):
+        """从字体模块构建索引
+
+        参数:
+            font: font_to_py生成的水平映射稀疏字体模块
+        """
+        super().__init__(font._sparse, 4)
+        self._height = font.height()
+        self._max_width = font.max_width()
+        self._baseline = font.baseline() if hasattr(font, "baseline") else self._height
+        self._reverse = font.reverse() if hasattr(font, "reverse") else False
+        self._monospaced = font.monospaced() if hasattr(font, "monospaced") else False
+        self._min_ch = font.min_ch()
+        self._max_ch = font.max_ch()
+        self._mvfont = font._mvfont
+        self._sparse = font._sparse
+
+    def height(self):
+        return self._height
+
+    def baseline(self):
+        return self._baseline
+
+    def max_width(self):
+        return self._max_width
+
+    def hmap(self):
+        return True
+
+    def reverse(self):
+        return self._reverse
+
+    def monospaced(self):
+        return self._monospaced
+
+    def min_ch(self):
+        return self._min_ch
+
+    def max_ch(self):
+        return self._max_ch
+
+    def _offset(self, cp):
+        """码位对应的字形数据在 _font 中的偏移，字体中没有的字符返回0（默认字形）"""
+        i = self._ordinal(cp)
+        if i < 0:
+            return 0
+        sparse = self._sparse
+        i *= 4
+        return (sparse[i + 2] | (sparse[i + 3] << 8)) << 3
+
+    def get_ch(self, ch):
+        """与字体模块的get_ch()相同：返回 (位图, 高, 宽)"""
+        doff = self._offset(ord(ch))
+        mv = self._mvfont
+        width = mv[doff] | (mv[doff + 1] << 8)
+        start = doff + 2
+        return mv[start:start + ((width + 7) >> 3) * self._height], self._height, width
+
+    def get_ch_many(self, text):
+        """批量查找text中每个字符，返回 (位图, 高, 宽) 列表"""
+        mv = self._mvfont
+        height = self._height
+        offset = self._offset
+        result = []
+        for ch in text:
+            doff = offset(ord(ch))
+            width = mv[doff] | (mv[doff + 1] << 8)
+            start = doff + 2
+            result.append((mv[start:start + ((width + 7) >> 3) * height], height, width))
+        return result
 
 
 class NV3007:
@@ -51,7 +1019,35 @@ class NV3007:
     LGRAYBLUE = 0xA651
     LBBLUE = 0x2B12
 
-    def __init__(self, spi, cs, dc, rst, blk, width=142, height=428, rotation=0):
+    # 损坏区域列表默认参数
+    # 合并阈值以像素为单位，约等于一次_set_address（0x2A/0x2B/0x2C共11字节、
+    # 多次CS/DC切换）的开销折算成的像素数
+    DAMAGE_MAX_RECTS = 8
+    DAMAGE_MERGE_THRESHOLD = 1024
+
+    # 分带模式下记录到显示列表的绘制方法，以及各自y坐标参数的 (位置, 参数名)；
+    # 回放时这些参数减去带的起始行，超出带的部分由各图元自身的边界裁剪处理
+    _BAND_Y_ARGS = (
+        ("clear", ()),
+        ("draw_pixel", ((1, "y"),)),
+        ("draw_line", ((1, "y1"), (3, "y2"))),
+        ("draw_rect", ((1, "y"),)),
+        ("draw_circle", ((1, "yc"),)),
+        ("draw_arc", ((1, "yc"),)),
+        ("draw_ellipse", ((1, "yc"),)),
+        ("draw_triangle", ((1, "y1"), (3, "y2"), (5, "y3"))),
+        ("draw_polygon", ((0, "vertices"),)),
+        ("draw_bitmap", ((1, "y"),)),
+        ("draw_bitmap_rgb565", ((1, "y"),)),
+        ("draw_sprite", ((1, "y"),)),
+        ("draw_text", ((1, "y"),)),
+    )
+
+    def __init__(self, spi, cs, dc, rst, blk, width=142, height=428, rotation=0,
+                 max_damage_rects=DAMAGE_MAX_RECTS,
+                 damage_merge_threshold=DAMAGE_MERGE_THRESHOLD,
+                 double_buffer=False, band_rows=0, bpp=16, rgb444=False,
+                 backend=None):
         """
         初始化NV3007屏幕
 
@@ -64,10 +1060,27 @@ class NV3007:
             width: 屏幕宽度
             height: 屏幕高度
             rotation: 屏幕旋转方向 (0-3) 0或1为竖屏 2或3为横屏
+            max_damage_rects: 损坏区域列表最多保留的矩形数
+            damage_merge_threshold: 两个矩形合并后允许多发送的像素数
+            double_buffer: 是否启用双缓冲（需要两倍framebuffer内存和_thread）
+            band_rows: 分带渲染的带高（行数），0表示使用整屏framebuffer；显示列表在clear()之前
+                       一直增长，绘制多个图元时宜关闭自动刷新
+            bpp: framebuffer每像素位数，16为RGB565；8/4/1为256/16/2色调色板索引，
+                 4和1每字节打包多个像素（高位在前，每行按字节对齐）
+            rgb444: 以12位RGB444格式（COLMOD 0x03）传输像素，每2个像素3字节，
+                    SPI数据量减少25%，颜色精度降为每通道4位；要求屏幕宽度（旋转后）为偶数
+            backend: 绘制后端，见set_backend()
         """
-        self._spi = spi
-        self._cs = cs if isinstance(cs, Pin) else Pin(cs, Pin.OUT, value=1)
-        self._dc = dc if isinstance(dc, Pin) else Pin(dc, Pin.OUT, value=1)
+        if band_rows and double_buffer:
+            raise ValueError("band mode does not support double buffering")
+        if bpp not in (16, 8, 4, 1):
+            raise ValueError("bpp must be 16, 8, 4 or 1")
+        if rgb444 and (width if rotation == 0 or rotation == 1 else height) & 1:
+            # 整行窗口宽度为奇数时无法扩展为偶数，打包也会读到行外
+            raise ValueError("rgb444 requires an even width")
+        cs = cs if isinstance(cs, Pin) else Pin(cs, Pin.OUT, value=1)
+        dc = dc if isinstance(dc, Pin) else Pin(dc, Pin.OUT, value=1)
+        self._bus = SPITransport(spi, cs, dc)
         self._rst = rst if isinstance(rst, Pin) else Pin(rst, Pin.OUT, value=1)
         self._blk = blk if isinstance(blk, Pin) else Pin(blk, Pin.OUT, value=0)
 
@@ -81,61 +1094,385 @@ class NV3007:
 
         self._fb_width = self.width
         self._fb_height = self.height
-        self._framebuffer = bytearray(self._fb_width * self._fb_height * 2)
+        self._band_rows = 0
+        if band_rows and band_rows < self.height:
+            # 分带模式：framebuffer只保存band_rows行，绘制调用记录到显示列表
+            self._band_rows = band_rows
+            self._fb_height = band_rows
+            self._display_list = []
+            # 已发送到屏幕的显示列表项数；之后记录的调用只重绘它们涉及的带
+            self._band_sent = 0
+            # 发送到_band_sent时的字体，探测新记录的调用时从它开始
+            self._band_font = (None, None)
+            self._band_dirty = True
+            self._replaying = False
+            for name, y_args in self._BAND_Y_ARGS:
+                setattr(self, name, self._band_recorder(name, y_args))
+        # 每像素字节数（packed模式为0）；索引色模式下颜色先映射为调色板索引，刷新时再展开
+        self._bits = bpp
+        self._px_bytes = bpp // 8
+        self._pixel_mask = (1 << bpp) - 1
+        self._row_bytes = (self._fb_width * bpp + 7) >> 3
+        self._palette = None
+        self._rgb444 = rgb444
+        if bpp < 16:
+            # 调色板按索引存放RGB565的高/低字节，索引0预置为黑色
+            self._palette = bytearray(2 << bpp)
+            self._color_index = {self.BLACK: 0}
+            self._palette_next = 1
+        # 刷新时格式转换（或copy16复制）用的行缓冲区；发送的是按长度缓存的视图，
+        # 不为每行创建新的切片对象
+        if bpp < 16 or rgb444:
+            self._line_buffer = bytearray(self._fb_width * 2)
+        else:
+            self._line_buffer = bytearray(max(self._fb_width * 2, _FLUSH_LINE_BYTES))
+        self._line_mv = memoryview(self._line_buffer)
+        self._line_views = {}
+        # 传给内核的整数参数（见模块开头的内核说明）
+        self._glyph_args = array('i', [0] * 9)
+        self._span_args = array('i', [0] * 3)
+        self._rle_args = array('i', [0] * 10)
+        self._aa_args = array('i', [0] * 10)
+        self._sprite_args = array('i', [0] * 8)
+        # 抗锯齿混合表缓存：(前景色, 背景色, 位数) -> RGB565查找表
+        self._aa_luts = {}
+        self._copy_args = array('i', [0] * 6)
+        self._framebuffer = bytearray(self._row_bytes * self._fb_height)
         self._fb_mv = memoryview(self._framebuffer)
-        self._fill_buffer = bytearray(self._fb_width * 2)
+        self._fill_buffer = bytearray(self._row_bytes)
         self._fill_mv = memoryview(self._fill_buffer)
-        self._fb_dirty = True
+        # 损坏区域列表：每个矩形占4项 (x0, y0, x1, y1)，闭区间
+        self._damage = array('h', [0] * (max_damage_rects * 4))
+        self._damage_n = 0
+        self._damage_max = max_damage_rects
+        self._merge_threshold = damage_merge_threshold
+        if self._band_rows:
+            # 分带刷新时暂存一带中探测到的损坏区域
+            self._band_rects = array('h', [0] * (max_damage_rects * 4))
+        self._mark_dirty(0, 0, self._fb_width - 1, self._fb_height - 1)
+        self._diff_mode = False
+        self._double_buffer = False
         self._auto_flush = True
         self._font = None
+        self._font_module = None
+        self.set_glyph_cache(0)
+        # 硬件垂直滚动：滚动区域 [_scroll_top, _scroll_top + _scroll_height) 内
+        # 逻辑行y存放在GRAM的 _scroll_top + (y - _scroll_top + _scroll_offset) % _scroll_height 行
+        self._scroll_top = 0
+        self._scroll_height = 0
+        self._scroll_offset = 0
+        self.set_backend(backend)
+        # 不同旋转方向下GRAM的列/行偏移，构造时确定一次
+        if rotation == 0:
+            self._x_off, self._y_off = 12, 0
+        elif rotation == 1:
+            self._x_off, self._y_off = 14, 0
+        elif rotation == 2:
+            self._x_off, self._y_off = 0, 14
+        else:
+            self._x_off, self._y_off = 0, 12
 
         self._init_display()
 
-    def _write_reg(self, reg):
-        """写寄存器命令"""
-        self._dc.value(0)
-        self._cs.value(0)
-        self._spi.write(bytes([reg]))
-        self._cs.value(1)
-        self._dc.value(1)
+        if double_buffer:
+            self._start_double_buffer()
+
+    def _start_double_buffer(self):
+        """分配前缓冲区并启动后台传输线程"""
+        import _thread
+
+        self._front_buffer = bytearray(len(self._framebuffer))
+        self._front_mv = memoryview(self._front_buffer)
+        if self._fbuf is not None:
+            self._front_fbuf = self._make_fbuf(self._front_buffer)
+        self._job_rects = array('h', [0] * (self._damage_max * 4))
+        self._job_n = 0
+        # _job_lock被释放表示有新任务；_idle_lock被持有表示正在传输
+        self._job_lock = _thread.allocate_lock()
+        self._job_lock.acquire()
+        self._idle_lock = _thread.allocate_lock()
+        self._double_buffer = True
+        _thread.start_new_thread(self._flush_worker, ())
+
+    @staticmethod
+    def backends():
+        """当前平台可用的绘制后端名称，按速度从慢到快排列"""
+        names = [name for name in ("python", "native", "viper") if name in _KERNELS]
+        if framebuf is not None:
+            names.append("framebuf")
+        return names
+
+    def set_backend(self, backend=None):
+        """选择绘制后端
+
+        "python"、"native"、"viper" 选择光栅化内核（区间填充、像素写入、字形展开、
+        行复制以及刷新时的格式转换）的实现；"framebuf" 另外把填充、直线、圆、椭圆、
+        多边形和RGB565位图交给内置framebuf模块（C实现）在同一块framebuffer上绘制，
+        内核使用可用的最快实现。
 
-    def _write_data(self, dat):
-        """写数据"""
-        self._dc.value(1)
-        self._cs.value(0)
-        self._spi.write(bytes([dat]))
-        self._cs.value(1)
+        参数:
+            backend: 后端名称，None 选择backends()中最快的一个
+        """
+        names = self.backends()
+        if backend is None:
+            backend = names[-1]
+        if backend not in names:
+            if backend == "framebuf":
+                raise RuntimeError("framebuf backend requires the framebuf module")
+            raise ValueError("unknown backend: %s" % backend)
+        if self._double_buffer:
+            # 后台线程可能正在使用当前的内核
+            self.wait()
+        kernels = dict(_KERNELS["native"])
+        if backend == "framebuf":
+            kernels.update(_KERNELS[names[-2]])
+            self._fbuf = self._make_fbuf(self._framebuffer)
+            if self._double_buffer:
+                self._front_fbuf = self._make_fbuf(self._front_buffer)
+        else:
+            kernels.update(_KERNELS[backend])
+            self._fbuf = None
+            self._front_fbuf = None
+        self._fill_span = kernels["fill_span"]
+        self._plot = kernels["plot"]
+        self._glyph = kernels["glyph"]
+        self._bitmap = kernels["bitmap"]
+        self._spans = kernels["spans"]
+        self._rle = kernels["rle"]
+        self._aa = kernels["aa"]
+        self._aa_over = kernels["aa_over"]
+        self._sprite = kernels["sprite"]
+        self._copy_rows = kernels["copy_rows"]
+        self._expand = self._select_expand(kernels)
+        self._copy16 = kernels["copy16"]
+        self._backend = backend
+
+    def _select_expand(self, kernels):
+        """选择刷新时把framebuffer行转换为传输格式的内核，RGB565直接发送时为None"""
+        bits = self._bits
+        if bits == 8:
+            expand = kernels["expand8"]
+        elif bits == 4:
+            expand = kernels["expand4"]
+        elif bits == 1:
+            expand = kernels["expand1"]
+        else:
+            expand = None
+        if not self._rgb444:
+            return expand
+        pack = kernels["pack444"]
+        if expand is None:
+            return pack
+        # 索引色先展开为RGB565，再在行缓冲区内原地打包
+        pack_args = array('i', [0, 0])
+
+        def expand_444(src, dst, palette, args):
+            expand(src, dst, palette, args)
+            pack_args[1] = args[1]
+            pack(dst, dst, None, pack_args)
+
+        return expand_444
+
+    def _make_fbuf(self, buf):
+        """用与framebuffer格式对应的framebuf格式包装buf"""
+        bits = self._bits
+        if bits == 16:
+            fmt = framebuf.RGB565
+        elif bits == 8:
+            fmt = framebuf.GS8
+        elif bits == 4:
+            fmt = framebuf.GS4_HMSB
+        else:
+            fmt = framebuf.MONO_HLSB
+        return framebuf.FrameBuffer(buf, self._fb_width, self._fb_height, fmt)
 
-    def _write_data16(self, dat):
-        """写16位（半字）数据"""
-        self._dc.value(1)
-        self._cs.value(0)
-        self._spi.write(bytes([(dat >> 8) & 0xFF, dat & 0xFF]))
-        self._cs.value(1)
+    def _fbuf_color(self, color):
+        """把RGB565颜色转换为framebuf的像素值
 
-    def _write_buffer(self, buffer):
-        """写缓冲区数据"""
-        self._dc.value(1)
-        self._cs.value(0)
-        self._spi.write(buffer)
-        self._cs.value(1)
+        framebuf的RGB565按小端存储，交换高低字节后写入的字节顺序与屏幕要求一致；
+        索引色模式下为调色板索引
+        """
+        color_hi, color_lo = self._encode(color)
+        if self._bits == 16:
+            return (color_lo << 8) | color_hi
+        return color_hi
+
+    @micropython.native
+    def _mark_dirty(self, x0, y0, x1, y1):
+        """将矩形区域（闭区间）加入损坏区域列表
+
+        与已有矩形合并后多发送的像素数不超过合并阈值时直接合并；
+        列表已满时与代价最小的矩形强制合并。超出屏幕的部分会被裁剪。
+        """
+        if x0 < 0:
+            x0 = 0
+        if y0 < 0:
+            y0 = 0
+        if x1 >= self._fb_width:
+            x1 = self._fb_width - 1
+        if y1 >= self._fb_height:
+            y1 = self._fb_height - 1
+        if x0 > x1 or y0 > y1:
+            return
+
+        d = self._damage
+        n = self._damage_n
+        threshold = self._merge_threshold
+        area = (x1 - x0 + 1) * (y1 - y0 + 1)
+        i = 0
+        best = -1
+        best_cost = 0
+        while i < n:
+            j = i * 4
+            ux0 = d[j] if d[j] < x0 else x0
+            uy0 = d[j + 1] if d[j + 1] < y0 else y0
+            ux1 = d[j + 2] if d[j + 2] > x1 else x1
+            uy1 = d[j + 3] if d[j + 3] > y1 else y1
+            cost = ((ux1 - ux0 + 1) * (uy1 - uy0 + 1) - area
+                    - (d[j + 2] - d[j] + 1) * (d[j + 3] - d[j + 1] + 1))
+            if cost <= threshold or (i == best and n == self._damage_max):
+                # 取出矩形i（用最后一个填补空位），以合并结果重新扫描
+                n -= 1
+                k = n * 4
+                d[j] = d[k]
+                d[j + 1] = d[k + 1]
+                d[j + 2] = d[k + 2]
+                d[j + 3] = d[k + 3]
+                x0 = ux0
+                y0 = uy0
+                x1 = ux1
+                y1 = uy1
+                area = (x1 - x0 + 1) * (y1 - y0 + 1)
+                i = 0
+                best = -1
+                continue
+            if best < 0 or cost < best_cost:
+                best = i
+                best_cost = cost
+            i += 1
+            if i == n and n == self._damage_max:
+                # 列表已满且没有满足阈值的合并：回到代价最小的矩形强制合并
+                i = best
+
+        j = n * 4
+        d[j] = x0
+        d[j + 1] = y0
+        d[j + 2] = x1
+        d[j + 3] = y1
+        self._damage_n = n + 1
+
+    def set_damage_params(self, max_rects=None, merge_threshold=None):
+        """调整损坏区域列表的长度上限和合并阈值
+
+        参数:
+            max_rects: 最多保留的矩形数（1 等价于单一包围盒）
+            merge_threshold: 合并后允许多发送的像素数，越大越倾向于合并
+        """
+        if merge_threshold is not None:
+            self._merge_threshold = merge_threshold
+        if max_rects is not None and max_rects != self._damage_max:
+            if max_rects < 1:
+                raise ValueError("max_rects must be >= 1")
+            # 旧列表合并为一个包围盒后迁移到新列表
+            d = self._damage
+            n = self._damage_n
+            self._damage = array('h', [0] * (max_rects * 4))
+            self._damage_n = 0
+            if self._double_buffer:
+                self.wait()
+                self._job_rects = array('h', [0] * (max_rects * 4))
+            if self._band_rows:
+                self._band_rects = array('h', [0] * (max_rects * 4))
+            self._damage_max = max_rects
+            if n:
+                x0 = min(d[i * 4] for i in range(n))
+                y0 = min(d[i * 4 + 1] for i in range(n))
+                x1 = max(d[i * 4 + 2] for i in range(n))
+                y1 = max(d[i * 4 + 3] for i in range(n))
+                self._mark_dirty(x0, y0, x1, y1)
+
+    def _encode(self, color):
+        """把RGB565颜色编码为写入framebuffer的 (高字节, 低字节)
+
+        索引色模式下两者都是调色板索引，新颜色自动分配下一个空闲索引
+        图元统一写入 fb[offset] 和 fb[offset + step - 1]（step为每像素字节数），
+        索引色模式下两次写入的是同一个字节，无需单独的代码路径
+        """
+        palette = self._palette
+        if palette is None:
+            return (color >> 8) & 0xFF, color & 0xFF
+        index = self._color_index.get(color)
+        if index is None:
+            index = self._palette_next
+            if index >= len(palette) // 2:
+                raise ValueError("palette is full")
+            self.set_palette(index, color)
+        return index, index
+
+    def set_palette(self, index, color):
+        """设置调色板项（仅索引色模式）
+
+        已绘制的像素引用的是索引，修改已使用的索引会在下次刷新时
+        改变屏幕上所有该索引像素的颜色，可用于整屏换色。
+        分带模式每次刷新都按记录的颜色重新绘制，不受此影响。
+
+        参数:
+            index: 调色板索引
+            color: RGB565颜色
+        """
+        palette = self._palette
+        if palette is None:
+            raise ValueError("palette requires an indexed bpp")
+        k = index << 1
+        old = (palette[k] << 8) | palette[k + 1]
+        if self._color_index.get(old) == index:
+            del self._color_index[old]
+        palette[k] = (color >> 8) & 0xFF
+        palette[k + 1] = color & 0xFF
+        self._color_index[color] = index
+        if index >= self._palette_next:
+            # 新分配的索引还没有像素引用
+            self._palette_next = index + 1
+        elif old != color:
+            self._palette_changed()
+
+    def _palette_changed(self):
+        """调色板变化后整屏重新发送"""
+        if self._band_rows:
+            self._band_dirty = True
+            return
+        if self._diff_mode:
+            # 像素索引没变，校验和无法发现颜色变化
+            known = self._tile_known
+            for i in range(len(known)):
+                known[i] = 0
+        self._mark_dirty(0, 0, self._fb_width - 1, self._fb_height - 1)
 
     def _fb_set_pixel(self, x, y, color):
         """在framebuffer中设置像素点（带边界检查）"""
         if x < 0 or x >= self._fb_width or y < 0 or y >= self._fb_height:
             return
-        offset = (y * self._fb_width + x) * 2
-        self._framebuffer[offset] = (color >> 8) & 0xFF
-        self._framebuffer[offset + 1] = color & 0xFF
-        self._fb_dirty = True
+        color_hi, color_lo = self._encode(color)
+        if self._bits < 8:
+            self._packed_plot(x, y, color_hi)
+            self._mark_dirty(x, y, x, y)
+            return
+        step = self._px_bytes
+        self._plot(self._framebuffer, (y * self._fb_width + x) * step, step - 1,
+                   (color_hi << 8) | color_lo)
+        self._mark_dirty(x, y, x, y)
 
     def _fb_set_pixel_unsafe(self, x, y, color):
         """在framebuffer中设置像素点（无边界检查，性能优化版本）"""
-        offset = (y * self._fb_width + x) * 2
-        fb = self._fb_mv
-        fb[offset] = (color >> 8) & 0xFF
-        fb[offset + 1] = color & 0xFF
-        self._fb_dirty = True
+        color_hi, color_lo = self._encode(color)
+        if self._bits < 8:
+            self._packed_plot(x, y, color_hi)
+            self._mark_dirty(x, y, x, y)
+            return
+        step = self._px_bytes
+        self._plot(self._fb_mv, (y * self._fb_width + x) * step, step - 1,
+                   (color_hi << 8) | color_lo)
+        self._mark_dirty(x, y, x, y)
 
     @micropython.native
     def _fb_fill_rect(self, x, y, w, h, color):
@@ -153,21 +1490,27 @@ class NV3007:
         if w <= 0 or h <= 0:
             return
 
-        color_hi = (color >> 8) & 0xFF
-        color_lo = color & 0xFF
-        row_size = w * 2
+        if self._fbuf is not None:
+            self._fbuf.fill_rect(x, y, w, h, self._fbuf_color(color))
+            self._mark_dirty(x, y, x + w - 1, y + h - 1)
+            return
+        color_hi, color_lo = self._encode(color)
+        if self._bits < 8:
+            self._packed_fill(x, x + w - 1, y, y + h - 1, color_hi)
+            self._mark_dirty(x, y, x + w - 1, y + h - 1)
+            return
+        step = self._px_bytes
+        row_size = w * step
         fb = self._fb_mv
         fill_buf = self._fill_mv
-
-        for i in range(0, row_size, 2):
-            fill_buf[i] = color_hi
-            fill_buf[i + 1] = color_lo
+        # 先用内核填好一行，再逐行切片复制
+        self._fill_span(fill_buf, 0, row_size, (color_hi << 8) | color_lo)
 
         for py in range(y, y + h):
-            offset = (py * self._fb_width + x) * 2
+            offset = (py * self._fb_width + x) * step
             fb[offset : offset + row_size] = fill_buf[:row_size]
 
-        self._fb_dirty = True
+        self._mark_dirty(x, y, x + w - 1, y + h - 1)
 
     @micropython.native
     def _fb_fill_h_line(self, x1, x2, y, color):
@@ -183,20 +1526,20 @@ class NV3007:
         if x1 > x2:
             return
 
-        color_hi = (color >> 8) & 0xFF
-        color_lo = color & 0xFF
-        w = x2 - x1 + 1
-        offset = (y * self._fb_width + x1) * 2
-
-        fb = self._fb_mv
-        fill_buf = self._fill_mv
-
-        for i in range(0, w * 2, 2):
-            fill_buf[i] = color_hi
-            fill_buf[i + 1] = color_lo
-
-        fb[offset : offset + w * 2] = fill_buf[:w * 2]
-        self._fb_dirty = True
+        if self._fbuf is not None:
+            self._fbuf.hline(x1, y, x2 - x1 + 1, self._fbuf_color(color))
+            self._mark_dirty(x1, y, x2, y)
+            return
+        color_hi, color_lo = self._encode(color)
+        if self._bits < 8:
+            self._packed_fill(x1, x2, y, y, color_hi)
+            self._mark_dirty(x1, y, x2, y)
+            return
+        step = self._px_bytes
+        offset = (y * self._fb_width + x1) * step
+        self._fill_span(self._fb_mv, offset, (x2 - x1 + 1) * step,
+                        (color_hi << 8) | color_lo)
+        self._mark_dirty(x1, y, x2, y)
 
     @micropython.native
     def _fb_fill_v_line(self, x, y1, y2, color):
@@ -212,350 +1555,570 @@ class NV3007:
         if y1 > y2:
             return
 
-        color_hi = (color >> 8) & 0xFF
-        color_lo = color & 0xFF
+        if self._fbuf is not None:
+            self._fbuf.vline(x, y1, y2 - y1 + 1, self._fbuf_color(color))
+            self._mark_dirty(x, y1, x, y2)
+            return
+        color_hi, color_lo = self._encode(color)
+        if self._bits < 8:
+            self._packed_fill(x, x, y1, y2, color_hi)
+            self._mark_dirty(x, y1, x, y2)
+            return
+        step = self._px_bytes
+        lo_off = step - 1
         fb = self._fb_mv
 
         for py in range(y1, y2 + 1):
-            offset = (py * self._fb_width + x) * 2
+            offset = (py * self._fb_width + x) * step
             fb[offset] = color_hi
-            fb[offset + 1] = color_lo
+            fb[offset + lo_off] = color_lo
 
-        self._fb_dirty = True
+        self._mark_dirty(x, y1, x, y2)
 
-    def _set_address(self, xs, ys, xe, ye):
-        """设置显示区域"""
-        if self._rotation == 0:
-            self._write_reg(0x2A)
-            self._write_data16(xs + 12)
-            self._write_data16(xe + 12)
-            self._write_reg(0x2B)
-            self._write_data16(ys)
-            self._write_data16(ye)
-            self._write_reg(0x2C)
-        elif self._rotation == 1:
-            self._write_reg(0x2A)
-            self._write_data16(xs + 14)
-            self._write_data16(xe + 14)
-            self._write_reg(0x2B)
-            self._write_data16(ys)
-            self._write_data16(ye)
-            self._write_reg(0x2C)
-        elif self._rotation == 2:
-            self._write_reg(0x2A)
-            self._write_data16(xs)
-            self._write_data16(xe)
-            self._write_reg(0x2B)
-            self._write_data16(ys + 14)
-            self._write_data16(ye + 14)
-            self._write_reg(0x2C)
+    @micropython.native
+    def _packed_plot(self, x, y, index):
+        """packed模式：写入一个像素（无边界检查，不记录损坏区域）"""
+        bits = self._bits
+        i = x * bits
+        offset = y * self._row_bytes + (i >> 3)
+        shift = 8 - bits - (i & 7)
+        fb = self._fb_mv
+        fb[offset] = (fb[offset] & ~(self._pixel_mask << shift)) | (index << shift)
+
+    @micropython.native
+    def _packed_fill(self, x0, x1, y0, y1, index):
+        """packed模式：填充矩形（闭区间，已裁剪，不记录损坏区域）
+
+        每行首尾字节按掩码读改写，中间的整字节用切片一次填充
+        """
+        bits = self._bits
+        ppb = 8 // bits
+        bx0 = x0 // ppb
+        bx1 = x1 // ppb
+        head_mask = 0xFF >> ((x0 % ppb) * bits)
+        if x1 == self._fb_width - 1:
+            # 行尾字节中超出屏幕宽度的是填充位，可以一起写
+            tail_mask = 0xFF
         else:
-            self._write_reg(0x2A)
-            self._write_data16(xs)
-            self._write_data16(xe)
-            self._write_reg(0x2B)
-            self._write_data16(ys + 12)
-            self._write_data16(ye + 12)
-            self._write_reg(0x2C)
+            tail_mask = (0xFF << ((ppb - 1 - x1 % ppb) * bits)) & 0xFF
+        if bx0 == bx1:
+            head_mask &= tail_mask
+        pattern = 0
+        for _ in range(ppb):
+            pattern = (pattern << bits) | index
+        nb = bx1 - bx0 - 1
+        fill_buf = self._fill_mv
+        for i in range(nb):
+            fill_buf[i] = pattern
+        middle = fill_buf[:nb] if nb > 0 else None
+        fb = self._fb_mv
+        row_bytes = self._row_bytes
+        offset = y0 * row_bytes + bx0
+        for _ in range(y1 - y0 + 1):
+            fb[offset] = (fb[offset] & ~head_mask) | (pattern & head_mask)
+            if bx1 > bx0:
+                if middle is not None:
+                    fb[offset + 1:offset + 1 + nb] = middle
+                end = offset + bx1 - bx0
+                fb[end] = (fb[end] & ~tail_mask) | (pattern & tail_mask)
+            offset += row_bytes
+
+    @micropython.native
+    def _set_address(self, xs, ys, xe, ye):
+        """设置显示区域
+
+        CASET/RASET参数编码到传输层预分配的缓冲区中，命令和参数在一次CS事务内发送；
+        与屏幕上当前窗口相同的寄存器直接跳过，重复的窗口只需发送RAMWR（0x2C）
+        """
+        bus = self._bus
+        xs += self._x_off
+        xe += self._x_off
+        ys += self._y_off
+        ye += self._y_off
+        cols = (xs << 16) | xe
+        if cols != self._win_cols:
+            bus.command_range(0x2A, xs, xe)
+            self._win_cols = cols
+        rows = (ys << 16) | ye
+        if rows != self._win_rows:
+            bus.command_range(0x2B, ys, ye)
+            self._win_rows = rows
+        bus.command(0x2C)
 
     @micropython.native
     def _init_display(self):
         """初始化显示序列"""
-        self._rst.value(1)
-        time.sleep_ms(50)
+        # 复位后屏幕上的窗口寄存器未知
+        self._win_cols = -1
+        self._win_rows = -1
+
         self._rst.value(0)
-        time.sleep_ms(50)
+        time.sleep_ms(10)
         self._rst.value(1)
         time.sleep_ms(120)
         self._blk.value(1)
 
-        # 解锁并配置寄存器
-        self._write_reg(0xFF)
-        self._write_data(0xA5)
-        self._write_reg(0x9A)
-        self._write_data(0x08)
-        self._write_reg(0x9B)
-        self._write_data(0x08)
-        self._write_reg(0x9C)
-        self._write_data(0xB0)
-        self._write_reg(0x9D)
-        self._write_data(0x16)
-        self._write_reg(0x9E)
-        self._write_data(0xC4)
-        self._write_reg(0x8F)
-        self._write_data(0x55)
-        self._write_data(0x04)
-        self._write_reg(0x84)
-        self._write_data(0x90)
-        self._write_reg(0x83)
-        self._write_data(0x7B)
-        self._write_reg(0x85)
-        self._write_data(0x33)
-        self._write_reg(0x60)
-        self._write_data(0x00)
-        self._write_reg(0x70)
-        self._write_data(0x00)
-        self._write_reg(0x61)
-        self._write_data(0x02)
-        self._write_reg(0x71)
-        self._write_data(0x02)
-        self._write_reg(0x62)
-        self._write_data(0x04)
-        self._write_reg(0x72)
-        self._write_data(0x04)
-        self._write_reg(0x6C)
-        self._write_data(0x29)
-        self._write_reg(0x7C)
-        self._write_data(0x29)
-        self._write_reg(0x6D)
-        self._write_data(0x31)
-        self._write_reg(0x7D)
-        self._write_data(0x31)
-        self._write_reg(0x6E)
-        self._write_data(0x0F)
-        self._write_reg(0x7E)
-        self._write_data(0x0F)
-        self._write_reg(0x66)
-        self._write_data(0x21)
-        self._write_reg(0x76)
-        self._write_data(0x21)
-        self._write_reg(0x68)
-        self._write_data(0x3A)
-        self._write_reg(0x78)
-        self._write_data(0x3A)
-        self._write_reg(0x63)
-        self._write_data(0x07)
-        self._write_reg(0x73)
-        self._write_data(0x07)
-        self._write_reg(0x64)
-        self._write_data(0x05)
-        self._write_reg(0x74)
-        self._write_data(0x05)
-        self._write_reg(0x65)
-        self._write_data(0x02)
-        self._write_reg(0x75)
-        self._write_data(0x02)
-        self._write_reg(0x67)
-        self._write_data(0x23)
-        self._write_reg(0x77)
-        self._write_data(0x23)
-        self._write_reg(0x69)
-        self._write_data(0x08)
-        self._write_reg(0x79)
-        self._write_data(0x08)
-        self._write_reg(0x6A)
-        self._write_data(0x13)
-        self._write_reg(0x7A)
-        self._write_data(0x13)
-        self._write_reg(0x6B)
-        self._write_data(0x13)
-        self._write_reg(0x7B)
-        self._write_data(0x13)
-        self._write_reg(0x6F)
-        self._write_data(0x00)
-        self._write_reg(0x7F)
-        self._write_data(0x00)
-        self._write_reg(0x50)
-        self._write_data(0x00)
-        self._write_reg(0x52)
-        self._write_data(0xD6)
-        self._write_reg(0x53)
-        self._write_data(0x08)
-        self._write_reg(0x54)
-        self._write_data(0x08)
-        self._write_reg(0x55)
-        self._write_data(0x1E)
-        self._write_reg(0x56)
-        self._write_data(0x1C)
-
-        # GOA配置
-        self._write_reg(0xA0)
-        self._write_data(0x2B)
-        self._write_data(0x24)
-        self._write_data(0x00)
-        self._write_reg(0xA1)
-        self._write_data(0x87)
-        self._write_reg(0xA2)
-        self._write_data(0x86)
-        self._write_reg(0xA5)
-        self._write_data(0x00)
-        self._write_reg(0xA6)
-        self._write_data(0x00)
-        self._write_reg(0xA7)
-        self._write_data(0x00)
-        self._write_reg(0xA8)
-        self._write_data(0x36)
-        self._write_reg(0xA9)
-        self._write_data(0x7E)
-        self._write_reg(0xAA)
-        self._write_data(0x7E)
-        self._write_reg(0xB9)
-        self._write_data(0x85)
-        self._write_reg(0xBA)
-        self._write_data(0x84)
-        self._write_reg(0xBB)
-        self._write_data(0x83)
-        self._write_reg(0xBC)
-        self._write_data(0x82)
-        self._write_reg(0xBD)
-        self._write_data(0x81)
-        self._write_reg(0xBE)
-        self._write_data(0x80)
-        self._write_reg(0xBF)
-        self._write_data(0x01)
-        self._write_reg(0xC0)
-        self._write_data(0x02)
-        self._write_reg(0xC1)
-        self._write_data(0x00)
-        self._write_reg(0xC2)
-        self._write_data(0x00)
-        self._write_reg(0xC3)
-        self._write_data(0x00)
-        self._write_reg(0xC4)
-        self._write_data(0x33)
-        self._write_reg(0xC5)
-        self._write_data(0x7E)
-        self._write_reg(0xC6)
-        self._write_data(0x7E)
-        self._write_reg(0xC8)
-        self._write_data(0x33)
-        self._write_data(0x33)
-        self._write_reg(0xC9)
-        self._write_data(0x68)
-        self._write_reg(0xCA)
-        self._write_data(0x69)
-        self._write_reg(0xCB)
-        self._write_data(0x6A)
-        self._write_reg(0xCC)
-        self._write_data(0x6B)
-        self._write_reg(0xCD)
-        self._write_data(0x33)
-        self._write_data(0x33)
-        self._write_reg(0xCE)
-        self._write_data(0x6C)
-        self._write_reg(0xCF)
-        self._write_data(0x6D)
-        self._write_reg(0xD0)
-        self._write_data(0x6E)
-        self._write_reg(0xD1)
-        self._write_data(0x6F)
-        self._write_reg(0xAB)
-        self._write_data(0x03)
-        self._write_data(0x67)
-        self._write_reg(0xAC)
-        self._write_data(0x03)
-        self._write_data(0x6B)
-        self._write_reg(0xAD)
-        self._write_data(0x03)
-        self._write_data(0x68)
-        self._write_reg(0xAE)
-        self._write_data(0x03)
-        self._write_data(0x6C)
-        self._write_reg(0xB3)
-        self._write_data(0x00)
-        self._write_reg(0xB4)
-        self._write_data(0x00)
-        self._write_reg(0xB5)
-        self._write_data(0x00)
-        self._write_reg(0xB6)
-        self._write_data(0x32)
-        self._write_reg(0xB7)
-        self._write_data(0x7E)
-        self._write_reg(0xB8)
-        self._write_data(0x7E)
-
-        # Gamma和显示配置
-        self._write_reg(0xE0)
-        self._write_data(0x00)
-        self._write_reg(0xE1)
-        self._write_data(0x03)
-        self._write_data(0x0F)
-        self._write_reg(0xE2)
-        self._write_data(0x04)
-        self._write_reg(0xE3)
-        self._write_data(0x01)
-        self._write_reg(0xE4)
-        self._write_data(0x0E)
-        self._write_reg(0xE5)
-        self._write_data(0x01)
-        self._write_reg(0xE6)
-        self._write_data(0x19)
-        self._write_reg(0xE7)
-        self._write_data(0x10)
-        self._write_reg(0xE8)
-        self._write_data(0x10)
-        self._write_reg(0xEA)
-        self._write_data(0x12)
-        self._write_reg(0xEB)
-        self._write_data(0xD0)
-        self._write_reg(0xEC)
-        self._write_data(0x04)
-        self._write_reg(0xED)
-        self._write_data(0x07)
-        self._write_reg(0xEE)
-        self._write_data(0x07)
-        self._write_reg(0xEF)
-        self._write_data(0x09)
-        self._write_reg(0xF0)
-        self._write_data(0xD0)
-        self._write_reg(0xF1)
-        self._write_data(0x0E)
-        self._write_reg(0xF9)
-        self._write_data(0x17)
-        self._write_reg(0xF2)
-        self._write_data(0x2C)
-        self._write_data(0x1B)
-        self._write_data(0x0B)
-        self._write_data(0x20)
-
-        self._write_reg(0xE9)
-        self._write_data(0x29)
-        self._write_reg(0xEC)
-        self._write_data(0x04)
-
-        # TE配置
-        self._write_reg(0x35)
-        self._write_data(0x00)
-        self._write_reg(0x44)
-        self._write_data(0x00)
-        self._write_data(0x10)
-        self._write_reg(0x46)
-        self._write_data(0x10)
-
-        self._write_reg(0xFF)
-        self._write_data(0x00)
-        self._write_reg(0x3A)
-        self._write_data(0x05)
+        self._run_sequence(_INIT_SEQ)
 
         # 设置旋转方向
-        self._write_reg(0x36)
-        if self._rotation == 0:
-            self._write_data(0x00)
-        elif self._rotation == 1:
-            self._write_data(0xC0)
-        elif self._rotation == 2:
-            self._write_data(0x60)
-        else:
-            self._write_data(0xA0)
+        self._bus.command8(0x36, _MADCTL[self._rotation])
 
-        self._write_reg(0x11)
-        time.sleep_ms(220)
-        self._write_reg(0x29)
-        time.sleep_ms(200)
+        if self._rgb444:
+            # 覆盖初始化序列中的COLMOD=0x05（RGB565）
+            self._bus.command8(0x3A, 0x03)
+
+        self._run_sequence(_INIT_SEQ_ON)
 
     @micropython.native
-    def flush(self):
-        """将framebuffer内容提交到屏幕"""
-        if not self._fb_dirty:
+    def _run_sequence(self, seq):
+        """回放命令表，每条命令及其参数在一次CS事务内发送"""
+        bus = self._bus
+        mv = memoryview(seq)
+        i = 0
+        n = len(mv)
+        while i < n:
+            count = mv[i + 1]
+            delay = mv[i + 2]
+            bus.command(mv[i], mv[i + 3:i + 3 + count])
+            if delay:
+                time.sleep_ms(delay)
+            i += 3 + count
+
+    def set_diff_mode(self, enable, tile_width=None, tile_height=8):
+        """设置帧差分刷新模式
+
+        开启后framebuffer被划分为tile，每个tile记录上次发送内容的CRC32。
+        flush()只发送损坏区域内校验和发生变化的tile，适合每帧清屏后
+        重绘大量相同内容的界面。
+
+        参数:
+            enable: 是否开启
+            tile_width: tile宽度（默认为整行宽度，计算校验和最快）
+            tile_height: tile高度
+        """
+        if not enable:
+            self._diff_mode = False
+            self._tile_crc = None
+            self._tile_known = None
             return
-        self._set_address(0, 0, self.width - 1, self.height - 1)
-        chunk_size = 2048
+        if crc32 is None:
+            raise RuntimeError("diff mode requires binascii.crc32")
+        if self._band_rows:
+            raise ValueError("diff mode is not available in band mode")
+        if tile_width is None:
+            tile_width = self._fb_width
+        self._tile_w = tile_width
+        self._tile_h = tile_height
+        self._tile_cols = (self._fb_width + tile_width - 1) // tile_width
+        self._tile_rows = (self._fb_height + tile_height - 1) // tile_height
+        n = self._tile_cols * self._tile_rows
+        self._tile_crc = array('I', [0] * n)
+        # 尚未发送过的tile没有可比较的校验和，第一次损坏时总是发送
+        self._tile_known = bytearray(n)
+        self._tile_hit = bytearray(n)
+        self._diff_mode = True
+
+    @micropython.native
+    def _diff_damage(self):
+        """把损坏区域列表替换为其中校验和发生变化的tile"""
+        d = self._damage
+        n = self._damage_n
+        tw = self._tile_w
+        th = self._tile_h
+        cols = self._tile_cols
+        hit = self._tile_hit
+        for i in range(n):
+            j = i * 4
+            for ty in range(d[j + 1] // th, d[j + 3] // th + 1):
+                for tx in range(d[j] // tw, d[j + 2] // tw + 1):
+                    hit[ty * cols + tx] = 1
+
+        self._damage_n = 0
         fb_mv = self._fb_mv
-        write = self._write_buffer
-        total_len = len(fb_mv)
-        for i in range(0, total_len, chunk_size):
-            write(fb_mv[i:i + chunk_size])
-        self._fb_dirty = False
+        fb_width = self._fb_width
+        fb_height = self._fb_height
+        bits = self._bits
+        row_bytes = self._row_bytes
+        tile_crc = self._tile_crc
+        known = self._tile_known
+        for t in range(len(hit)):
+            if not hit[t]:
+                continue
+            hit[t] = 0
+            x0 = (t % cols) * tw
+            y0 = (t // cols) * th
+            x1 = min(x0 + tw, fb_width) - 1
+            y1 = min(y0 + th, fb_height) - 1
+            # 覆盖像素x0..x1的字节范围（packed模式下首尾字节可能含相邻tile的像素）
+            start = (x0 * bits) >> 3
+            n = (((x1 + 1) * bits + 7) >> 3) - start
+            offset = y0 * row_bytes + start
+            crc = 0
+            for _ in range(y1 - y0 + 1):
+                crc = crc32(fb_mv[offset:offset + n], crc)
+                offset += row_bytes
+            if known[t] and tile_crc[t] == crc:
+                continue
+            tile_crc[t] = crc
+            known[t] = 1
+            self._mark_dirty(x0, y0, x1, y1)
+
+    def _band_recorder(self, name, y_args):
+        """生成分带模式下替代绘制方法的记录函数"""
+        func = getattr(NV3007, name)
+
+        def recorder(*args, **kwargs):
+            if self._replaying:
+                # 回放中的嵌套调用（如draw_triangle调用draw_polygon）直接执行
+                return func(self, *args, **kwargs)
+            if name == "clear":
+                # 清屏覆盖之前的所有内容；列表以当前字体开头，回放每一带时先恢复它
+                self._display_list = [(NV3007._use_font, (), (self._font, self._font_module), {})]
+                self._band_sent = 0
+            self._display_list.append((func, y_args, args, kwargs))
+            if self._auto_flush:
+                self.flush()
+
+        return recorder
+
+    def _flush_bands(self):
+        """分带模式：回放显示列表并发送
+
+        调色板变化等需要整屏重发时逐带回放并发送整带。否则先在每一带中只回放
+        上次刷新之后记录的调用（探测），没有产生损坏区域的带直接跳过；
+        其余的带完整回放后只发送探测到的损坏区域。显示列表在clear()之前一直增长，
+        被涉及的带每次都要回放整个列表。
+        """
+        display_list = self._display_list
+        start = self._band_sent
+        full = self._band_dirty
+        if not full and start == len(display_list):
+            return
+        self._band_dirty = False
+        band_rows = self._band_rows
+        fb_width = self._fb_width
+        rects = self._band_rects
+        old_auto_flush = self._auto_flush
+        font = self._font
+        font_module = self._font_module
+        self._auto_flush = False
+        self._replaying = True
+        try:
+            for y0 in range(0, self.height, band_rows):
+                rows = min(band_rows, self.height - y0)
+                self._fb_height = rows
+                n = 0
+                if not full:
+                    self._damage_n = 0
+                    self._use_font(*self._band_font)
+                    self._band_replay(start, y0)
+                    n = self._damage_n
+                    if n == 0:
+                        continue
+                    for i in range(n * 4):
+                        rects[i] = self._damage[i]
+                # 显示列表以clear()开头时会覆盖整带，否则从黑色开始
+                self._fb_fill_rect(0, 0, fb_width, rows, self.BLACK)
+                self._band_replay(0, y0)
+                if full:
+                    self._flush_rect(self._fb_mv, 0, y0, fb_width - 1, y0 + rows - 1, 0)
+                for i in range(0, n * 4, 4):
+                    self._flush_rect(self._fb_mv, rects[i], y0 + rects[i + 1], rects[i + 2],
+                                     y0 + rects[i + 3], rects[i + 1])
+        finally:
+            self._fb_height = band_rows
+            self._use_font(font, font_module)
+            self._band_sent = len(display_list)
+            self._band_font = (font, font_module)
+            self._replaying = False
+            self._auto_flush = old_auto_flush
+            # 回放时图元在带坐标中记录的损坏区域没有意义
+            self._damage_n = 0
+
+    def _band_replay(self, start, y0):
+        """把显示列表从start开始的各项回放到以y0为起点的带"""
+        display_list = self._display_list
+        for i in range(start, len(display_list)):
+            func, y_args, args, kwargs = display_list[i]
+            if y_args:
+                args, kwargs = self._band_translate(y_args, args, kwargs, y0)
+            func(self, *args, **kwargs)
+
+    @staticmethod
+    def _band_translate(y_args, args, kwargs, y0):
+        """把记录的绘制参数中的y坐标平移到以y0为起点的带坐标"""
+        args = list(args)
+        if kwargs:
+            kwargs = dict(kwargs)
+        for pos, key in y_args:
+            if pos < len(args):
+                value = args[pos]
+            elif key in kwargs:
+                value = kwargs[key]
+            else:
+                continue
+            if key == "vertices":
+                value = [(vx, vy - y0) for vx, vy in value]
+            else:
+                value = value - y0
+            if pos < len(args):
+                args[pos] = value
+            else:
+                kwargs[key] = value
+        return args, kwargs
+
+    @micropython.native
+    def flush(self):
+        """将framebuffer中的损坏区域提交到屏幕，每个矩形一次地址窗口和数据突发
+
+        双缓冲模式下等同于present()；分带模式下逐带回放显示列表。
+        """
+        if self._double_buffer:
+            self.present()
+            return
+        if self._band_rows:
+            self._flush_bands()
+            return
+        if self._diff_mode and self._damage_n:
+            self._diff_damage()
+        n = self._damage_n
+        if n == 0:
+            return
+        self._damage_n = 0
+        self._send_rects(self._fb_mv, self._damage, n)
+
+    @micropython.native
+    def _send_rects(self, fb_mv, d, n):
+        """发送fb_mv中的n个矩形"""
+        if self._damage_area(d, n) >= self._fb_width * self._fb_height:
+            # 矩形互相重叠、总面积不小于整屏时，直接整屏发送更省
+            self._flush_rect(fb_mv, 0, 0, self._fb_width - 1, self._fb_height - 1)
+            return
+        for i in range(n):
+            j = i * 4
+            self._flush_rect(fb_mv, d[j], d[j + 1], d[j + 2], d[j + 3])
+
+    def present(self):
+        """双缓冲模式：交换前后缓冲区，由后台线程发送刚完成的一帧
+
+        如果上一帧仍在传输，先等待其完成。返回后即可继续向后缓冲区绘制
+        下一帧，无需等待SPI传输。
+        """
+        if not self._double_buffer:
+            self.flush()
+            return
+        self._idle_lock.acquire()
+        if self._diff_mode and self._damage_n:
+            self._diff_damage()
+        n = self._damage_n
+        if n == 0:
+            self._idle_lock.release()
+            return
+        d = self._damage
+        job = self._job_rects
+        for i in range(n * 4):
+            job[i] = d[i]
+        self._job_n = n
+        self._damage_n = 0
+
+        # 交换缓冲区，并把本帧变化的区域复制到新的后缓冲区，
+        # 使其内容与刚提交的一帧一致
+        self._framebuffer, self._front_buffer = self._front_buffer, self._framebuffer
+        self._fb_mv, self._front_mv = self._front_mv, self._fb_mv
+        self._fbuf, self._front_fbuf = self._front_fbuf, self._fbuf
+        self._copy_rects(self._front_mv, self._fb_mv, job, n)
+
+        # 唤醒后台线程发送前缓冲区
+        self._job_lock.release()
+
+    @micropython.native
+    def _copy_rects(self, src, dst, d, n):
+        """把src中的n个矩形复制到dst"""
+        bits = self._bits
+        row_bytes = self._row_bytes
+        copy_rows = self._copy_rows
+        args = self._copy_args
+        args[4] = row_bytes
+        args[5] = row_bytes
+        for i in range(n):
+            j = i * 4
+            x0 = d[j]
+            if x0 == 0 and d[j + 2] == self._fb_width - 1:
+                start = d[j + 1] * row_bytes
+                end = (d[j + 3] + 1) * row_bytes
+                dst[start:end] = src[start:end]
+                continue
+            start = (x0 * bits) >> 3
+            offset = d[j + 1] * row_bytes + start
+            args[0] = offset
+            args[1] = offset
+            args[2] = (((d[j + 2] + 1) * bits + 7) >> 3) - start
+            args[3] = d[j + 3] - d[j + 1] + 1
+            copy_rows(dst, src, args)
+
+    def _flush_worker(self):
+        """后台线程：等待present()提交的任务并发送前缓冲区"""
+        while True:
+            self._job_lock.acquire()
+            if self._job_n < 0:
+                break
+            self._send_rects(self._front_mv, self._job_rects, self._job_n)
+            self._idle_lock.release()
+        self._idle_lock.release()
+
+    def wait(self):
+        """双缓冲模式：等待后台线程发送完当前帧"""
+        if self._double_buffer:
+            self._idle_lock.acquire()
+            self._idle_lock.release()
+
+    def deinit(self):
+        """双缓冲模式：等待当前帧发送完毕并结束后台线程"""
+        if self._double_buffer:
+            self._idle_lock.acquire()
+            self._job_n = -1
+            self._job_lock.release()
+            self._idle_lock.acquire()
+            self._idle_lock.release()
+            self._double_buffer = False
+
+    async def flush_async(self, chunk_bytes=4096):
+        """异步刷新，每发送约chunk_bytes字节让出一次事件循环
+
+        损坏区域在开始时被取出，传输期间的绘制会记入新的损坏区域列表，
+        由下一次刷新发送，因此正在传输的区域被改写也不会丢失更新。
+        每个分块都设置自己的地址窗口，分块之间其他任务发送的命令
+        （包括同步flush()）不会打乱本次传输。
+
+        参数:
+            chunk_bytes: 让出粒度（字节），越小事件循环延迟越低、总耗时越长
+        """
+        try:
+            import asyncio
+        except ImportError:
+            import uasyncio as asyncio
+
+        if self._double_buffer:
+            # 双缓冲模式下传输本来就在后台线程中进行
+            self.present()
+            return
+        if self._band_rows:
+            # 分带模式的每一带都需要先回放显示列表，直接同步刷新
+            self.flush()
+            return
+        if self._diff_mode and self._damage_n:
+            self._diff_damage()
+        n = self._damage_n
+        if n == 0:
+            return
+        d = self._damage[:n * 4]
+        self._damage_n = 0
+        if self._damage_area(d, n) >= self._fb_width * self._fb_height:
+            d = array('h', (0, 0, self._fb_width - 1, self._fb_height - 1))
+            n = 1
+        for i in range(n):
+            j = i * 4
+            x0 = d[j]
+            x1 = d[j + 2]
+            y1 = d[j + 3]
+            rows = max(1, chunk_bytes // ((x1 - x0 + 1) * 2))
+            y = d[j + 1]
+            while y <= y1:
+                ye = min(y + rows - 1, y1)
+                self._flush_rect(self._fb_mv, x0, y, x1, ye)
+                y = ye + 1
+                await asyncio.sleep(0)
+
+    @micropython.native
+    def _damage_area(self, d, n):
+        """损坏区域列表中n个矩形的面积之和"""
+        total = 0
+        for i in range(n):
+            j = i * 4
+            total += (d[j + 2] - d[j] + 1) * (d[j + 3] - d[j + 1] + 1)
+        return total
+
+    @micropython.native
+    def _flush_rect(self, fb_mv, x0, y0, x1, y1, src_y=-1, dst_y=-1):
+        """设置地址窗口并发送fb_mv中的一个矩形区域（闭区间）
+
+        src_y为区域第一行在fb_mv中的行号，默认与y0相同（分带模式下为带内行号）；
+        dst_y为区域第一行在GRAM中的行号，默认按滚动位置由y0换算
+        """
+        if src_y < 0:
+            src_y = y0
+        if dst_y < 0:
+            scroll = self._scroll_offset
+            top = self._scroll_top
+            bottom = top + self._scroll_height
+            if scroll and y0 < bottom and y1 >= top:
+                # 滚动区域内的行在GRAM中环形存放，按区域边界和环绕点拆开发送
+                split = bottom - scroll
+                for a, b, shift in ((y0, top - 1, 0),
+                                    (top, split - 1, scroll),
+                                    (split, bottom - 1, scroll - self._scroll_height),
+                                    (bottom, y1, 0)):
+                    a = max(a, y0)
+                    b = min(b, y1)
+                    if a <= b:
+                        self._flush_rect(fb_mv, x0, a, x1, b, src_y + a - y0, a + shift)
+                return
+            dst_y = y0
+        bits = self._bits
+        if bits < 8:
+            # packed模式：窗口扩展到字节边界，每行从整字节开始展开
+            ppb = 8 // bits
+            x0 -= x0 % ppb
+            x1 |= ppb - 1
+            if x1 >= self._fb_width:
+                x1 = self._fb_width - 1
+        if self._rgb444 and not (x1 - x0) & 1:
+            # RGB444每2个像素占3字节，像素对跨行连续，窗口宽度必须为偶数；
+            # 屏幕宽度为偶数（见__init__），总能向一侧扩展1列
+            if x1 + 1 < self._fb_width:
+                x1 += 1
+            elif x0 > 0:
+                x0 -= 1
+        count = y1 - y0 + 1
+        self._set_address(x0, dst_y, x1, dst_y + count - 1)
+        row_bytes = self._row_bytes
+        offset = src_y * row_bytes + ((x0 * bits) >> 3)
+        n = x1 - x0 + 1
+        if self._expand is not None:
+            # 索引色/RGB444：逐行展开或打包到行缓冲区后发送，整个区域只拉低一次CS
+            nbytes = n * 3 // 2 if self._rgb444 else n * 2
+            self._bus.expand_rows(fb_mv, offset, n, row_bytes, count, self._expand,
+                                  self._palette, self._line_mv, self._line_view(nbytes))
+            return
+        full_width = x0 == 0 and x1 == self._fb_width - 1
+        if full_width and offset == 0 and count * row_bytes == len(fb_mv):
+            # 整屏时直接传入framebuffer本身，不产生切片对象
+            self._bus.pixels(fb_mv)
+            return
+        copy16 = self._copy16
+        # copy16复制到行缓冲区后发送缓存的视图，不产生堆分配；
+        # 整行宽度的区域连续，每次复制行缓冲区放得下的整行数
+        rows = 1
+        if full_width:
+            rows = len(self._line_buffer) // row_bytes
+            n *= rows
+        chunks = count // rows
+        if chunks:
+            self._bus.expand_rows(fb_mv, offset, n, rows * row_bytes, chunks, copy16,
+                                  None, self._line_mv, self._line_view(n * 2))
+        rest = count - chunks * rows
+        if rest:
+            n = rest * self._fb_width
+            self._bus.expand_rows(fb_mv, offset + chunks * rows * row_bytes, n, 0, 1, copy16,
+                                  None, self._line_mv, self._line_view(n * 2))
+
+    def _line_view(self, nbytes):
+        """行缓冲区前nbytes字节的视图；按长度缓存，每种宽度只在第一次刷新时创建"""
+        view = self._line_views.get(nbytes)
+        if view is None:
+            view = self._line_mv[:nbytes]
+            self._line_views[nbytes] = view
+        return view
 
     def set_auto_flush(self, enable):
         """设置自动刷新模式"""
@@ -584,14 +2147,25 @@ class NV3007:
         fb = self._fb_mv
         fb_width = self._fb_width
         fb_height = self._fb_height
-        color_hi = (color >> 8) & 0xFF
-        color_lo = color & 0xFF
+        color_hi, color_lo = self._encode(color)
+        step = self._px_bytes
+        lo_off = step - 1
+        plot = self._packed_plot if self._bits < 8 else None
+        self._mark_dirty(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        if self._fbuf is not None:
+            self._fbuf.line(x1, y1, x2, y2, self._fbuf_color(color))
+            if self._auto_flush:
+                self.flush()
+            return
 
         while True:
             if 0 <= x1 < fb_width and 0 <= y1 < fb_height:
-                offset = (y1 * fb_width + x1) * 2
-                fb[offset] = color_hi
-                fb[offset + 1] = color_lo
+                if plot is not None:
+                    plot(x1, y1, color_hi)
+                else:
+                    offset = (y1 * fb_width + x1) * step
+                    fb[offset] = color_hi
+                    fb[offset + lo_off] = color_lo
             if x1 == x2 and y1 == y2:
                 break
             e2 = 2 * err
@@ -692,20 +2266,28 @@ class NV3007:
     @micropython.native
     def draw_circle(self, xc, yc, r, color, filled=False):
         """画圆（极致优化版）"""
+        if self._fbuf is not None:
+            self._fbuf.ellipse(xc, yc, r, r, self._fbuf_color(color), filled)
+            self._mark_dirty(xc - r, yc - r, xc + r, yc + r)
+            if self._auto_flush:
+                self.flush()
+            return
         old_auto_flush = self._auto_flush
         self._auto_flush = False
 
         fb = self._fb_mv
         fb_width = self._fb_width
         fb_height = self._fb_height
-        fill_buf = self._fill_mv
 
         if filled:
             y_start = max(0, yc - r)
             y_end = min(yc + r, fb_height - 1)
 
-            color_hi = (color >> 8) & 0xFF
-            color_lo = color & 0xFF
+            color_hi, color_lo = self._encode(color)
+            color16 = (color_hi << 8) | color_lo
+            step = self._px_bytes
+            fill_span = self._fill_span
+            plot = self._packed_plot if self._bits < 8 else None
             r2 = r * r
 
             for py in range(y_start, y_end + 1):
@@ -716,21 +2298,20 @@ class NV3007:
                     x_start = max(0, xc - dx_max)
                     x_end = min(xc + dx_max, fb_width - 1)
                     if x_start <= x_end:
-                        w = x_end - x_start + 1
-                        offset = (py * fb_width + x_start) * 2
-
-                        for i in range(0, w * 2, 2):
-                            fill_buf[i] = color_hi
-                            fill_buf[i + 1] = color_lo
-
-                        fb[offset : offset + w * 2] = fill_buf[:w * 2]
-            self._fb_dirty = True
+                        if plot is not None:
+                            self._packed_fill(x_start, x_end, py, py, color_hi)
+                            continue
+                        fill_span(fb, (py * fb_width + x_start) * step,
+                                  (x_end - x_start + 1) * step, color16)
+            self._mark_dirty(xc - r, yc - r, xc + r, yc + r)
         else:
             x = 0
             y = r
             d = 3 - 2 * r
-            color_hi = (color >> 8) & 0xFF
-            color_lo = color & 0xFF
+            color_hi, color_lo = self._encode(color)
+            step = self._px_bytes
+            lo_off = step - 1
+            plot = self._packed_plot if self._bits < 8 else None
 
             while y >= x:
                 px1 = xc + x
@@ -739,21 +2320,33 @@ class NV3007:
                 py2 = yc - y
 
                 if 0 <= px1 < fb_width and 0 <= py1 < fb_height:
-                    offset = (py1 * fb_width + px1) * 2
-                    fb[offset] = color_hi
-                    fb[offset + 1] = color_lo
+                    if plot is not None:
+                        plot(px1, py1, color_hi)
+                    else:
+                        offset = (py1 * fb_width + px1) * step
+                        fb[offset] = color_hi
+                        fb[offset + lo_off] = color_lo
                 if 0 <= px2 < fb_width and 0 <= py1 < fb_height:
-                    offset = (py1 * fb_width + px2) * 2
-                    fb[offset] = color_hi
-                    fb[offset + 1] = color_lo
+                    if plot is not None:
+                        plot(px2, py1, color_hi)
+                    else:
+                        offset = (py1 * fb_width + px2) * step
+                        fb[offset] = color_hi
+                        fb[offset + lo_off] = color_lo
                 if 0 <= px1 < fb_width and 0 <= py2 < fb_height:
-                    offset = (py2 * fb_width + px1) * 2
-                    fb[offset] = color_hi
-                    fb[offset + 1] = color_lo
+                    if plot is not None:
+                        plot(px1, py2, color_hi)
+                    else:
+                        offset = (py2 * fb_width + px1) * step
+                        fb[offset] = color_hi
+                        fb[offset + lo_off] = color_lo
                 if 0 <= px2 < fb_width and 0 <= py2 < fb_height:
-                    offset = (py2 * fb_width + px2) * 2
-                    fb[offset] = color_hi
-                    fb[offset + 1] = color_lo
+                    if plot is not None:
+                        plot(px2, py2, color_hi)
+                    else:
+                        offset = (py2 * fb_width + px2) * step
+                        fb[offset] = color_hi
+                        fb[offset + lo_off] = color_lo
 
                 px1 = xc + y
                 px2 = xc - y
@@ -761,21 +2354,33 @@ class NV3007:
                 py2 = yc - x
 
                 if 0 <= px1 < fb_width and 0 <= py1 < fb_height:
-                    offset = (py1 * fb_width + px1) * 2
-                    fb[offset] = color_hi
-                    fb[offset + 1] = color_lo
+                    if plot is not None:
+                        plot(px1, py1, color_hi)
+                    else:
+                        offset = (py1 * fb_width + px1) * step
+                        fb[offset] = color_hi
+                        fb[offset + lo_off] = color_lo
                 if 0 <= px2 < fb_width and 0 <= py1 < fb_height:
-                    offset = (py1 * fb_width + px2) * 2
-                    fb[offset] = color_hi
-                    fb[offset + 1] = color_lo
+                    if plot is not None:
+                        plot(px2, py1, color_hi)
+                    else:
+                        offset = (py1 * fb_width + px2) * step
+                        fb[offset] = color_hi
+                        fb[offset + lo_off] = color_lo
                 if 0 <= px1 < fb_width and 0 <= py2 < fb_height:
-                    offset = (py2 * fb_width + px1) * 2
-                    fb[offset] = color_hi
-                    fb[offset + 1] = color_lo
+                    if plot is not None:
+                        plot(px1, py2, color_hi)
+                    else:
+                        offset = (py2 * fb_width + px1) * step
+                        fb[offset] = color_hi
+                        fb[offset + lo_off] = color_lo
                 if 0 <= px2 < fb_width and 0 <= py2 < fb_height:
-                    offset = (py2 * fb_width + px2) * 2
-                    fb[offset] = color_hi
-                    fb[offset + 1] = color_lo
+                    if plot is not None:
+                        plot(px2, py2, color_hi)
+                    else:
+                        offset = (py2 * fb_width + px2) * step
+                        fb[offset] = color_hi
+                        fb[offset + lo_off] = color_lo
 
                 x += 1
                 if d > 0:
@@ -784,7 +2389,7 @@ class NV3007:
                 else:
                     d = d + 4 * x + 6
 
-            self._fb_dirty = True
+            self._mark_dirty(xc - r, yc - r, xc + r, yc + r)
 
         self._auto_flush = old_auto_flush
         if self._auto_flush:
@@ -802,17 +2407,30 @@ class NV3007:
         fb = self._fb_mv
         fb_width = self._fb_width
         fb_height = self._fb_height
-        color_hi = (color >> 8) & 0xFF
-        color_lo = color & 0xFF
+        color_hi, color_lo = self._encode(color)
+        step = self._px_bytes
+        lo_off = step - 1
+        plot = self._packed_plot if self._bits < 8 else None
 
         prev_px = 0
         prev_py = 0
         first = True
+        min_x = max_x = xc
+        min_y = max_y = yc
 
         for i in range(steps + 1):
             angle = start_angle + angle_step * i
             px = int(xc + r * math.cos(angle))
-            py = int(yc + r * math.sin(angle))
+            # y向下取整：分带渲染平移y坐标后取整结果不变
+            py = math.floor(yc + r * math.sin(angle))
+            if px < min_x:
+                min_x = px
+            elif px > max_x:
+                max_x = px
+            if py < min_y:
+                min_y = py
+            elif py > max_y:
+                max_y = py
 
             if not first:
                 dx = abs(px - prev_px)
@@ -823,9 +2441,12 @@ class NV3007:
                 x, y = prev_px, prev_py
                 while True:
                     if 0 <= x < fb_width and 0 <= y < fb_height:
-                        offset = (y * fb_width + x) * 2
-                        fb[offset] = color_hi
-                        fb[offset + 1] = color_lo
+                        if plot is not None:
+                            plot(x, y, color_hi)
+                        else:
+                            offset = (y * fb_width + x) * step
+                            fb[offset] = color_hi
+                            fb[offset + lo_off] = color_lo
                     if x == px and y == py:
                         break
                     e2 = 2 * err
@@ -841,9 +2462,10 @@ class NV3007:
             prev_px = px
             prev_py = py
 
+        self._mark_dirty(min_x, min_y, max_x, max_y)
         if filled:
             self.draw_polygon([(xc, yc)] + [(int(xc + r * math.cos(start_angle + angle_step * i)),
-                                              int(yc + r * math.sin(start_angle + angle_step * i)))
+                                              math.floor(yc + r * math.sin(start_angle + angle_step * i)))
                                              for i in range(steps + 1)], color, filled=True)
         self._auto_flush = old_auto_flush
         if self._auto_flush:
@@ -851,14 +2473,23 @@ class NV3007:
 
     def draw_ellipse(self, xc, yc, rx, ry, color, filled=False):
         """画椭圆（极致优化版）"""
+        if self._fbuf is not None:
+            self._fbuf.ellipse(xc, yc, rx, ry, self._fbuf_color(color), filled)
+            self._mark_dirty(xc - rx, yc - ry, xc + rx, yc + ry)
+            if self._auto_flush:
+                self.flush()
+            return
         old_auto_flush = self._auto_flush
         self._auto_flush = False
 
         fb = self._fb_mv
         fb_width = self._fb_width
         fb_height = self._fb_height
-        color_hi = (color >> 8) & 0xFF
-        color_lo = color & 0xFF
+        color_hi, color_lo = self._encode(color)
+        color16 = (color_hi << 8) | color_lo
+        step = self._px_bytes
+        lo_off = step - 1
+        plot = self._packed_plot if self._bits < 8 else None
 
         if filled:
             y_start = max(0, yc - ry)
@@ -876,24 +2507,26 @@ class NV3007:
                     x_start = max(0, xc - dx_max)
                     x_end = min(xc + dx_max, fb_width - 1)
                     if x_start <= x_end:
-                        w = x_end - x_start + 1
-                        offset = (py * fb_width + x_start) * 2
-
-                        for i in range(0, w * 2, 2):
-                            fb[offset + i] = color_hi
-                            fb[offset + i + 1] = color_lo
-            self._fb_dirty = True
+                        if plot is not None:
+                            self._packed_fill(x_start, x_end, py, py, color_hi)
+                            continue
+                        self._fill_span(fb, (py * fb_width + x_start) * step,
+                                        (x_end - x_start + 1) * step, color16)
+            self._mark_dirty(xc - rx, yc - ry, xc + rx, yc + ry)
         else:
             steps = max(1, int(max(rx, ry) * 6.28318 / 5))
             for i in range(steps):
                 angle = 6.28318 * i / steps
                 px = int(xc + rx * math.cos(angle))
-                py = int(yc + ry * math.sin(angle))
+                py = math.floor(yc + ry * math.sin(angle))
                 if 0 <= px < fb_width and 0 <= py < fb_height:
-                    offset = (py * fb_width + px) * 2
-                    fb[offset] = color_hi
-                    fb[offset + 1] = color_lo
-            self._fb_dirty = True
+                    if plot is not None:
+                        plot(px, py, color_hi)
+                    else:
+                        offset = (py * fb_width + px) * step
+                        fb[offset] = color_hi
+                        fb[offset + lo_off] = color_lo
+            self._mark_dirty(xc - rx, yc - ry, xc + rx, yc + ry)
 
         self._auto_flush = old_auto_flush
         if self._auto_flush:
@@ -914,10 +2547,29 @@ class NV3007:
         fb = self._fb_mv
         fb_width = self._fb_width
         fb_height = self._fb_height
-        color_hi = (color >> 8) & 0xFF
-        color_lo = color & 0xFF
-
-        if not filled:
+        color_hi, color_lo = self._encode(color)
+        color16 = (color_hi << 8) | color_lo
+        step = self._px_bytes
+        lo_off = step - 1
+        plot = self._packed_plot if self._bits < 8 else None
+
+        min_x = max_x = vertices[0][0]
+        min_y = max_y = vertices[0][1]
+        for v in vertices:
+            if v[0] < min_x:
+                min_x = v[0]
+            elif v[0] > max_x:
+                max_x = v[0]
+            if v[1] < min_y:
+                min_y = v[1]
+            elif v[1] > max_y:
+                max_y = v[1]
+        self._mark_dirty(min_x, min_y, max_x, max_y)
+
+        if self._fbuf is not None:
+            coords = array('h', [c for v in vertices for c in v])
+            self._fbuf.poly(0, 0, coords, self._fbuf_color(color), filled)
+        elif not filled:
             for i in range(n):
                 x1, y1 = vertices[i]
                 x2, y2 = vertices[(i + 1) % n]
@@ -928,9 +2580,12 @@ class NV3007:
                 err = dx - dy
                 while True:
                     if 0 <= x1 < fb_width and 0 <= y1 < fb_height:
-                        offset = (y1 * fb_width + x1) * 2
-                        fb[offset] = color_hi
-                        fb[offset + 1] = color_lo
+                        if plot is not None:
+                            plot(x1, y1, color_hi)
+                        else:
+                            offset = (y1 * fb_width + x1) * step
+                            fb[offset] = color_hi
+                            fb[offset + lo_off] = color_lo
                     if x1 == x2 and y1 == y2:
                         break
                     e2 = 2 * err
@@ -941,25 +2596,15 @@ class NV3007:
                         err += dx
                         y1 += sy
         else:
-            min_y = fb_height
-            max_y = -1
-            for v in vertices:
-                y = v[1]
-                if y < min_y:
-                    min_y = y
-                if y > max_y:
-                    max_y = y
-
             y_start = max(0, min_y)
             y_end = min(fb_height - 1, max_y)
 
-            v0 = vertices[0]
-            v_prev = v0
-            intersections0 = []
-            intersections1 = []
+            v_last = vertices[n - 1]
 
             for y in range(y_start, y_end + 1):
                 intersections = []
+                # 每条扫描线都从闭合边 (最后一个顶点, 第一个顶点) 开始
+                v_prev = v_last
                 for i in range(n):
                     v_curr = vertices[i]
                     x1, y1 = v_prev
@@ -979,14 +2624,12 @@ class NV3007:
                             x_start, x_end = x_end, x_start
                         x_start = max(0, x_start)
                         x_end = min(fb_width - 1, x_end)
-                        if x_start <= x_end:
-                            w = x_end - x_start + 1
-                            offset = (y * fb_width + x_start) * 2
-                            for i in range(0, w * 2, 2):
-                                fb[offset + i] = color_hi
-                                fb[offset + i + 1] = color_lo
-
-            self._fb_dirty = True
+                        if plot is not None and x_start <= x_end:
+                            self._packed_fill(x_start, x_end, y, y, color_hi)
+                        elif x_start <= x_end:
+                            self._fill_span(fb, (y * fb_width + x_start) * step,
+                                            (x_end - x_start + 1) * step, color16)
+
         self._auto_flush = old_auto_flush
         if self._auto_flush:
             self.flush()
@@ -1006,40 +2649,66 @@ class NV3007:
         fb = self._fb_mv
         fb_width = self._fb_width
         fb_height = self._fb_height
-        color_hi = (color >> 8) & 0xFF
-        color_lo = color & 0xFF
+        color_hi, color_lo = self._encode(color)
+        step = self._px_bytes
+        plot = self._packed_plot if self._bits < 8 else None
 
-        rows = (h + 7) // 8
         bitmap_len = len(bitmap_mv)
 
-        for row in range(h):
-            py = y + row
-            if py < 0 or py >= fb_height:
-                continue
+        if plot is None:
+            # 裁剪到屏幕内（只绘制完整的字节行），由内核一次绘制
+            col0 = max(0, -x)
+            col1 = min(w, fb_width - x)
+            row0 = max(0, -y)
+            row1 = min(h, fb_height - y)
+            if col0 < col1:
+                row1 = min(row1, (bitmap_len // w) * 8)
+            if col0 < col1 and row0 < row1:
+                args = self._glyph_args
+                args[0] = w
+                args[1] = col0
+                args[2] = col1 - col0
+                args[3] = row0
+                args[4] = row1 - row0
+                args[5] = ((y + row0) * fb_width + x + col0) * step
+                args[6] = fb_width * step
+                args[7] = step
+                self._bitmap(bitmap_mv, fb, args, (color_hi << 8) | color_lo)
+        else:
+            for row in range(h):
+                py = y + row
+                if py < 0 or py >= fb_height:
+                    continue
 
-            byte_row = row >> 3
-            bit_offset = 7 - (row & 7)
-            row_offset = py * fb_width
-            base_idx = byte_row * w
+                byte_row = row >> 3
+                bit_offset = 7 - (row & 7)
+                base_idx = byte_row * w
 
-            for col in range(w):
-                px = x + col
-                if px < 0 or px >= fb_width:
-                    continue
+                for col in range(w):
+                    px = x + col
+                    if px < 0 or px >= fb_width:
+                        continue
 
-                byte_idx = base_idx + col
-                if byte_idx < bitmap_len and (bitmap_mv[byte_idx] >> bit_offset) & 1:
-                    offset = (row_offset + px) * 2
-                    fb[offset] = color_hi
-                    fb[offset + 1] = color_lo
+                    byte_idx = base_idx + col
+                    if byte_idx < bitmap_len and (bitmap_mv[byte_idx] >> bit_offset) & 1:
+                        plot(px, py, color_hi)
 
-        self._fb_dirty = True
+        self._mark_dirty(x, y, x + w - 1, y + h - 1)
         self._auto_flush = old_auto_flush
         if self._auto_flush:
             self.flush()
 
     def draw_bitmap_rgb565(self, x, y, bitmap, w, h):
         """画RGB565位图（优化版）"""
+        if (self._fbuf is not None and self._bits == 16
+                and isinstance(bitmap, bytearray) and len(bitmap) >= w * h * 2):
+            # 源和目标都按framebuf的RGB565解释，blit逐像素原样复制，字节顺序不变；
+            # framebuf只能包装可写缓冲区，其他类型的位图走Python实现
+            self._fbuf.blit(framebuf.FrameBuffer(bitmap, w, h, framebuf.RGB565), x, y)
+            self._mark_dirty(x, y, x + w - 1, y + h - 1)
+            if self._auto_flush:
+                self.flush()
+            return
         if isinstance(bitmap, memoryview):
             bitmap_mv = bitmap
         elif isinstance(bitmap, bytes):
@@ -1054,42 +2723,352 @@ class NV3007:
         fb_width = self._fb_width
         fb_height = self._fb_height
         bitmap_len = len(bitmap_mv)
+        palette = self._palette
+
+        if palette is None:
+            # RGB565：裁剪后由内核逐行复制
+            col0 = max(0, -x)
+            col1 = min(w, fb_width - x)
+            row0 = max(0, -y)
+            row1 = min(h, fb_height - y)
+            if col0 < col1:
+                row1 = min(row1, bitmap_len // (w * 2))
+            if col0 < col1 and row0 < row1:
+                args = self._copy_args
+                args[0] = ((y + row0) * fb_width + x + col0) * 2
+                args[1] = (row0 * w + col0) * 2
+                args[2] = (col1 - col0) * 2
+                args[3] = row1 - row0
+                args[4] = fb_width * 2
+                args[5] = w * 2
+                self._copy_rows(fb, bitmap_mv, args)
+        else:
+            for row in range(h):
+                py = y + row
+                if py < 0 or py >= fb_height:
+                    continue
 
-        for row in range(h):
-            py = y + row
-            if py < 0 or py >= fb_height:
-                continue
+                row_offset = py * fb_width
+                base_idx = row * w * 2
 
-            row_offset = py * fb_width
-            base_idx = row * w * 2
+                for col in range(w):
+                    px = x + col
+                    if px < 0 or px >= fb_width:
+                        continue
 
-            for col in range(w):
-                px = x + col
-                if px < 0 or px >= fb_width:
-                    continue
+                    idx = base_idx + col * 2
+                    if idx + 1 < bitmap_len:
+                        # 索引色：每个像素查找（必要时分配）调色板项
+                        index = self._encode((bitmap_mv[idx] << 8) | bitmap_mv[idx + 1])[0]
+                        if self._bits < 8:
+                            self._packed_plot(px, py, index)
+                        else:
+                            fb[row_offset + px] = index
+
+        self._mark_dirty(x, y, x + w - 1, y + h - 1)
+        self._auto_flush = old_auto_flush
+        if self._auto_flush:
+            self.flush()
+
+    def draw_sprite(self, x, y, sprite):
+        """画RLE编码的RGB565精灵（带透明像素）
+
+        精灵格式: 宽度和高度（各2字节，小端），之后为按行的游程（格式见_sprite_py）。
+        用 img_to_sprite.py 从图片或RGB565位图生成。透明游程整段跳过，
+        RGB565模式下不透明游程由切片复制一次写入framebuffer。
+
+        参数:
+            x, y: 左上角坐标
+            sprite: 精灵数据（bytes/bytearray/memoryview）
+        """
+        if isinstance(sprite, memoryview):
+            sprite_mv = sprite
+        else:
+            sprite_mv = memoryview(sprite)
+        w = sprite_mv[0] | (sprite_mv[1] << 8)
+        h = sprite_mv[2] | (sprite_mv[3] << 8)
+        fb_width = self._fb_width
+        fb_height = self._fb_height
+        col0 = max(0, -x)
+        col1 = min(w, fb_width - x)
+        row0 = max(0, -y)
+        row1 = min(h, fb_height - y)
+        if col0 >= col1 or row0 >= row1:
+            return
 
-                idx = base_idx + col * 2
-                if idx + 1 < bitmap_len:
-                    offset = (row_offset + px) * 2
-                    fb[offset] = bitmap_mv[idx]
-                    fb[offset + 1] = bitmap_mv[idx + 1]
+        old_auto_flush = self._auto_flush
+        self._auto_flush = False
 
-        self._fb_dirty = True
+        if self._palette is None:
+            args = self._sprite_args
+            args[0] = 4
+            args[1] = w
+            args[2] = col0
+            args[3] = col1
+            args[4] = row0
+            args[5] = row1
+            args[6] = ((y + row0) * fb_width + x + col0) * 2
+            args[7] = fb_width * 2
+            self._sprite(self._fb_mv, sprite_mv, args)
+        else:
+            # 索引色：逐像素查找（必要时分配）调色板项
+            fb = self._fb_mv
+            i = 4
+            row = 0
+            col = 0
+            while row < row1:
+                c = sprite_mv[i]
+                i += 1
+                n = (c & 0x7F) + 1
+                if c & 0x80:
+                    if row >= row0:
+                        py = y + row
+                        for k in range(max(col, col0), min(col + n, col1)):
+                            j = i + (k - col) * 2
+                            index = self._encode((sprite_mv[j] << 8) | sprite_mv[j + 1])[0]
+                            if self._bits < 8:
+                                self._packed_plot(x + k, py, index)
+                            else:
+                                fb[py * fb_width + x + k] = index
+                    i += n * 2
+                col += n
+                if col >= w:
+                    col = 0
+                    row += 1
+
+        self._mark_dirty(x + col0, y + row0, x + col1 - 1, y + row1 - 1)
         self._auto_flush = old_auto_flush
         if self._auto_flush:
             self.flush()
 
-    def set_font(self, font_module):
-        """设置字体模块"""
-        self._font = font_module
+    def set_font(self, font_module, index=True):
+        """设置字体模块
+
+        参数:
+            font_module: font_to_py生成的字体模块（或FontIndex）
+            index: 对稀疏字体构建FontIndex，按常数时间查找字符（只在字体变化时构建一次）；
+                   传入的已经是FontIndex时直接使用
+        """
+        use_index = (index and not isinstance(font_module, FontIndex)
+                     and hasattr(font_module, "_sparse") and font_module.hmap())
+        # 没有变化：同一字体模块，且是否经过新建的索引与上次相同
+        if font_module is self._font_module and use_index == (self._font is not font_module):
+            return
+        self._use_font(FontIndex(font_module) if use_index else font_module, font_module)
+        if self._band_rows and not self._replaying:
+            # 分带模式下字体切换也记录到显示列表，回放时按绘制顺序生效；
+            # 连续切换只保留最后一次
+            entry = (NV3007._use_font, (), (self._font, font_module), {})
+            display_list = self._display_list
+            if len(display_list) > self._band_sent and display_list[-1][0] is NV3007._use_font:
+                display_list[-1] = entry
+            else:
+                display_list.append(entry)
+
+    def _use_font(self, font, font_module):
+        """切换当前字体（font为实际查询字形的对象），字体变化时清空字形缓存"""
+        if font is self._font:
+            return
+        if self._glyph_cache is not None:
+            self._glyph_cache = {}
+            self._glyph_bytes = 0
+        self._font = font
+        self._font_module = font_module
+
+    def set_glyph_cache(self, max_bytes):
+        """设置字形缓存
+
+        缓存以字符为键保存解码后的水平游程表，重复绘制的字符不再调用font.get_ch()，
+        也不再逐位测试字形；完全位于屏幕内的字形由spans内核按游程直接填充。
+        超出字节预算时淘汰最久未使用的字形。更换字体时缓存清空。
 
-    def draw_text(self, x, y, text, fg_color=None):
+        参数:
+            max_bytes: 缓存的字节预算（按游程表大小加每项固定开销估算），0关闭缓存
+        """
+        if max_bytes:
+            self._glyph_cache = {}
+            self._glyph_budget = max_bytes
+        else:
+            self._glyph_cache = None
+        self._glyph_bytes = 0
+        self._glyph_tick = 0
+        self._glyph_hits = 0
+        self._glyph_misses = 0
+
+    def glyph_cache_stats(self):
+        """返回字形缓存统计 (命中次数, 未命中次数, 占用字节数, 缓存的字形数)"""
+        if self._glyph_cache is None:
+            return (self._glyph_hits, self._glyph_misses, 0, 0)
+        return (self._glyph_hits, self._glyph_misses, self._glyph_bytes, len(self._glyph_cache))
+
+    def _cache_glyph(self, ch):
+        """解码字形并放入缓存，返回缓存项 [runs, 高, 宽, 位图, 使用时间, 字节数]"""
+        self._glyph_misses += 1
+        bitmap, ch_height, ch_width = self._font.get_ch(ch)
+        # 复制位图：BinFont等按需读取的字体会复用返回的缓冲区
+        bitmap = bytes(bitmap)
+        bytes_per_row = (ch_width + 7) >> 3
+        fb_width = self._fb_width
+        n = len(bitmap)
+        runs = array('i')
+        for row in range(ch_height):
+            base = row * bytes_per_row
+            col = 0
+            while col < ch_width:
+                start = col
+                while (col < ch_width and base + (col >> 3) < n
+                       and (bitmap[base + (col >> 3)] >> (7 - (col & 7))) & 1):
+                    col += 1
+                if col > start:
+                    runs.append(row * fb_width + start)
+                    runs.append(col - start)
+                else:
+                    col += 1
+        # 每项除游程表和位图外的字典项、列表和array对象开销按64字节估算
+        size = len(runs) * 4 + n + 64
+        entry = [runs, ch_height, ch_width, bitmap, 0, size]
+        cache = self._glyph_cache
+        if size > self._glyph_budget:
+            return entry
+        while self._glyph_bytes + size > self._glyph_budget:
+            oldest = None
+            oldest_tick = 0
+            for key in cache:
+                tick = cache[key][4]
+                if oldest is None or tick < oldest_tick:
+                    oldest = key
+                    oldest_tick = tick
+            self._glyph_bytes -= cache.pop(oldest)[5]
+        cache[ch] = entry
+        self._glyph_bytes += size
+        return entry
+
+    def _aa_lut(self, fg, bg, bpp):
+        """返回前景色fg以各级alpha叠加在背景色bg上的RGB565查找表
+
+        表为 2 << bpp 字节，alpha为a的颜色在 [a * 2]（高字节）和 [a * 2 + 1]（低字节）。
+        每对颜色只按通道计算一次，之后从缓存取；缓存超过 _AA_LUT_MAX 张时清空。
+        """
+        key = (((fg << 16) | bg) << 3) | bpp
+        lut = self._aa_luts.get(key)
+        if lut is not None:
+            return lut
+        if len(self._aa_luts) >= _AA_LUT_MAX:
+            self._aa_luts = {}
+        top = (1 << bpp) - 1
+        fr = fg >> 11
+        fgr = (fg >> 5) & 0x3F
+        fb = fg & 0x1F
+        br = bg >> 11
+        bgr = (bg >> 5) & 0x3F
+        bb = bg & 0x1F
+        half = top >> 1
+        lut = bytearray(2 << bpp)
+        for a in range(top + 1):
+            inv = top - a
+            c = ((((fr * a + br * inv + half) // top) << 11)
+                 | (((fgr * a + bgr * inv + half) // top) << 5)
+                 | ((fb * a + bb * inv + half) // top))
+            lut[a << 1] = c >> 8
+            lut[(a << 1) + 1] = c & 0xFF
+        self._aa_luts[key] = lut
+        return lut
+
+    def _aa_lut_over(self, bg):
+        """aa_over内核的 lut_for：当前前景色叠加在bg上的混合表"""
+        return self._aa_lut(self._aa_fg, bg, self._aa_bpp)
+
+    def _draw_text_aa(self, x, y, text, fg_color, bg_color, bpp):
+        """draw_text的抗锯齿字体路径（font.bpp()为2或4）
+
+        RGB565 framebuffer按alpha混合：不透明文本用 (前景色, 背景色) 的混合表一次查表写入；
+        透明文本读出每个边缘像素的背景色再查表。索引色和packed模式没有中间色，
+        按alpha的一半二值化绘制。
+        """
+        font = self._font
+        fb = self._fb_mv
+        fb_width = self._fb_width
+        fb_height = self._fb_height
+        step = self._px_bytes
+        top = (1 << bpp) - 1
+        args = self._aa_args
+        args[6] = fb_width * step
+        args[7] = step
+        args[8] = bpp
+        args[9] = 0
+        over = None
+        if self._palette is None:
+            if bg_color is None:
+                over = self._aa_over
+                self._aa_fg = fg_color
+                self._aa_bpp = bpp
+                lut_for = self._aa_lut_over
+            else:
+                lut = self._aa_lut(fg_color, bg_color, bpp)
+        else:
+            fg_index = self._encode(fg_color)[0]
+            half = (top + 1) >> 1
+            lut = bytearray(2 << bpp)
+            if bg_color is None:
+                # 透明：只写alpha过半的像素
+                args[9] = half
+            else:
+                bg_index = self._encode(bg_color)[0]
+                for a in range(half << 1):
+                    lut[a] = bg_index
+            for a in range(half << 1, 2 << bpp):
+                lut[a] = fg_index
+        plot = self._packed_plot if self._bits < 8 else None
+        aa = self._aa
+
+        cur_x = x
+        for ch in text:
+            if cur_x >= fb_width:
+                break
+            bitmap, ch_height, ch_width = font.get_ch(ch)
+            if cur_x + ch_width <= 0:
+                cur_x += ch_width
+                continue
+            bytes_per_row = (ch_width * bpp + 7) >> 3
+            col0 = max(0, -cur_x)
+            col1 = min(ch_width, fb_width - cur_x)
+            row0 = max(0, -y)
+            row1 = min(ch_height, fb_height - y, len(bitmap) // bytes_per_row)
+            if col0 < col1 and row0 < row1:
+                if plot is None:
+                    args[0] = row0 * bytes_per_row
+                    args[1] = bytes_per_row
+                    args[2] = col0
+                    args[3] = col1 - col0
+                    args[4] = row1 - row0
+                    args[5] = ((y + row0) * fb_width + cur_x + col0) * step
+                    if over is not None:
+                        over(bitmap, fb, args, lut_for)
+                    else:
+                        aa(bitmap, fb, args, lut)
+                else:
+                    min_alpha = args[9]
+                    for row in range(row0, row1):
+                        base = row * bytes_per_row
+                        for col in range(col0, col1):
+                            bit = col * bpp
+                            a = (bitmap[base + (bit >> 3)] >> (8 - bpp - (bit & 7))) & top
+                            if a >= min_alpha:
+                                plot(cur_x + col, y + row, lut[a << 1])
+            cur_x += ch_width
+        return cur_x
+
+    def draw_text(self, x, y, text, fg_color=None, bg_color=None):
         """绘制文本
 
+        指定bg_color时为不透明文本：glyph内核在同一遍中写入前景和背景像素，
+        每个像素只写一次，更新标签时不需要先用draw_rect擦除。
+
         参数:
             x, y: 文本起始坐标
             text: 要绘制的文本
             fg_color: 前景色（默认WHITE）
+            bg_color: 背景色（默认None，只绘制前景像素）
         """
         if self._font is None:
             return
@@ -1097,31 +3076,161 @@ class NV3007:
         if fg_color is None:
             fg_color = self.WHITE
 
+        font = self._font
+        fb_width = self._fb_width
+        fb_height = self._fb_height
+        if x >= fb_width or y >= fb_height or y + font.height() <= 0:
+            # 整行文本都在屏幕外
+            return
+
         old_auto_flush = self._auto_flush
         self._auto_flush = False
 
-        font = self._font
+        bpp = font.bpp() if hasattr(font, "bpp") else 1
+        if bpp > 1:
+            # 抗锯齿字体
+            cur_x = self._draw_text_aa(x, y, text, fg_color, bg_color, bpp)
+            self._mark_dirty(x, y, cur_x - 1, y + font.height() - 1)
+            self._auto_flush = old_auto_flush
+            if self._auto_flush:
+                self.flush()
+            return
+
         fb = self._fb_mv
-        fb_width = self._fb_width
-        fb_height = self._fb_height
-        color_hi = (fg_color >> 8) & 0xFF
-        color_lo = fg_color & 0xFF
+        color_hi, color_lo = self._encode(fg_color)
+        color16 = (color_hi << 8) | color_lo
+        opaque = bg_color is not None
+        bg16 = -1
+        if opaque:
+            bg_hi, bg_lo = self._encode(bg_color)
+            bg16 = (bg_hi << 8) | bg_lo
+        step = self._px_bytes
+        plot = self._packed_plot if self._bits < 8 else None
+        glyph = self._glyph
+        args = self._glyph_args
+        args[6] = fb_width * step
+        args[7] = step
+        args[8] = bg16
+        cache = self._glyph_cache
+        spans = self._spans
+        span_args = self._span_args
+        span_args[2] = step
+
+        # RLE字体（没有字形缓存时）按游程直接填充，不展开位图
+        get_rle = None
+        if cache is None and plot is None:
+            get_rle = getattr(font, "get_rle", None)
+        if get_rle is not None:
+            rle = self._rle
+            rle_args = self._rle_args
+            rle_args[0] = 0
+            rle_args[8] = fb_width * step
+            rle_args[9] = step
+
+        # 没有字形缓存时一次查找全部字符
+        glyphs = None
+        if cache is None and get_rle is None and hasattr(font, "get_ch_many"):
+            glyphs = font.get_ch_many(text)
 
         cur_x = x
-        for ch in text:
-            bitmap, ch_height, ch_width = font.get_ch(ch)
-            if isinstance(bitmap, memoryview):
-                bitmap_mv = bitmap
+        for i, ch in enumerate(text):
+            if cur_x >= fb_width:
+                # 之后的字形都在屏幕右侧
+                break
+            if cache is not None:
+                entry = cache.get(ch)
+                if entry is None:
+                    entry = self._cache_glyph(ch)
+                else:
+                    self._glyph_hits += 1
+                self._glyph_tick += 1
+                entry[4] = self._glyph_tick
+                ch_height = entry[1]
+                ch_width = entry[2]
+                if (cur_x >= 0 and y >= 0 and cur_x + ch_width <= fb_width
+                        and y + ch_height <= fb_height and not (opaque and plot is None)):
+                    # 完全位于屏幕内：按游程填充
+                    runs = entry[0]
+                    if plot is None:
+                        span_args[0] = (y * fb_width + cur_x) * step
+                        span_args[1] = len(runs) >> 1
+                        spans(fb, runs, span_args, color16)
+                    else:
+                        if opaque:
+                            self._packed_fill(cur_x, cur_x + ch_width - 1, y, y + ch_height - 1, bg_hi)
+                        origin = y * fb_width + cur_x
+                        for k in range(0, len(runs), 2):
+                            py, px = divmod(origin + runs[k], fb_width)
+                            self._packed_fill(px, px + runs[k + 1] - 1, py, py, color_hi)
+                    cur_x += ch_width
+                    continue
+                bitmap_mv = entry[3]
+            elif get_rle is not None:
+                stream, ch_height, ch_width = get_rle(ch)
+                if stream is None:
+                    # 游程不比位图短的字形按位图保存，逐位展开
+                    bitmap_mv = font.get_ch(ch)[0]
+                else:
+                    col0 = max(0, -cur_x)
+                    col1 = min(ch_width, fb_width - cur_x)
+                    row0 = max(0, -y)
+                    row1 = min(ch_height, fb_height - y)
+                    if col0 < col1 and row0 < row1:
+                        dst_off = ((y + row0) * fb_width + cur_x + col0) * step
+                        if opaque:
+                            row_size = (col1 - col0) * step
+                            for k in range(row1 - row0):
+                                self._fill_span(fb, dst_off + k * fb_width * step, row_size, bg16)
+                        rle_args[1] = len(stream)
+                        rle_args[2] = ch_width
+                        rle_args[3] = col0
+                        rle_args[4] = col1
+                        rle_args[5] = row0
+                        rle_args[6] = row1
+                        rle_args[7] = dst_off
+                        rle(stream, fb, rle_args, color16)
+                    cur_x += ch_width
+                    continue
             else:
-                bitmap_mv = memoryview(bitmap)
+                if glyphs is not None:
+                    bitmap, ch_height, ch_width = glyphs[i]
+                else:
+                    bitmap, ch_height, ch_width = font.get_ch(ch)
+                if isinstance(bitmap, memoryview):
+                    bitmap_mv = bitmap
+                else:
+                    bitmap_mv = memoryview(bitmap)
+            if cur_x + ch_width <= 0:
+                # 整个字形在屏幕左侧
+                cur_x += ch_width
+                continue
             bytes_per_row = (ch_width + 7) >> 3
 
+            if plot is None:
+                # 把字形裁剪到屏幕内，由内核一次绘制
+                col0 = max(0, -cur_x)
+                col1 = min(ch_width, fb_width - cur_x)
+                row0 = max(0, -y)
+                row1 = min(ch_height, fb_height - y, len(bitmap_mv) // bytes_per_row)
+                if col0 < col1 and row0 < row1:
+                    args[0] = row0 * bytes_per_row
+                    args[1] = bytes_per_row
+                    args[2] = col0
+                    args[3] = col1 - col0
+                    args[4] = row1 - row0
+                    args[5] = ((y + row0) * fb_width + cur_x + col0) * step
+                    glyph(bitmap_mv, fb, args, color16)
+                cur_x += ch_width
+                continue
+
+            if opaque:
+                self._packed_fill(max(cur_x, 0), min(cur_x + ch_width, fb_width) - 1,
+                                  max(y, 0), min(y + ch_height, fb_height) - 1, bg_hi)
             for row in range(ch_height):
                 py = y + row
                 if py < 0 or py >= fb_height:
                     continue
 
-                row_offset = py * fb_width
                 bitmap_row_offset = row * bytes_per_row
 
                 for col in range(ch_width):
@@ -1133,17 +3242,129 @@ class NV3007:
                     bit_pos = 7 - (col & 7)
 
                     if byte_idx < len(bitmap_mv) and (bitmap_mv[byte_idx] >> bit_pos) & 1:
-                        offset = (row_offset + px) * 2
-                        fb[offset] = color_hi
-                        fb[offset + 1] = color_lo
+                        plot(px, py, color_hi)
 
             cur_x += ch_width
 
-        self._fb_dirty = True
+        self._mark_dirty(x, y, cur_x - 1, y + font.height() - 1)
         self._auto_flush = old_auto_flush
         if self._auto_flush:
             self.flush()
 
+    def scroll_area(self, top=0, height=None):
+        """设置硬件垂直滚动区域（VSCRDEF，0x33），滚动位置复位为0
+
+        滚动区域之外的行固定不动。只支持竖屏方向（rotation为0或1），
+        不能在分带模式下使用。
+
+        参数:
+            top: 顶部固定区域的行数
+            height: 滚动区域的行数，默认到屏幕底部
+        """
+        if self._rotation > 1:
+            raise ValueError("vertical scrolling requires rotation 0 or 1")
+        if self._band_rows:
+            raise ValueError("scrolling is not available in band mode")
+        if height is None:
+            height = self.height - top
+        if top < 0 or height < 1 or top + height > self.height:
+            raise ValueError("scroll area out of range")
+        # 双缓冲时后台线程可能正在传输，命令不能插入它的SPI事务
+        self.wait()
+        # 先滚回0：framebuffer与GRAM恢复同样的行顺序，再改变区域
+        self.scroll_to(0)
+        self._scroll_top = top
+        self._scroll_height = height
+        bottom = _GRAM_ROWS - top - height
+        if self._rotation == 1:
+            # 行方向翻转：逻辑上的顶部固定区域位于帧存储器底部
+            top, bottom = bottom, top
+        self._bus.command(0x33, bytes((top >> 8, top & 0xFF, height >> 8, height & 0xFF,
+                                       bottom >> 8, bottom & 0xFF)))
+        self._send_scroll_start()
+
+    def scroll_to(self, offset):
+        """把滚动区域滚动到offset行（VSCRSADD，0x37）
+
+        offset增大时内容向上移动，滚动区域底部露出的行显示原来从顶部移出的内容。
+        framebuffer中滚动区域的行随之循环移动，保持与屏幕显示一致；
+        GRAM中的内容不需要重发，之后只有重新绘制的行会被发送。
+
+        参数:
+            offset: 滚动位置（行），按滚动区域高度取模
+        """
+        # 双缓冲时先等后台传输结束，之后的命令不会与它交错
+        self.wait()
+        height = self._scroll_height
+        if height == 0:
+            if offset:
+                raise ValueError("call scroll_area() first")
+            return
+        offset %= height
+        n = (offset - self._scroll_offset) % height
+        if n == 0:
+            return
+        # 未发送的绘制按当前位置先发送（双缓冲时交给后台线程，再等它发完）
+        if self._damage_n:
+            self.present()
+            self.wait()
+        if self._diff_mode:
+            self._tile_known[:] = bytes(len(self._tile_known))
+        self._rotate_rows(self._fb_mv, n)
+        if self._double_buffer:
+            self._rotate_rows(self._front_mv, n)
+        self._scroll_offset = offset
+        self._send_scroll_start()
+
+    def scroll(self, lines):
+        """相对滚动lines行，正数内容向上移动"""
+        self.scroll_to(self._scroll_offset + lines)
+
+    def _rotate_rows(self, fb, n):
+        """把fb中滚动区域的行循环上移n行
+
+        按置换环逐行移动：每个环的第一行暂存在行缓冲区，环上其余各行依次
+        上移到前一个位置，不分配保存多行的临时缓冲区。每行的复制仍创建两个
+        memoryview切片对象；不论n多大，整个滚动区域的每一行都要复制一次，
+        CPU开销与滚动区域高度成正比（SPI只发送新露出的行）
+        """
+        row_bytes = self._row_bytes
+        height = self._scroll_height
+        base = self._scroll_top * row_bytes
+        temp = self._line_mv[:row_bytes]
+        # 环的个数为gcd(height, n)
+        a = height
+        b = n
+        while b:
+            a, b = b, a % b
+        for first in range(a):
+            src = base + first * row_bytes
+            temp[:] = fb[src:src + row_bytes]
+            row = first
+            while True:
+                nxt = row + n
+                if nxt >= height:
+                    nxt -= height
+                if nxt == first:
+                    break
+                dst = base + row * row_bytes
+                src = base + nxt * row_bytes
+                fb[dst:dst + row_bytes] = fb[src:src + row_bytes]
+                row = nxt
+            dst = base + row * row_bytes
+            fb[dst:dst + row_bytes] = temp
+
+    def _send_scroll_start(self):
+        """发送当前滚动位置对应的VSCRSADD"""
+        offset = self._scroll_offset
+        if self._rotation == 1:
+            # 行方向翻转时滚动方向也相反
+            start = _GRAM_ROWS - self._scroll_top - self._scroll_height
+            offset = (self._scroll_height - offset) % self._scroll_height
+        else:
+            start = self._scroll_top
+        self._bus.command16(0x37, start + offset)
+
     def set_backlight(self, value):
         """设置背光亮度 (0-1)"""
         if value > 0:
@@ -1153,13 +3374,15 @@ class NV3007:
 
     def sleep(self):
         """进入睡眠模式"""
-        self._write_reg(0x28)
+        self.wait()
+        self._bus.command(0x28)
         time.sleep_ms(120)
-        self._write_reg(0x10)
+        self._bus.command(0x10)
         time.sleep_ms(50)
 
     def wake(self):
         """唤醒屏幕"""
-        self._write_reg(0x11)
+        self.wait()
+        self._bus.command(0x11)
         time.sleep_ms(120)
-        self._write_reg(0x29)
+        self._bus.command(0x29)
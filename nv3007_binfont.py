@@ -0,0 +1,207 @@
+"""
+NV3007 二进制字体文件
+
+font_to_py生成的字体模块把全部字形作为bytes常量放在模块里，未冻结时导入
+要编译整个模块，并把 _font 和 _sparse 常量放进堆。二进制字体文件打开时只读取
+文件头和码位表（用来构建CodepointIndex，读完即释放），字形按需 seek + readinto
+读入预先分配的槽位，最近使用的若干个字形留在RAM中。
+
+文件格式（小端）:
+    文件头 16 字节:
+        0   4  魔数 b"NVF1"
+        4   1  高度
+        5   1  最大宽度
+        6   2  字符数 n
+        8   4  默认字形项（字体中没有的字符使用）
+        12  1  标志，bit0为1表示RLE字形；bit1/bit2为1表示2/4位抗锯齿字形
+        13  1  RLE字形游程字节流的最大长度
+        14  2  保留，为0
+    码位表 n * 2 字节，按码位升序
+    字形项表 n * 4 字节，每项为 字形数据在文件中的偏移 | (宽度 << 24)
+    字形数据，每个字形 ((宽度 * 位数 + 7) >> 3) * 高度 字节，水平映射，高位在左，
+    位数为1（单色）或2/4（抗锯齿alpha，0为透明，最大值为前景色）；
+    RLE字形为1字节长度加游程字节流（格式见nv3007.py中的_rle_py），只用于单色字体；
+    长度字节为0xFF时后跟原始位图（游程字节流不比位图短的字形）
+
+用 font_to_bin.py 把font_to_py字体模块转换为此格式，font_to_aa.py 从TrueType字体
+生成抗锯齿字体。
+"""
+
+from array import array
+from nv3007 import CodepointIndex
+
+MAGIC = b"NVF1"
+_HEADER_SIZE = 16
+_FLAG_RLE = 0x01
+_FLAG_2BPP = 0x02
+_FLAG_4BPP = 0x04
+_RAW = 0xFF
+
+
+class BinFont(CodepointIndex):
+    """按需从文件读取字形的字体
+
+    提供与font_to_py字体模块相同的height()/max_width()/hmap()/get_ch()，
+    可以直接传给NV3007.set_font()和Console。
+
+    get_ch()返回的位图指向内部槽位，在之后的 cache 次未命中的get_ch()之后
+    可能被其他字形覆盖；需要长期保存时应复制。NV3007的draw_text()和字形缓存
+    都满足这一点。
+
+    RLE字体另外提供get_rle()，draw_text按游程直接填充framebuffer；
+    get_ch()把游程解码到一个共用的位图缓冲区，只在下一次get_ch()之前有效。
+    按位图保存的字形get_rle()返回的游程为None，调用者改用get_ch()。
+
+    抗锯齿字体的bpp()返回2或4，get_ch()返回的位图每像素为相应位数的alpha，
+    draw_text据此按alpha混合绘制。
+    """
+
+    def __init__(self, path, cache=32):
+        """打开字体文件并构建字符索引
+
+        参数:
+            path: 字体文件路径
+            cache: 保留在RAM中的字形数（LRU淘汰）
+        """
+        f = open(path, "rb")
+        header = f.read(_HEADER_SIZE)
+        if len(header) < _HEADER_SIZE or header[:4] != MAGIC:
+            f.close()
+            raise ValueError("not an NV3007 font file")
+        n = header[6] | (header[7] << 8)
+        super().__init__(f.read(n * 2), 2)
+        self._file = f
+        self._height = header[4]
+        self._max_width = header[5]
+        self._default = header[8] | (header[9] << 8) | (header[10] << 16) | (header[11] << 24)
+        self._entries = _HEADER_SIZE + n * 2
+        self._entry = bytearray(4)
+        cache = max(1, cache)
+        flags = header[12]
+        self._bpp = 4 if flags & _FLAG_4BPP else 2 if flags & _FLAG_2BPP else 1
+        size = ((self._max_width * self._bpp + 7) >> 3) * self._height
+        self._rle = flags & _FLAG_RLE
+        if self._rle:
+            self._bitmap = memoryview(bytearray(size))
+            # 槽位保存长度字节和游程字节流，或者标记字节和位图
+            size = max(header[13], size) + 1
+        else:
+            # draw_text按 getattr(font, "get_rle", None) 判断是否按游程绘制
+            self.get_rle = None
+        self._slots = [memoryview(bytearray(size)) for _ in range(cache)]
+        # 码位 -> 槽位；每个槽位的码位（-1为空）、字形宽度和最近使用时间
+        self._slot_of = {}
+        self._slot_cp = array('i', [-1] * cache)
+        self._slot_width = bytearray(cache)
+        self._slot_tick = array('I', [0] * cache)
+        self._tick = 0
+        self._hits = 0
+        self._misses = 0
+
+    def close(self):
+        """关闭字体文件"""
+        self._file.close()
+
+    def height(self):
+        return self._height
+
+    def max_width(self):
+        return self._max_width
+
+    def hmap(self):
+        return True
+
+    def bpp(self):
+        """每像素位数：1为单色，2/4为抗锯齿字形的alpha位数"""
+        return self._bpp
+
+    def cache_stats(self):
+        """返回字形槽位统计 (命中次数, 未命中次数)"""
+        return (self._hits, self._misses)
+
+    def _slot(self, ch):
+        """字符所在的槽位，不在RAM中时从文件读入"""
+        cp = ord(ch)
+        self._tick += 1
+        slot = self._slot_of.get(cp)
+        if slot is None:
+            slot = self._load(cp)
+        else:
+            self._hits += 1
+        self._slot_tick[slot] = self._tick
+        return slot
+
+    def get_ch(self, ch):
+        """与字体模块的get_ch()相同：返回 (位图, 高, 宽)"""
+        slot = self._slot(ch)
+        width = self._slot_width[slot]
+        if self._rle:
+            record = self._slots[slot]
+            if record[0] == _RAW:
+                return record[1:1 + ((width + 7) >> 3) * self._height], self._height, width
+            return self._decode(record[1:1 + record[0]], width), self._height, width
+        return self._slots[slot][:((width * self._bpp + 7) >> 3) * self._height], self._height, width
+
+    def get_rle(self, ch):
+        """RLE字体：返回 (游程字节流, 高, 宽)；按位图保存的字形游程为None"""
+        slot = self._slot(ch)
+        record = self._slots[slot]
+        if record[0] == _RAW:
+            return None, self._height, self._slot_width[slot]
+        return record[1:1 + record[0]], self._height, self._slot_width[slot]
+
+    def _decode(self, stream, width):
+        """把游程字节流展开为1位位图（共用缓冲区）"""
+        bytes_per_row = (width + 7) >> 3
+        bitmap = self._bitmap[:bytes_per_row * self._height]
+        for i in range(len(bitmap)):
+            bitmap[i] = 0
+        row = 0
+        col = 0
+        for b in stream:
+            if b >= 0xF0:
+                col += 15 * ((b & 0x0F) + 1)
+            else:
+                col += b >> 4
+            while col >= width:
+                col -= width
+                row += 1
+            if b >= 0xF0:
+                continue
+            base = row * bytes_per_row
+            for c in range(col, col + (b & 0x0F) + 1):
+                bitmap[base + (c >> 3)] |= 0x80 >> (c & 7)
+            col += (b & 0x0F) + 1
+        return bitmap
+
+    def _load(self, cp):
+        """把码位的字形读入最久未使用的槽位，返回槽位号"""
+        self._misses += 1
+        ticks = self._slot_tick
+        slot = 0
+        for i in range(1, len(ticks)):
+            if ticks[i] < ticks[slot]:
+                slot = i
+        old = self._slot_cp[slot]
+        if old >= 0:
+            del self._slot_of[old]
+        f = self._file
+        i = self._ordinal(cp)
+        if i < 0:
+            entry = self._default
+        else:
+            e = self._entry
+            f.seek(self._entries + i * 4)
+            f.readinto(e)
+            entry = e[0] | (e[1] << 8) | (e[2] << 16) | (e[3] << 24)
+        width = entry >> 24
+        f.seek(entry & 0xFFFFFF)
+        if self._rle:
+            # 长度字节加最长的游程字节流；读到后面字形的数据无妨
+            f.readinto(self._slots[slot])
+        else:
+            f.readinto(self._slots[slot][:((width * self._bpp + 7) >> 3) * self._height])
+        self._slot_cp[slot] = cp
+        self._slot_width[slot] = width
+        self._slot_of[cp] = slot
+        return slot
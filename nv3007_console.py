@@ -0,0 +1,179 @@
+"""
+NV3007 滚动文本控制台
+
+基于 NV3007.draw_text 和硬件垂直滚动的日志终端：换行时滚动一行文本的高度，
+只重绘露出的行，每次write()只做一次局部刷新，不重绘整个屏幕。
+"""
+
+from nv3007 import NV3007, FontIndex
+
+
+class Console:
+    """滚动文本控制台
+
+    控制台占用屏幕上 [top, top + height) 的行作为硬件滚动区域，
+    按字符宽度自动换行（适合没有空格的中文文本），最近的scrollback行
+    保存在环形缓冲区中，可以用view()回看。
+
+    控制台会关闭显示对象的自动刷新。write()先一次滚动完所有新行，
+    再绘制文本，结束时只调用一次flush()。
+    """
+
+    def __init__(self, lcd, font, fg_color=NV3007.WHITE, bg_color=NV3007.BLACK,
+                 top=0, height=None, scrollback=100):
+        """初始化控制台并清空其区域
+
+        参数:
+            lcd: NV3007实例
+            font: 字体模块（与set_font()相同的格式）
+            fg_color: 文字颜色
+            bg_color: 背景颜色
+            top: 控制台区域的起始行
+            height: 控制台区域的高度（默认到屏幕底部），向下取整为整数个文本行
+            scrollback: 保存的历史行数
+        """
+        if height is None:
+            height = lcd.height - top
+        self._lcd = lcd
+        if not isinstance(font, FontIndex) and hasattr(font, "_sparse") and font.hmap():
+            # 只构建一次索引：与其他字体交替使用时set_font()直接切换，不再重建
+            font = FontIndex(font)
+        self._font = font
+        self._fg = fg_color
+        self._bg = bg_color
+        self._top = top
+        self._line_h = font.height()
+        self._rows = height // self._line_h
+        if self._rows < 1:
+            raise ValueError("console area is lower than one text line")
+        self._width = lcd.width
+        # 历史行环形缓冲区，_count为已保存的行数，_head为下一行的写入位置
+        self._history = [""] * scrollback
+        self._head = 0
+        self._count = 0
+        self._line = ""
+        self._x = 0
+        self._row = 0
+        self._back = 0
+        lcd.set_auto_flush(False)
+        lcd.scroll_area(top, self._rows * self._line_h)
+        self.clear()
+
+    def clear(self):
+        """清空屏幕上的控制台区域（历史行保留）"""
+        lcd = self._lcd
+        lcd.scroll_to(0)
+        lcd.draw_rect(0, self._top, self._width, self._rows * self._line_h, self._bg, filled=True)
+        self._line = ""
+        self._x = 0
+        self._row = 0
+        self._back = 0
+        lcd.flush()
+
+    def write(self, text):
+        """输出文本，"\\n" 换行，超出屏幕宽度时自动换行
+
+        参数:
+            text: 要输出的字符串
+        """
+        if self._back:
+            # 正在回看历史时先回到最新内容
+            self.view(0)
+        lcd = self._lcd
+        lcd.set_font(self._font)
+        get_ch = self._font.get_ch
+        # 先把文本拆成 (行号, x, 文本) 片段，行号0为当前行
+        pieces = []
+        line = 0
+        start = 0
+        x = self._x
+        run_x = x
+        for i in range(len(text)):
+            ch = text[i]
+            if ch == "\n":
+                pieces.append((line, run_x, text[start:i]))
+                self._end_line(text[start:i])
+                line += 1
+                start = i + 1
+                x = run_x = 0
+                continue
+            w = get_ch(ch)[2]
+            if x + w > self._width and x > 0:
+                pieces.append((line, run_x, text[start:i]))
+                self._end_line(text[start:i])
+                line += 1
+                start = i
+                x = run_x = 0
+            x += w
+        if start < len(text):
+            pieces.append((line, run_x, text[start:]))
+            self._line += text[start:]
+        self._x = x
+        # 新行超出底部时一次滚动完，此时还没有未发送的绘制，滚动不会触发刷新
+        row = self._row + line
+        if row >= self._rows:
+            self._scroll_lines(row - self._rows + 1)
+            row = self._rows - 1
+        self._row = row
+        # 只绘制仍在屏幕上的片段
+        line_h = self._line_h
+        for k, run_x, run in pieces:
+            r = row - line + k
+            if r >= 0 and run:
+                lcd.draw_text(run_x, self._top + r * line_h, run, self._fg)
+        lcd.flush()
+
+    def _end_line(self, tail):
+        """当前行以tail结束：存入历史，开始新的一行"""
+        history = self._history
+        if history:
+            history[self._head] = self._line + tail
+            self._head = (self._head + 1) % len(history)
+            if self._count < len(history):
+                self._count += 1
+        self._line = ""
+
+    def _scroll_lines(self, n):
+        """硬件滚动n行，用背景色覆盖底部露出的行（仍显示从顶部移出的旧内容）"""
+        lcd = self._lcd
+        line_h = self._line_h
+        n = min(n, self._rows)
+        lcd.scroll(n * line_h)
+        lcd.draw_rect(0, self._top + (self._rows - n) * line_h, self._width, n * line_h,
+                      self._bg, filled=True)
+
+    def view(self, back=0):
+        """回看历史：最后一行显示往回back行的内容，0为最新内容
+
+        回看时重绘整个控制台区域；之后的write()会先回到最新内容。
+
+        参数:
+            back: 往回的行数，超出保存的历史时取最大值
+        """
+        back = max(0, min(back, self._count))
+        lcd = self._lcd
+        lcd.set_font(self._font)
+        lcd.scroll_to(0)
+        line_h = self._line_h
+        lcd.draw_rect(0, self._top, self._width, self._rows * line_h, self._bg, filled=True)
+        # 最新内容的最后一行是尚未结束的当前行，回看时只显示历史行
+        lines = self._history_lines(back, self._rows if back else self._row)
+        for i in range(len(lines)):
+            lcd.draw_text(0, self._top + i * line_h, lines[i], self._fg)
+        if back == 0:
+            self._row = len(lines)
+            lcd.draw_text(0, self._top + self._row * line_h, self._line, self._fg)
+        self._back = back
+        lcd.flush()
+
+    def _history_lines(self, back, n):
+        """倒数第back行之前（不含）的最后n行历史，按从旧到新排列"""
+        history = self._history
+        size = len(history)
+        end = self._count - back
+        first = max(0, end - n)
+        lines = []
+        for k in range(first, end):
+            # 第k行（最旧为0）在环形缓冲区中的位置
+            lines.append(history[(self._head - self._count + k) % size])
+        return lines
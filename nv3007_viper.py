@@ -0,0 +1,396 @@
+"""
+NV3007 viper rasterization kernels
+
+在不支持viper发射器的平台上导入失败，nv3007会回退到native内核。
+函数签名与nv3007中的内核说明一致。copy_rows和sprite没有viper版本：
+逐行/逐游程的切片复制本身由C完成，逐字节循环不会更快。aa_over也没有：
+它对每个新背景色调用Python函数取混合表，时间主要花在调用上。
+"""
+
+import micropython
+
+
+# 16/32位写入按小端存储，(lo << 8) | hi 在内存中的字节顺序为 hi, lo。
+# buf必须是framebuffer或行缓冲区本身（起始地址对齐），而不是任意偏移的切片。
+
+@micropython.viper
+def fill_span(buf, offset: int, nbytes: int, color: int):
+    p = ptr8(buf)
+    hi = color >> 8
+    lo = color & 0xFF
+    end = offset + nbytes
+    i = offset
+    if (i & 1) == 0:
+        c = (lo << 8) | hi
+        if (i & 2) and i + 2 <= end:
+            p16 = ptr16(buf)
+            p16[i >> 1] = c
+            i += 2
+        if (i & 3) == 0:
+            p32 = ptr32(buf)
+            c32 = c | (c << 16)
+            k = i >> 2
+            kend = end >> 2
+            while k < kend:
+                p32[k] = c32
+                k += 1
+            if (kend << 2) > i:
+                i = kend << 2
+    while i < end - 1:
+        p[i] = hi
+        p[i + 1] = lo
+        i += 2
+    if i < end:
+        p[i] = hi
+
+
+@micropython.viper
+def plot(buf, offset: int, last: int, color: int):
+    p = ptr8(buf)
+    p[offset] = color >> 8
+    p[offset + last] = color & 0xFF
+
+
+@micropython.viper
+def glyph(src, dst, args, color: int):
+    s = ptr8(src)
+    d = ptr8(dst)
+    a = ptr32(args)
+    hi = color >> 8
+    lo = color & 0xFF
+    src_off = a[0]
+    src_stride = a[1]
+    col0 = a[2]
+    col_end = col0 + a[3]
+    rows = a[4]
+    dst_off = a[5]
+    dst_stride = a[6]
+    step = a[7]
+    bg = a[8]
+    # bg为-1表示透明；按高16位判断，与ptr32读出的值是否带符号无关
+    opaque = (bg >> 16) == 0
+    if step == 2:
+        # RGB565：每个像素一次16位写入
+        d16 = ptr16(dst)
+        c = (lo << 8) | hi
+        cb = ((bg & 0xFF) << 8) | ((bg >> 8) & 0xFF)
+        while rows > 0:
+            o = dst_off >> 1
+            col = col0
+            while col < col_end:
+                if (s[src_off + (col >> 3)] >> (7 - (col & 7))) & 1:
+                    d16[o] = c
+                elif opaque:
+                    d16[o] = cb
+                o += 1
+                col += 1
+            src_off += src_stride
+            dst_off += dst_stride
+            rows -= 1
+        return
+    bg_hi = (bg >> 8) & 0xFF
+    while rows > 0:
+        o = dst_off
+        col = col0
+        while col < col_end:
+            if (s[src_off + (col >> 3)] >> (7 - (col & 7))) & 1:
+                d[o] = hi
+            elif opaque:
+                d[o] = bg_hi
+            o += 1
+            col += 1
+        src_off += src_stride
+        dst_off += dst_stride
+        rows -= 1
+
+
+@micropython.viper
+def bitmap(src, dst, args, color: int):
+    s = ptr8(src)
+    d = ptr8(dst)
+    a = ptr32(args)
+    hi = color >> 8
+    lo = color & 0xFF
+    src_w = a[0]
+    col0 = a[1]
+    col_end = col0 + a[2]
+    row = a[3]
+    row_end = row + a[4]
+    dst_off = a[5]
+    dst_stride = a[6]
+    step = a[7]
+    d16 = ptr16(dst)
+    c = (lo << 8) | hi
+    while row < row_end:
+        base = (row >> 3) * src_w
+        shift = 7 - (row & 7)
+        o = dst_off
+        col = col0
+        while col < col_end:
+            if (s[base + col] >> shift) & 1:
+                if step == 2:
+                    d16[o >> 1] = c
+                else:
+                    d[o] = hi
+            o += step
+            col += 1
+        dst_off += dst_stride
+        row += 1
+
+
+@micropython.viper
+def spans(dst, runs, args, color: int):
+    d = ptr8(dst)
+    d16 = ptr16(dst)
+    r = ptr32(runs)
+    a = ptr32(args)
+    hi = color >> 8
+    c = ((color & 0xFF) << 8) | hi
+    base = a[0]
+    n = a[1] * 2
+    step = a[2]
+    k = 0
+    while k < n:
+        o = base + r[k] * step
+        end = o + r[k + 1] * step
+        if step == 2:
+            o >>= 1
+            end >>= 1
+            while o < end:
+                d16[o] = c
+                o += 1
+        else:
+            while o < end:
+                d[o] = hi
+                o += 1
+        k += 2
+
+
+@micropython.viper
+def rle(src, dst, args, color: int):
+    s = ptr8(src)
+    d = ptr8(dst)
+    d16 = ptr16(dst)
+    a = ptr32(args)
+    hi = color >> 8
+    c = ((color & 0xFF) << 8) | hi
+    i = a[0]
+    end = i + a[1]
+    width = a[2]
+    col0 = a[3]
+    col1 = a[4]
+    row0 = a[5]
+    row1 = a[6]
+    dst_off = a[7]
+    dst_stride = a[8]
+    step = a[9]
+    row = 0
+    col = 0
+    while i < end:
+        b = s[i]
+        i += 1
+        if b >= 0xF0:
+            col += 15 * ((b & 0x0F) + 1)
+        else:
+            col += b >> 4
+        while col >= width:
+            col -= width
+            row += 1
+        if row >= row1:
+            return
+        if b >= 0xF0:
+            continue
+        n = (b & 0x0F) + 1
+        if row >= row0:
+            c0 = col
+            if c0 < col0:
+                c0 = col0
+            c1 = col + n
+            if c1 > col1:
+                c1 = col1
+            o = dst_off + (row - row0) * dst_stride + (c0 - col0) * step
+            oend = o + (c1 - c0) * step
+            if step == 2:
+                o >>= 1
+                oend >>= 1
+                while o < oend:
+                    d16[o] = c
+                    o += 1
+            else:
+                while o < oend:
+                    d[o] = hi
+                    o += 1
+        col += n
+
+
+@micropython.viper
+def aa(src, dst, args, lut):
+    s = ptr8(src)
+    d = ptr8(dst)
+    a = ptr32(args)
+    t = ptr8(lut)
+    src_off = a[0]
+    src_stride = a[1]
+    col0 = a[2]
+    col_end = col0 + a[3]
+    rows = a[4]
+    dst_off = a[5]
+    dst_stride = a[6]
+    step = a[7]
+    bpp = a[8]
+    min_alpha = a[9]
+    mask = (1 << bpp) - 1
+    last = step - 1
+    while rows > 0:
+        o = dst_off
+        col = col0
+        while col < col_end:
+            bit = col * bpp
+            v = (s[src_off + (bit >> 3)] >> (8 - bpp - (bit & 7))) & mask
+            if v >= min_alpha:
+                d[o] = t[v << 1]
+                d[o + last] = t[(v << 1) + 1]
+            o += step
+            col += 1
+        src_off += src_stride
+        dst_off += dst_stride
+        rows -= 1
+
+
+@micropython.viper
+def copy16(src, dst, palette, args):
+    a = ptr32(args)
+    i = a[0]
+    n = a[1] * 2
+    j = 0
+    if (i & 3) == 0:
+        # 源和目标都按4字节对齐时按32位字复制
+        s32 = ptr32(src)
+        d32 = ptr32(dst)
+        k = i >> 2
+        end = n >> 2
+        while j < end:
+            d32[j] = s32[k + j]
+            j += 1
+        j <<= 2
+    elif (i & 1) == 0:
+        s16 = ptr16(src)
+        d16 = ptr16(dst)
+        k = i >> 1
+        end = n >> 1
+        while j < end:
+            d16[j] = s16[k + j]
+            j += 1
+        j <<= 1
+    s = ptr8(src)
+    d = ptr8(dst)
+    while j < n:
+        d[j] = s[i + j]
+        j += 1
+
+
+@micropython.viper
+def expand8(src, dst, palette, args):
+    s = ptr8(src)
+    d = ptr8(dst)
+    p = ptr8(palette)
+    a = ptr32(args)
+    i = a[0]
+    end = i + a[1]
+    j = 0
+    while i < end:
+        k = s[i] << 1
+        d[j] = p[k]
+        d[j + 1] = p[k + 1]
+        j += 2
+        i += 1
+
+
+@micropython.viper
+def expand4(src, dst, palette, args):
+    s = ptr8(src)
+    d = ptr8(dst)
+    p = ptr8(palette)
+    a = ptr32(args)
+    i = a[0]
+    end = a[1] * 2
+    j = 0
+    while j < end:
+        b = s[i]
+        k = (b >> 4) << 1
+        d[j] = p[k]
+        d[j + 1] = p[k + 1]
+        j += 2
+        if j < end:
+            k = (b & 0x0F) << 1
+            d[j] = p[k]
+            d[j + 1] = p[k + 1]
+            j += 2
+        i += 1
+
+
+@micropython.viper
+def expand1(src, dst, palette, args):
+    s = ptr8(src)
+    d = ptr8(dst)
+    p = ptr8(palette)
+    a = ptr32(args)
+    bg_hi = p[0]
+    bg_lo = p[1]
+    fg_hi = p[2]
+    fg_lo = p[3]
+    i = a[0]
+    end = a[1] * 2
+    j = 0
+    while j < end:
+        b = s[i]
+        mask = 0x80
+        while mask and j < end:
+            if b & mask:
+                d[j] = fg_hi
+                d[j + 1] = fg_lo
+            else:
+                d[j] = bg_hi
+                d[j + 1] = bg_lo
+            j += 2
+            mask >>= 1
+        i += 1
+
+
+@micropython.viper
+def pack444(src, dst, palette, args):
+    s = ptr8(src)
+    d = ptr8(dst)
+    a = ptr32(args)
+    i = a[0]
+    end = i + a[1] * 2
+    j = 0
+    while i < end:
+        hi = s[i]
+        lo = s[i + 1]
+        r1 = hi >> 4
+        g1 = ((hi & 0x07) << 1) | (lo >> 7)
+        b1 = (lo >> 1) & 0x0F
+        hi = s[i + 2]
+        lo = s[i + 3]
+        d[j] = (r1 << 4) | g1
+        d[j + 1] = (b1 << 4) | (hi >> 4)
+        d[j + 2] = ((((hi & 0x07) << 1) | (lo >> 7)) << 4) | ((lo >> 1) & 0x0F)
+        j += 3
+        i += 4
+
+
+KERNELS = {
+    "fill_span": fill_span,
+    "plot": plot,
+    "glyph": glyph,
+    "bitmap": bitmap,
+    "spans": spans,
+    "rle": rle,
+    "aa": aa,
+    "copy16": copy16,
+    "expand8": expand8,
+    "expand4": expand4,
+    "expand1": expand1,
+    "pack444": pack444,
+}
@@ -0,0 +1,53 @@
+"""
+在CPython下运行驱动测试：tests/mock提供machine和micropython模块，
+并为time补上MicroPython的sleep_ms/ticks_*函数。
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "mock"))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+if not hasattr(time, "sleep_ms"):
+    time.sleep_ms = lambda ms: None
+    time.sleep_us = lambda us: None
+    time.ticks_ms = lambda: int(time.monotonic() * 1000)
+    time.ticks_us = lambda: int(time.monotonic() * 1000000)
+    time.ticks_diff = lambda a, b: a - b
+    time.ticks_add = lambda a, b: a + b
+
+from machine import SPI  # noqa: E402
+from nv3007 import NV3007  # noqa: E402
+from panel import Panel  # noqa: E402
+
+
+def framebuffer_rows(lcd, fb=None):
+    """framebuffer（RGB565）的内容，按行返回像素列表"""
+    fb = lcd._framebuffer if fb is None else fb
+    width = lcd._fb_width
+    return [[(fb[(y * width + x) * 2] << 8) | fb[(y * width + x) * 2 + 1] for x in range(width)]
+            for y in range(len(fb) // (width * 2))]
+
+
+@pytest.fixture
+def make_lcd():
+    """创建连接到面板模型的NV3007，返回 (lcd, panel)；测试结束时结束后台线程"""
+    created = []
+
+    def make(**kwargs):
+        panel = Panel()
+        spi = kwargs.pop("spi", None) or SPI(0)
+        spi.panel = panel
+        lcd = NV3007(spi, 17, 20, 21, 14, 142, 428, 0, **kwargs)
+        created.append(lcd)
+        return lcd, panel
+
+    yield make
+    for lcd in created:
+        lcd.deinit()
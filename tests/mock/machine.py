@@ -0,0 +1,38 @@
+"""
+CPython下测试用的machine模块
+
+Pin记录电平并通知Pin.listener；SPI把写入的字节交给连接的面板模型（tests/panel.py）。
+"""
+
+
+class Pin:
+    OUT = 1
+    IN = 0
+
+    # 电平变化回调 listener(pin_id, value)，由面板模型设置
+    listener = None
+
+    def __init__(self, id, mode=-1, value=None):
+        self.id = id
+        self._value = value or 0
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+        if Pin.listener is not None:
+            Pin.listener(self.id, v)
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+
+class SPI:
+    def __init__(self, id=0, baudrate=1000000, **kwargs):
+        self.panel = None
+        self.nbytes = 0
+
+    def write(self, buf):
+        self.nbytes += len(buf)
+        if self.panel is not None:
+            self.panel.feed(bytes(buf))
@@ -0,0 +1,18 @@
+"""
+CPython下测试用的micropython模块
+
+native/viper装饰器原样返回函数。CPython没有viper的ptr8等指针类型，
+nv3007导入nv3007_viper后的试运行失败，viper后端不可用，测试覆盖python和native后端。
+"""
+
+
+def native(f):
+    return f
+
+
+def viper(f):
+    return f
+
+
+def const(x):
+    return x
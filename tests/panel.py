@@ -0,0 +1,105 @@
+"""
+测试用的NV3007面板模型
+
+通过Pin.listener跟踪CS/DC电平，解析SPI写入的命令和像素，维护GRAM内容。
+支持CASET/RASET/RAMWR、COLMOD（RGB565或RGB444）以及VSCRDEF/VSCRSADD。
+"""
+
+import threading
+
+import machine
+
+
+class Panel:
+    def __init__(self, cs=17, dc=20, width=256, height=512):
+        self.cs_pin = cs
+        self.dc_pin = dc
+        self.cs = 1
+        self.dc = 1
+        self.gram = [[0] * width for _ in range(height)]
+        self.cols = (0, width - 1)
+        self.rows = (0, height - 1)
+        self.colmod = 0x05
+        self.cmd = None
+        self.params = bytearray()
+        self.pending = bytearray()
+        self.ptr = None
+        self.commands = []
+        self.vscroll = None
+        self.vsa = 0
+        # 记录每次写入是哪个线程发出的
+        self.threads = set()
+        machine.Pin.listener = self.pin
+
+    def pin(self, id, value):
+        if id == self.cs_pin:
+            self.cs = value
+        elif id == self.dc_pin:
+            self.dc = value
+
+    def feed(self, data):
+        assert self.cs == 0, "SPI write with CS high"
+        self.threads.add(threading.get_ident())
+        if self.dc == 0:
+            for c in data:
+                self.cmd = c
+                self.params = bytearray()
+                self.commands.append(c)
+                if c == 0x2C:
+                    self.ptr = [self.cols[0], self.rows[0]]
+                    self.pending = bytearray()
+        elif self.cmd == 0x2C:
+            self.pixels(data)
+        else:
+            self.params += data
+            self.apply()
+
+    def apply(self):
+        p = self.params
+        if self.cmd == 0x2A and len(p) >= 4:
+            self.cols = ((p[0] << 8) | p[1], (p[2] << 8) | p[3])
+        elif self.cmd == 0x2B and len(p) >= 4:
+            self.rows = ((p[0] << 8) | p[1], (p[2] << 8) | p[3])
+        elif self.cmd == 0x3A and len(p) >= 1:
+            self.colmod = p[0]
+        elif self.cmd == 0x33 and len(p) >= 6:
+            self.vscroll = ((p[0] << 8) | p[1], (p[2] << 8) | p[3], (p[4] << 8) | p[5])
+        elif self.cmd == 0x37 and len(p) >= 2:
+            self.vsa = (p[0] << 8) | p[1]
+
+    def put(self, color):
+        x, y = self.ptr
+        if y > self.rows[1]:
+            return
+        self.gram[y][x] = color
+        x += 1
+        if x > self.cols[1]:
+            x = self.cols[0]
+            y += 1
+        self.ptr = [x, y]
+
+    def pixels(self, data):
+        """RGB565按像素保存；RGB444每3字节两个像素，保存12位值"""
+        buf = self.pending + data
+        if self.colmod == 0x03:
+            n = len(buf) // 3 * 3
+            for i in range(0, n, 3):
+                self.put((buf[i] << 4) | (buf[i + 1] >> 4))
+                self.put(((buf[i + 1] & 0x0F) << 8) | buf[i + 2])
+        else:
+            n = len(buf) // 2 * 2
+            for i in range(0, n, 2):
+                self.put((buf[i] << 8) | buf[i + 1])
+        self.pending = buf[n:]
+
+    def screen(self, lcd):
+        """按lcd的坐标偏移和滚动位置取出屏幕上显示的内容，返回行列表"""
+        rows = []
+        for y in range(lcd.height):
+            gy = y + lcd._y_off
+            if self.vscroll is not None:
+                top, height, _ = self.vscroll
+                if top <= gy < top + height:
+                    gy = top + (gy - top + self.vsa - top) % height
+            rows.append(self.gram[gy][lcd._x_off:lcd._x_off + lcd.width])
+        return rows
@@ -0,0 +1,86 @@
+"""分带渲染：回放结果与整屏framebuffer一致，自动刷新只重发涉及的区域"""
+
+import pytest
+
+from machine import SPI
+from nv3007 import NV3007
+import font_wqy_16
+
+
+def scene(lcd):
+    lcd.clear(NV3007.BLUE)
+    lcd.draw_rect(5, 10, 60, 30, NV3007.RED, filled=True)
+    lcd.draw_circle(71, 150, 30, NV3007.GREEN, filled=True)
+    lcd.draw_text(3, 200, "分带渲染 band", NV3007.WHITE)
+    lcd.draw_line(0, 0, 141, 427, NV3007.YELLOW)
+    lcd.draw_rect(100, 380, 30, 40, NV3007.BLACK, radius=4)
+
+
+@pytest.mark.parametrize("auto", [False, True])
+@pytest.mark.parametrize("band_rows", [8, 27, 100])
+def test_band_matches_full_framebuffer(make_lcd, band_rows, auto):
+    ref, ref_panel = make_lcd()
+    ref.set_font(font_wqy_16)
+    ref.set_auto_flush(False)
+    scene(ref)
+    ref.flush()
+    lcd, panel = make_lcd(band_rows=band_rows)
+    lcd.set_font(font_wqy_16)
+    lcd.set_auto_flush(auto)
+    scene(lcd)
+    lcd.flush()
+    assert panel.screen(lcd) == ref_panel.screen(ref)
+
+
+class BlockFont:
+    """每个字符都是实心方块的字体，与font_wqy_16的字形明显不同"""
+
+    def height(self):
+        return 12
+
+    def max_width(self):
+        return 6
+
+    def get_ch(self, ch):
+        return b"\xfc" * 12, 12, 6
+
+
+def test_font_switch_mid_frame(make_lcd):
+    # 回放时每段文本用记录时的字体绘制
+    def draw(lcd):
+        lcd.clear(NV3007.BLACK)
+        lcd.set_font(font_wqy_16)
+        lcd.draw_text(5, 10, "你好", NV3007.WHITE)
+        lcd.set_font(BlockFont())
+        lcd.draw_text(5, 40, "世界", NV3007.YELLOW)
+        lcd.draw_rect(0, 100, 40, 40, NV3007.RED, filled=True)
+        lcd.set_font(font_wqy_16)
+        lcd.draw_text(5, 200, "你好", NV3007.GREEN, NV3007.BLUE)
+
+    ref, ref_panel = make_lcd()
+    ref.set_auto_flush(False)
+    draw(ref)
+    ref.flush()
+    for auto in (False, True):
+        lcd, panel = make_lcd(band_rows=13)
+        lcd.set_auto_flush(auto)
+        draw(lcd)
+        lcd.flush()
+        assert panel.screen(lcd) == ref_panel.screen(ref)
+
+
+def test_auto_flush_sends_only_new_damage(make_lcd):
+    spi = SPI(0)
+    lcd, panel = make_lcd(band_rows=16, spi=spi)
+    lcd.clear(NV3007.BLACK)
+    for i in range(20):
+        lcd.draw_rect(i * 5, i * 20, 10, 10, NV3007.WHITE, filled=True)
+    before = spi.nbytes
+    lcd.draw_rect(50, 300, 8, 6, NV3007.RED, filled=True)
+    sent = spi.nbytes - before
+    # 8x6像素加一次地址窗口，远小于一带（142x16x2字节）
+    assert 8 * 6 * 2 <= sent < 200
+    # 没有新的调用时不再发送
+    before = spi.nbytes
+    lcd.flush()
+    assert spi.nbytes == before
@@ -0,0 +1,48 @@
+"""二进制字体：RLE文件不比原始位图大很多，绘制结果与字体模块一致"""
+
+import os
+
+import font_to_bin
+from nv3007 import NV3007
+from nv3007_binfont import BinFont
+from conftest import framebuffer_rows
+import font_wqy_16
+
+TEXT = "你好，世界! NV3007 二进制字体 RLE"
+
+
+def test_rle_file_not_larger_than_raw(tmp_path):
+    raw_path = str(tmp_path / "raw.bin")
+    rle_path = str(tmp_path / "rle.bin")
+    n = font_to_bin.convert(font_wqy_16, raw_path)
+    assert font_to_bin.convert(font_wqy_16, rle_path, rle=True) == n
+    # 每个字形最多多出1字节长度
+    assert os.path.getsize(rle_path) <= os.path.getsize(raw_path) + n
+    font = BinFont(rle_path)
+    try:
+        raw = [ch for ch in TEXT if font.get_rle(ch)[0] is None]
+        assert raw and len(raw) < len(TEXT)
+    finally:
+        font.close()
+
+
+def test_rle_font_draws_like_module(tmp_path, make_lcd):
+    path = str(tmp_path / "rle.bin")
+    font_to_bin.convert(font_wqy_16, path, rle=True)
+    ref, ref_panel = make_lcd()
+    ref.set_font(font_wqy_16)
+    ref.set_auto_flush(False)
+    ref.clear(NV3007.BLACK)
+    ref.draw_text(-3, 10, TEXT, NV3007.WHITE)
+    ref.draw_text(0, 40, TEXT, NV3007.YELLOW, NV3007.BLUE)
+    font = BinFont(path)
+    try:
+        lcd, panel = make_lcd()
+        lcd.set_font(font)
+        lcd.set_auto_flush(False)
+        lcd.clear(NV3007.BLACK)
+        lcd.draw_text(-3, 10, TEXT, NV3007.WHITE)
+        lcd.draw_text(0, 40, TEXT, NV3007.YELLOW, NV3007.BLUE)
+    finally:
+        font.close()
+    assert framebuffer_rows(lcd) == framebuffer_rows(ref)
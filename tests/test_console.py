@@ -0,0 +1,80 @@
+"""滚动控制台：每次write()只刷新一次，字体索引只构建一次，屏幕内容与直接绘制一致"""
+
+import nv3007
+from nv3007 import NV3007
+from nv3007_console import Console
+from conftest import framebuffer_rows
+import font_wqy_16
+
+
+class BlockFont:
+    def height(self):
+        return 12
+
+    def max_width(self):
+        return 6
+
+    def get_ch(self, ch):
+        return b"\xfc" * 12, 12, 6
+
+
+def count_flushes(lcd):
+    calls = []
+    flush = lcd.flush
+
+    def counted():
+        calls.append(1)
+        flush()
+
+    lcd.flush = counted
+    return calls
+
+
+def test_write_flushes_once(make_lcd):
+    lcd, panel = make_lcd()
+    con = Console(lcd, font_wqy_16, top=12, height=400)
+    for i in range(con._rows + 3):
+        con.write("行 %d\n" % i)
+    calls = count_flushes(lcd)
+    # 在底部连续换行：滚动和清除露出的行都在同一次刷新中发送
+    con.write("一\n二\n三\n")
+    assert len(calls) == 1
+    con.write("很长的一行" * 10 + "\n")
+    assert len(calls) == 2
+
+
+def test_font_index_built_once(make_lcd, monkeypatch):
+    built = []
+    init = nv3007.FontIndex.__init__
+
+    def counted(self, font):
+        built.append(font)
+        init(self, font)
+
+    monkeypatch.setattr(nv3007.FontIndex, "__init__", counted)
+    lcd, panel = make_lcd()
+    con = Console(lcd, font_wqy_16, top=0, height=200)
+    for i in range(5):
+        lcd.set_font(BlockFont())
+        lcd.draw_text(0, 300, "x", NV3007.WHITE)
+        con.write("日志 %d\n" % i)
+    assert len(built) == 1
+
+
+def test_screen_matches_reference(make_lcd):
+    lcd, panel = make_lcd()
+    con = Console(lcd, font_wqy_16, top=12, height=400, scrollback=50)
+    for i in range(60):
+        con.write("日志 %d " % i + "测试" * (i % 9) + "\n")
+    con.write("半行")
+    assert panel.screen(lcd) == framebuffer_rows(lcd)
+
+    ref, ref_panel = make_lcd()
+    ref.set_font(font_wqy_16)
+    ref.set_auto_flush(False)
+    ref.clear(NV3007.BLACK)
+    lines = con._history_lines(0, con._row)
+    for i in range(len(lines)):
+        ref.draw_text(0, 12 + i * con._line_h, lines[i], NV3007.WHITE)
+    ref.draw_text(0, 12 + len(lines) * con._line_h, con._line, NV3007.WHITE)
+    assert framebuffer_rows(lcd) == framebuffer_rows(ref)
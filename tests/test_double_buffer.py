@@ -0,0 +1,99 @@
+"""双缓冲：present()交给后台线程发送，主线程继续绘制下一帧"""
+
+import threading
+
+from machine import SPI
+from nv3007 import NV3007
+from conftest import framebuffer_rows
+
+
+class GatedSPI(SPI):
+    """像素写入在gate打开前阻塞，模拟一次很慢的SPI传输"""
+
+    def __init__(self):
+        super().__init__(0)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.blocked = threading.Event()
+
+    def write(self, buf):
+        if not self.gate.is_set() and len(buf) > 4:
+            self.blocked.set()
+            assert self.gate.wait(5), "gate never opened"
+        super().write(buf)
+
+
+def test_present_sends_frame_from_worker(make_lcd):
+    lcd, panel = make_lcd(double_buffer=True)
+    lcd.set_auto_flush(False)
+    lcd.clear(NV3007.BLACK)
+    lcd.draw_rect(10, 20, 40, 30, NV3007.RED, filled=True)
+    lcd.present()
+    lcd.wait()
+    assert panel.screen(lcd) == framebuffer_rows(lcd)
+    # 像素数据由后台线程发送
+    assert len(panel.threads) == 2
+    assert lcd._framebuffer == lcd._front_buffer
+
+
+def test_draw_next_frame_while_sending(make_lcd):
+    spi = GatedSPI()
+    lcd, panel = make_lcd(double_buffer=True, spi=spi)
+    lcd.set_auto_flush(False)
+    lcd.clear(NV3007.BLACK)
+    lcd.present()
+    lcd.wait()
+
+    lcd.draw_rect(0, 0, 142, 100, NV3007.RED, filled=True)
+    first = framebuffer_rows(lcd)
+    spi.gate.clear()
+    lcd.present()
+    assert spi.blocked.wait(5)
+    # 第一帧还在传输时绘制第二帧，present()已经返回
+    lcd.draw_rect(0, 50, 142, 100, NV3007.BLUE, filled=True)
+    second = framebuffer_rows(lcd)
+    assert framebuffer_rows(lcd, lcd._front_buffer) == first
+    spi.gate.set()
+    lcd.wait()
+    assert panel.screen(lcd) == first
+
+    lcd.present()
+    lcd.wait()
+    assert panel.screen(lcd) == second
+
+
+def test_consecutive_frames(make_lcd):
+    lcd, panel = make_lcd(double_buffer=True)
+    lcd.set_auto_flush(False)
+    for frame in range(6):
+        lcd.draw_rect(frame * 20, frame * 60, 30, 40, 0x1111 * (frame + 1), filled=True)
+        lcd.present()
+    lcd.wait()
+    assert panel.screen(lcd) == framebuffer_rows(lcd)
+
+
+def test_deinit_stops_worker(make_lcd, monkeypatch):
+    exited = threading.Event()
+    worker = NV3007._flush_worker
+
+    def tracked_worker(self):
+        try:
+            worker(self)
+        finally:
+            exited.set()
+
+    monkeypatch.setattr(NV3007, "_flush_worker", tracked_worker)
+    lcd, panel = make_lcd(double_buffer=True)
+    lcd.set_auto_flush(False)
+    lcd.draw_rect(5, 5, 20, 20, NV3007.GREEN, filled=True)
+    lcd.present()
+    assert not exited.is_set()
+    lcd.deinit()
+    assert exited.wait(5)
+    assert panel.screen(lcd) == framebuffer_rows(lcd)
+    # 结束后台线程后flush()同步发送
+    panel.threads.clear()
+    lcd.draw_rect(60, 60, 20, 20, NV3007.WHITE, filled=True)
+    lcd.flush()
+    assert panel.threads == {threading.get_ident()}
+    assert panel.screen(lcd) == framebuffer_rows(lcd)
@@ -0,0 +1,69 @@
+"""flush()不产生堆分配：发送的只能是驱动预先创建的缓冲区和视图
+
+CPython没有gc.mem_alloc，这里检查写入SPI的缓冲区对象：预热刷新同样的区域后，
+再次刷新时每次写入的都必须是已经见过的对象（framebuffer、传输层的参数缓冲区、
+按长度缓存的行缓冲区视图），不能是新建的切片。
+"""
+
+import pytest
+
+from machine import SPI
+from nv3007 import NV3007
+from conftest import framebuffer_rows
+
+
+class RecordingSPI(SPI):
+    """记录写入的缓冲区对象，并保持引用，避免id被新对象复用"""
+
+    def __init__(self):
+        super().__init__(0)
+        self.written = []
+
+    def write(self, buf):
+        self.written.append(buf)
+        super().write(buf)
+
+
+CASES = {
+    "partial_rect": lambda lcd: lcd.draw_rect(20, 30, 40, 12, NV3007.RED, filled=True),
+    "full_width_band": lambda lcd: lcd.draw_rect(0, 100, lcd.width, 50, NV3007.GREEN, filled=True),
+    "two_rects": lambda lcd: (lcd.draw_rect(3, 5, 10, 4, NV3007.BLUE, filled=True),
+                              lcd.draw_rect(90, 400, 30, 20, NV3007.WHITE, filled=True)),
+    "full_screen": lambda lcd: lcd.clear(NV3007.BLACK),
+    "unchanged": lambda lcd: None,
+}
+
+
+@pytest.mark.parametrize("backend", ["python", "native"])
+@pytest.mark.parametrize("mode", [{}, {"bpp": 8}, {"bpp": 4}, {"rgb444": True}])
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_flush_writes_only_preallocated_buffers(make_lcd, backend, mode, case):
+    spi = RecordingSPI()
+    lcd, panel = make_lcd(spi=spi, backend=backend, **mode)
+    lcd.set_auto_flush(False)
+    # 构造后的第一次刷新发送整屏
+    lcd.flush()
+    draw = CASES[case]
+    draw(lcd)
+    lcd.flush()
+    # 预热时写入的对象继续由warm引用，新建的切片不会得到相同的id
+    warm = spi.written
+    seen = set(id(buf) for buf in warm)
+    spi.written = []
+    draw(lcd)
+    lcd.flush()
+    new = [buf for buf in spi.written if id(buf) not in seen]
+    assert new == []
+    assert warm
+
+
+@pytest.mark.parametrize("backend", ["python", "native"])
+def test_copied_rows_match_framebuffer(make_lcd, backend):
+    lcd, panel = make_lcd(backend=backend)
+    lcd.set_auto_flush(False)
+    for i in range(20):
+        lcd.draw_rect((i * 37) % 130, (i * 53) % 420, 11 + i, 7, 0x0841 * i, filled=True)
+        lcd.flush()
+    lcd.draw_rect(0, 200, lcd.width, 90, NV3007.YELLOW, filled=True)
+    lcd.flush()
+    assert panel.screen(lcd) == framebuffer_rows(lcd)
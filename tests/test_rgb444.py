@@ -0,0 +1,35 @@
+"""RGB444传输：刷新的区域与framebuffer一致，奇数宽度在构造时被拒绝"""
+
+import pytest
+
+from machine import SPI
+from nv3007 import NV3007
+
+
+RECTS = ((0, 0, 1, 5), (141, 10, 1, 7), (0, 30, 142, 3), (37, 50, 5, 9), (140, 60, 2, 2))
+
+
+@pytest.mark.parametrize("bpp", [16, 8, 4])
+def test_odd_rects_match_full_flush(make_lcd, bpp):
+    # 奇数宽度的区域逐个刷新，结果与一次整屏刷新相同
+    ref, ref_panel = make_lcd(rgb444=True, bpp=bpp)
+    ref.set_auto_flush(False)
+    ref.clear(NV3007.BLACK)
+    for x, y, w, h in RECTS:
+        ref.draw_rect(x, y, w, h, NV3007.RED, filled=True)
+    ref.flush()
+    lcd, panel = make_lcd(rgb444=True, bpp=bpp)
+    lcd.set_auto_flush(False)
+    lcd.clear(NV3007.BLACK)
+    lcd.flush()
+    for x, y, w, h in RECTS:
+        lcd.draw_rect(x, y, w, h, NV3007.RED, filled=True)
+        lcd.flush()
+    assert panel.screen(lcd) == ref_panel.screen(ref)
+
+
+def test_odd_width_rejected():
+    with pytest.raises(ValueError):
+        NV3007(SPI(0), 17, 20, 21, 14, 141, 428, 0, rgb444=True)
+    with pytest.raises(ValueError):
+        NV3007(SPI(0), 17, 20, 21, 14, 142, 427, 2, rgb444=True)